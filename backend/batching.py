@@ -0,0 +1,153 @@
+"""
+Micro-batching for model inference.
+
+Concurrent tool calls each submit one item; a background thread collects the
+items that arrive within a short window (or until the batch is full) and runs
+them through the model as one padded batch. Items that must not be mixed
+(e.g. summaries with different length limits) are grouped by a key.
+
+By default one batch runs at a time on the collecting thread. With
+`max_in_flight` > 1 batches run on a small thread pool, so several (e.g.
+remote) requests can be outstanding; new items keep accumulating while every
+slot is busy, so batches grow under load instead of queueing behind each other.
+
+Batch sizes and queue latency (time from submit to batch start) are recorded
+in histograms for GET /metrics.
+"""
+import bisect
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, List, Sequence, Tuple
+
+from backend.config import NLP_BATCH_MAX_SIZE, NLP_BATCH_WINDOW_MS
+
+
+class Histogram:
+    """Per-bucket (non-cumulative) counts; the last bucket is +Inf."""
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = list(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.bounds, value)] += 1
+            self.count += 1
+            self.total += value
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            labels = [f"<={b:g}" for b in self.bounds] + ["+Inf"]
+            return {
+                "buckets": dict(zip(labels, self.counts)),
+                "count": self.count,
+                "mean": round(self.total / self.count, 3) if self.count else 0,
+            }
+
+
+class MicroBatcher:
+    """Collects single-item requests and runs them through `batch_fn` together."""
+
+    def __init__(
+        self,
+        name: str,
+        batch_fn: Callable[[Hashable, List[Any]], Any],
+        max_batch_size: int = NLP_BATCH_MAX_SIZE,
+        window_ms: float = NLP_BATCH_WINDOW_MS,
+        max_in_flight: int = 1,
+    ):
+        self.name = name
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.window = window_ms / 1000
+        self.max_in_flight = max(1, max_in_flight)
+        self._slots = threading.BoundedSemaphore(self.max_in_flight)
+        self._executor = (
+            ThreadPoolExecutor(self.max_in_flight, thread_name_prefix=f"batcher-{name}")
+            if self.max_in_flight > 1 else None
+        )
+        self._pending: List[Tuple[Hashable, Any, Future, float]] = []
+        self._cond = threading.Condition()
+        self._thread = None
+        self.batch_sizes = Histogram([1, 2, 4, 8, 16, 32, 64])
+        self.queue_latency_ms = Histogram([1, 2, 5, 10, 25, 50, 100, 250, 1000])
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._loop, name=f"batcher-{self.name}", daemon=True)
+            self._thread.start()
+
+    def submit_many(self, items: Sequence[Any], key: Hashable = None) -> List[Future]:
+        futures = []
+        with self._cond:
+            self._ensure_thread()
+            now = time.perf_counter()
+            for item in items:
+                future = Future()
+                self._pending.append((key, item, future, now))
+                futures.append(future)
+            self._cond.notify()
+        return futures
+
+    def submit(self, item: Any, key: Hashable = None) -> Future:
+        return self.submit_many([item], key)[0]
+
+    def _take_batch(self) -> List[Tuple[Hashable, Any, Future, float]]:
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+            # Wait for more items until the window closes or the batch is full
+            deadline = self._pending[0][3] + self.window
+            while len(self._pending) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            key = self._pending[0][0]
+            batch = [p for p in self._pending if p[0] == key][:self.max_batch_size]
+            taken = {id(p) for p in batch}
+            self._pending = [p for p in self._pending if id(p) not in taken]
+            return batch
+
+    def _loop(self):
+        while True:
+            # Wait for a free slot first: items arriving meanwhile join the next batch
+            self._slots.acquire()
+            batch = self._take_batch()
+            if self._executor is None:
+                self._run(batch)
+            else:
+                self._executor.submit(self._run, batch)
+
+    def _run(self, batch: List[Tuple[Hashable, Any, Future, float]]):
+        started = time.perf_counter()
+        self.batch_sizes.observe(len(batch))
+        for _, _, _, submitted in batch:
+            self.queue_latency_ms.observe((started - submitted) * 1000)
+        try:
+            results = self.batch_fn(batch[0][0], [item for _, item, _, _ in batch])
+        except Exception as e:
+            for _, _, future, _ in batch:
+                future.set_exception(e)
+            return
+        finally:
+            self._slots.release()
+        if isinstance(results, str):
+            # Tool-style error string: every caller in the batch gets it
+            results = [results] * len(batch)
+        for (_, _, future, _), result in zip(batch, results):
+            future.set_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            pending = len(self._pending)
+        return {
+            "pending": pending,
+            "max_in_flight": self.max_in_flight,
+            "batch_size": self.batch_sizes.snapshot(),
+            "queue_latency_ms": self.queue_latency_ms.snapshot(),
+        }
@@ -0,0 +1,77 @@
+"""
+Benchmark: embedding providers.
+
+For each provider, measures ingest throughput (chunks/sec through
+KnowledgeBase.ingest into a fresh store, embedding cache empty) and query
+latency (KnowledgeBase.query, embedding included: every query is distinct
+and the query cache is disabled, so each one is embedded). "hashing" always
+runs; "sentence-transformers" runs when the package is installed; "gemini"
+makes network calls and only runs with --remote.
+
+Usage:
+    GEMINI_API_KEY=dummy python -m backend.benchmarks.bench_embeddings [chunks] [queries] [--remote]
+"""
+import importlib.util
+import os
+import statistics
+import sys
+import tempfile
+import time
+from typing import List
+
+os.environ.setdefault("ANONYMIZED_TELEMETRY", "False")
+
+from backend.embeddings import create_embeddings
+from backend.rag import KnowledgeBase, QueryCache
+
+
+def _percentiles(samples: List[float]) -> str:
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    return f"p50 {statistics.median(ordered) * 1000:7.2f} ms   p95 {p95 * 1000:7.2f} ms"
+
+
+def _corpus(workdir: str, chunks: int) -> str:
+    path = os.path.join(workdir, "corpus.txt")
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(chunks):
+            f.write(f"Section {i}: service {i % 17} rotates credential {i} every {i % 90} days. " * 12 + "\n\n")
+    return path
+
+
+def run(provider: str, chunks: int, queries: int):
+    with tempfile.TemporaryDirectory() as workdir:
+        corpus = _corpus(workdir, chunks)
+        kb = KnowledgeBase(persist_directory=os.path.join(workdir, "db"), embedding=create_embeddings(provider),
+                           hybrid=False)
+        start = time.perf_counter()
+        ingested = kb.ingest(corpus)
+        ingest_seconds = time.perf_counter() - start
+
+        kb.query_cache = QueryCache(maxsize=0, vectors_maxsize=0)
+        samples = []
+        for i in range(queries):
+            start = time.perf_counter()
+            kb.query(f"how often does service {i % 17} rotate credential {i}?")
+            samples.append(time.perf_counter() - start)
+        kb.close()
+    print(f"{provider:22s} ingest {ingested / ingest_seconds:9.1f} chunks/s   query {_percentiles(samples)}")
+
+
+def main():
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    chunks = int(args[0]) if args else 500
+    queries = int(args[1]) if len(args) > 1 else 100
+    providers = ["hashing"]
+    if importlib.util.find_spec("sentence_transformers") is not None:
+        providers.append("sentence-transformers")
+    if "--remote" in sys.argv:
+        providers.append("gemini")
+
+    print(f"chunks: {chunks}   queries: {queries}")
+    for provider in providers:
+        run(provider, chunks, queries)
+
+
+if __name__ == "__main__":
+    main()
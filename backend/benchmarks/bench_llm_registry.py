@@ -0,0 +1,49 @@
+"""
+Benchmark: per-step overhead of obtaining a tool-bound LLM client.
+
+Compares the old behaviour (new ChatOpenAI + bind_tools on every graph step)
+with the cached LLMRegistry lookup. No network calls are made; only client
+construction and tool-schema binding are measured.
+
+Usage:
+    GEMINI_API_KEY=dummy python -m backend.benchmarks.bench_llm_registry [steps]
+"""
+import sys
+import time
+
+from langchain_openai import ChatOpenAI
+
+from backend.config import API_KEY, BASE_URL, MODEL_NAME
+from backend.llm_registry import LLMRegistry
+from backend.tools import TOOLS
+
+
+def per_step_uncached(steps: int) -> float:
+    start = time.perf_counter()
+    for _ in range(steps):
+        llm = ChatOpenAI(api_key=API_KEY, base_url=BASE_URL, model=MODEL_NAME, temperature=0.7)
+        llm.bind_tools(TOOLS)
+    return (time.perf_counter() - start) / steps
+
+
+def per_step_cached(steps: int) -> float:
+    registry = LLMRegistry(TOOLS)
+    registry.get(MODEL_NAME, 0.7)  # warm the entry, as the first step of a thread would
+    start = time.perf_counter()
+    for _ in range(steps):
+        registry.get(MODEL_NAME, 0.7)
+    return (time.perf_counter() - start) / steps
+
+
+def main():
+    steps = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    before = per_step_uncached(steps)
+    after = per_step_cached(steps)
+    print(f"tools bound:          {len(TOOLS)}")
+    print(f"uncached per step:    {before * 1000:.3f} ms")
+    print(f"cached per step:      {after * 1000:.3f} ms")
+    print(f"speedup:              {before / after:.0f}x")
+
+
+if __name__ == "__main__":
+    main()
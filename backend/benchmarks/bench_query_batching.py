@@ -0,0 +1,110 @@
+"""
+Benchmark: concurrent knowledge-base queries with and without query batching.
+
+Many threads search at once, as parallel tool calls do. The embedding client is
+a deterministic fake that behaves like a hosted API: each request costs a
+round trip plus a little per text, and only `capacity` requests are served
+at a time (the provider's concurrency or rate limit). The numbers show what
+coalescing saves: the embedding request count and the p50/p99 search
+latency. The query cache is disabled so every search needs a query embedding.
+
+Usage:
+    GEMINI_API_KEY=dummy python -m backend.benchmarks.bench_query_batching [threads] [queries] [rtt_ms] [capacity]
+"""
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List
+
+os.environ.setdefault("ANONYMIZED_TELEMETRY", "False")
+
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from backend import rag
+
+
+class SlowEmbedding(DeterministicFakeEmbedding):
+    rtt: float = 0.05
+    capacity: int = 4
+    requests: int = 0
+    _slots: Any = None
+
+    def _wait(self, texts: int):
+        if self._slots is None:
+            self._slots = threading.BoundedSemaphore(self.capacity)
+        with self._slots:
+            self.requests += 1
+            time.sleep(self.rtt + 0.0005 * texts)
+
+    def embed_documents(self, texts):
+        self._wait(len(texts))
+        return super().embed_documents(texts)
+
+    def embed_query(self, text):
+        self._wait(1)
+        return super().embed_query(text)
+
+    def embed_queries(self, texts):
+        # One request for many queries, like OpenAIEmbeddings (see backend.embeddings.embed_queries)
+        self._wait(len(texts))
+        return [super(SlowEmbedding, self).embed_query(text) for text in texts]
+
+
+def _percentiles(samples: List[float]) -> str:
+    ordered = sorted(samples)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    return f"p50 {statistics.median(ordered) * 1000:7.1f} ms   p99 {p99 * 1000:7.1f} ms"
+
+
+def run(kb: rag.KnowledgeBase, threads: int, queries: List[str]) -> List[float]:
+    start_line = threading.Barrier(threads)
+
+    def one(query: str) -> float:
+        start = time.perf_counter()
+        kb.search(query, k=4)
+        return time.perf_counter() - start
+
+    def worker(part: List[str]) -> List[float]:
+        start_line.wait()
+        return [one(q) for q in part]
+
+    with ThreadPoolExecutor(threads) as pool:
+        parts = pool.map(worker, [queries[i::threads] for i in range(threads)])
+        return [sample for part in parts for sample in part]
+
+
+def main():
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+    n = int(sys.argv[2]) if len(sys.argv) > 2 else 640
+    rtt = float(sys.argv[3]) / 1000 if len(sys.argv) > 3 else 0.05
+    capacity = int(sys.argv[4]) if len(sys.argv) > 4 else 4
+    queries = [f"what does section {i} say about topic {i % 17}?" for i in range(n)]
+
+    print(f"threads: {threads}   queries: {n}   embedding round trip: {rtt * 1000:.0f} ms   "
+          f"concurrent requests served: {capacity}")
+    with tempfile.TemporaryDirectory() as workdir:
+        corpus = os.path.join(workdir, "corpus.txt")
+        with open(corpus, "w", encoding="utf-8") as f:
+            f.write("\n\n".join(f"Section {i}. " + "lorem ipsum dolor sit amet " * 30 for i in range(200)))
+        for batching in (False, True):
+            embedding = SlowEmbedding(size=384, rtt=rtt, capacity=capacity)
+            kb = rag.KnowledgeBase(persist_directory=os.path.join(workdir, f"db{int(batching)}"),
+                                   embedding=embedding, batch_queries=batching)
+            kb.ingest(corpus)
+            kb.query_cache = rag.QueryCache(maxsize=0, vectors_maxsize=0)
+            embedding.requests = 0
+            start = time.perf_counter()
+            samples = run(kb, threads, queries)
+            elapsed = time.perf_counter() - start
+            kb.close()
+            label = "batched" if batching else "one request per query"
+            print(f"{label:22s} requests {embedding.requests:5d}   {_percentiles(samples)}   "
+                  f"throughput {n / elapsed:7.1f} queries/s")
+
+
+if __name__ == "__main__":
+    main()
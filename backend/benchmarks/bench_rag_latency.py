@@ -0,0 +1,93 @@
+"""
+Benchmark: knowledge-base retrieval latency.
+
+Compares the old behaviour (a new Chroma client per query, as
+get_vector_store() used to do) with the shared KnowledgeBase, both through
+the sync query path and through concurrent async queries. Embeddings come
+from a deterministic fake model so only the vector store is measured and no
+network calls are made.
+
+Usage:
+    GEMINI_API_KEY=dummy python -m backend.benchmarks.bench_rag_latency [queries] [chunks]
+"""
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from typing import List
+
+os.environ.setdefault("ANONYMIZED_TELEMETRY", "False")
+
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from backend.rag import COLLECTION_NAME, KnowledgeBase
+
+
+def _percentiles(samples: List[float]) -> str:
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    return f"p50 {statistics.median(ordered) * 1000:7.2f} ms   p95 {p95 * 1000:7.2f} ms"
+
+
+def _seed(kb: KnowledgeBase, workdir: str, chunks: int):
+    path = os.path.join(workdir, "corpus.txt")
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(chunks):
+            f.write(f"Section {i}. " + "lorem ipsum dolor sit amet " * 30 + "\n\n")
+    kb.ingest(path)
+
+
+def per_query_new_client(kb: KnowledgeBase, queries: List[str]) -> List[float]:
+    from langchain_community.vectorstores import Chroma
+
+    samples = []
+    for q in queries:
+        start = time.perf_counter()
+        store = Chroma(persist_directory=kb.persist_directory, embedding_function=kb.embedding,
+                       collection_name=COLLECTION_NAME)
+        store.similarity_search(q, k=4)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def shared_sync(kb: KnowledgeBase, queries: List[str]) -> List[float]:
+    samples = []
+    for q in queries:
+        start = time.perf_counter()
+        kb.query(q)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+async def shared_async(kb: KnowledgeBase, queries: List[str]) -> float:
+    start = time.perf_counter()
+    await asyncio.gather(*(kb.aquery(q) for q in queries))
+    return time.perf_counter() - start
+
+
+def main():
+    queries = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    chunks = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    texts = [f"what does section {i} say?" for i in range(queries)]
+
+    with tempfile.TemporaryDirectory() as workdir:
+        kb = KnowledgeBase(persist_directory=os.path.join(workdir, "chroma_db"),
+                           embedding=DeterministicFakeEmbedding(size=768))
+        _seed(kb, workdir, chunks)
+
+        before = per_query_new_client(kb, texts)
+        after = shared_sync(kb, texts)
+        concurrent = asyncio.run(shared_async(kb, texts))
+        kb.close()
+
+    print(f"queries: {queries}   indexed chunks: {chunks}")
+    print(f"new client per query:  {_percentiles(before)}")
+    print(f"shared store (sync):   {_percentiles(after)}")
+    print(f"shared store (async):  {concurrent * 1000 / queries:7.2f} ms/query with {queries} concurrent")
+    print(f"speedup (p50):         {statistics.median(before) / statistics.median(after):.1f}x")
+
+
+if __name__ == "__main__":
+    main()
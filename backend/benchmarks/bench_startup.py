@@ -0,0 +1,162 @@
+"""
+Benchmark: cold import time and resident memory of the backend.
+
+Each measurement runs in a fresh interpreter so module caches do not leak
+between runs. For every module we record the import time and the RSS right
+after the import; for backend.server we also run the FastAPI lifespan
+(checkpointer + graph compilation) and record startup time and RSS.
+
+Runs fully offline: a dummy GEMINI_API_KEY is used, telemetry is disabled,
+and outbound socket connections are blocked and counted, so a module that
+tries to reach the LLM endpoint or another service shows up as
+"network_attempts" instead of hanging.
+
+Usage:
+    python -m backend.benchmarks.bench_startup [--runs 3] [--output startup.json]
+
+Compare two commits by diffing their JSON outputs.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+MODULES = ["backend.core_tools", "backend.tools", "backend.rag", "backend.graph", "backend.server"]
+
+# Executed in the child interpreter. Prints one JSON line.
+_CHILD = r"""
+import asyncio, json, os, socket, sys, time
+
+attempts = []
+_connect = socket.socket.connect
+def guarded_connect(self, address):
+    host = address[0] if isinstance(address, tuple) else address
+    if isinstance(host, str) and host not in ("127.0.0.1", "::1", "localhost") and not host.startswith("/"):
+        attempts.append(str(host))
+        raise OSError("network disabled by bench_startup")
+    return _connect(self, address)
+socket.socket.connect = guarded_connect
+
+def rss_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+module = sys.argv[1]
+lifespan = sys.argv[2] == "1"
+result = {"module": module, "baseline_rss_mb": rss_mb()}
+
+start = time.perf_counter()
+mod = __import__(module, fromlist=["_"])
+result["import_seconds"] = time.perf_counter() - start
+result["rss_mb"] = rss_mb()
+
+if lifespan:
+    async def run():
+        app = mod.app
+        start = time.perf_counter()
+        async with app.router.lifespan_context(app):
+            result["startup_seconds"] = time.perf_counter() - start
+            result["startup_rss_mb"] = rss_mb()
+    asyncio.run(run())
+
+result["network_attempts"] = attempts
+print(json.dumps(result))
+"""
+
+
+def offline_env() -> Dict[str, str]:
+    env = dict(os.environ)
+    env.setdefault("GEMINI_API_KEY", "bench-dummy-key")
+    env.update({
+        "PYTHONPATH": REPO_ROOT + os.pathsep + env.get("PYTHONPATH", ""),
+        "ANONYMIZED_TELEMETRY": "False",
+        "HF_HUB_OFFLINE": "1",
+        "TRANSFORMERS_OFFLINE": "1",
+        "LANGFUSE_TRACING_ENABLED": "false",
+    })
+    return env
+
+
+def measure(module: str, lifespan: bool = False) -> Dict[str, Any]:
+    """Import `module` (and optionally run the server lifespan) in a fresh interpreter."""
+    # Run from a scratch directory: rag.py and the lifespan create files relative to cwd
+    with tempfile.TemporaryDirectory() as workdir:
+        out = subprocess.run(
+            [sys.executable, "-c", _CHILD, module, "1" if lifespan else "0"],
+            cwd=workdir,
+            env=offline_env(),
+            capture_output=True,
+            text=True,
+        )
+    if out.returncode != 0:
+        raise RuntimeError(f"Measuring {module} failed:\n{out.stderr[-2000:]}")
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def _median(runs: List[Dict[str, Any]], key: str) -> float:
+    values = [r[key] for r in runs if key in r]
+    return round(statistics.median(values), 4) if values else None
+
+
+def run_benchmark(modules: List[str] = MODULES, runs: int = 3) -> Dict[str, Any]:
+    report: Dict[str, Any] = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "runs": runs,
+        "modules": {},
+    }
+    for module in modules:
+        samples = [measure(module) for _ in range(runs)]
+        report["modules"][module] = {
+            "import_seconds": _median(samples, "import_seconds"),
+            "rss_mb": _median(samples, "rss_mb"),
+            "network_attempts": sorted({a for s in samples for a in s["network_attempts"]}),
+        }
+
+    samples = [measure("backend.server", lifespan=True) for _ in range(runs)]
+    report["lifespan"] = {
+        "startup_seconds": _median(samples, "startup_seconds"),
+        "rss_mb": _median(samples, "startup_rss_mb"),
+        "network_attempts": sorted({a for s in samples for a in s["network_attempts"]}),
+    }
+    return report
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+    parser.add_argument("modules", nargs="*", default=MODULES)
+    args = parser.parse_args()
+
+    report = run_benchmark(args.modules, args.runs)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Benchmark: Chroma vs the memory-mapped int8 NumPy store.
+
+Builds both stores from the same synthetic, clustered vectors, then opens
+each one in a fresh process and reports:
+  - load: time to open the store and answer the first query,
+  - memory: resident-set growth of that process after loading and querying,
+  - query latency (p50/p95) for top-10 searches,
+  - recall@10 against exact float32 brute force (Chroma searches an HNSW
+    graph; the NumPy store scans int8 rows and re-scores NUMPY_STORE_RESCORE * k
+    candidates, with and without that re-scoring),
+  - size on disk.
+
+Usage:
+    GEMINI_API_KEY=dummy python -m backend.benchmarks.bench_vector_store [vectors] [dim] [queries]
+"""
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+os.environ.setdefault("ANONYMIZED_TELEMETRY", "False")
+
+import numpy as np
+
+from backend.rag import COLLECTION_NAME
+
+BATCH = 1000
+K = 10
+
+
+def _percentiles(samples: List[float]) -> str:
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    return f"p50 {statistics.median(ordered) * 1000:7.2f} ms   p95 {p95 * 1000:7.2f} ms"
+
+
+def _dataset(n: int, dim: int, queries: int):
+    rng = np.random.default_rng(7)
+    centers = rng.standard_normal((max(1, n // 200), dim))
+    vectors = centers[rng.integers(len(centers), size=n)] + 0.5 * rng.standard_normal((n, dim))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    probes = vectors[rng.integers(n, size=queries)] + 0.1 * rng.standard_normal((queries, dim))
+    return vectors.astype(np.float32), probes.astype(np.float32)
+
+
+def _collection(backend: str, directory: str, rescore: int = 4):
+    if backend == "numpy":
+        from backend.numpy_store import NumpyCollection
+
+        return NumpyCollection(os.path.join(directory, COLLECTION_NAME), rescore=rescore)
+    from langchain_community.vectorstores import Chroma
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+
+    store = Chroma(persist_directory=directory, embedding_function=DeterministicFakeEmbedding(size=8),
+                   collection_name=COLLECTION_NAME)
+    return store._collection
+
+
+def _build(backend: str, directory: str, vectors: np.ndarray) -> float:
+    collection = _collection(backend, directory)
+    start = time.perf_counter()
+    for offset in range(0, len(vectors), BATCH):
+        part = vectors[offset:offset + BATCH]
+        ids = [str(i) for i in range(offset, offset + len(part))]
+        collection.upsert(ids=ids, embeddings=part.tolist(), documents=ids, metadatas=[{"n": int(i)} for i in ids])
+    return time.perf_counter() - start
+
+
+def _disk(directory: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(directory) for name in names)
+
+
+def _rss_kb() -> int:
+    try:
+        with open("/proc/self/status") as f:
+            return next(int(line.split()[1]) for line in f if line.startswith("VmRSS:"))
+    except OSError:  # not Linux: peak RSS is the closest stand-in
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def probe(backend: str, directory: str, queries_path: str, rescore: int):
+    """Runs in a child process so load time and memory are measured from a cold start."""
+    baseline = _rss_kb()
+    queries = np.load(queries_path)
+    start = time.perf_counter()
+    collection = _collection(backend, directory, rescore)
+    results = [collection.query(query_embeddings=[queries[0].tolist()], n_results=K, include=[])["ids"][0]]
+    load = time.perf_counter() - start
+    samples = []
+    for query in queries[1:]:
+        start = time.perf_counter()
+        results.append(collection.query(query_embeddings=[query.tolist()], n_results=K, include=[])["ids"][0])
+        samples.append(time.perf_counter() - start)
+    print(json.dumps({"load": load, "rss_kb": _rss_kb() - baseline, "samples": samples, "results": results}))
+
+
+def _measure(backend: str, directory: str, queries_path: str, rescore: int = 4) -> Dict:
+    out = subprocess.run(
+        [sys.executable, "-m", "backend.benchmarks.bench_vector_store", "--probe", backend, directory, queries_path,
+         str(rescore)],
+        capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    if sys.argv[1:2] == ["--probe"]:
+        probe(sys.argv[2], sys.argv[3], sys.argv[4], int(sys.argv[5]))
+        return
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    dim = int(sys.argv[2]) if len(sys.argv) > 2 else 768
+    queries = int(sys.argv[3]) if len(sys.argv) > 3 else 100
+    vectors, probes = _dataset(n, dim, queries)
+    truth = [set(np.argsort(((vectors - q) ** 2).sum(axis=1))[:K].astype(str)) for q in probes]
+
+    print(f"vectors: {n}   dim: {dim}   queries: {queries}   top-{K}")
+    with tempfile.TemporaryDirectory() as workdir:
+        queries_path = os.path.join(workdir, "queries.npy")
+        np.save(queries_path, probes)
+        runs = [("chroma", "chroma", 4), ("numpy", "numpy", 4), ("numpy (int8 only)", "numpy", 0)]
+        built = {}
+        for label, backend, rescore in runs:
+            directory = os.path.join(workdir, backend)
+            if backend not in built:
+                built[backend] = _build(backend, directory, vectors)
+            stats = _measure(backend, directory, queries_path, rescore)
+            recall = statistics.mean(len(truth[i] & set(ids)) / K for i, ids in enumerate(stats["results"]))
+            print(f"{label:18s} build {n / built[backend]:8.0f} vec/s   load {stats['load'] * 1000:7.1f} ms   "
+                  f"memory {stats['rss_kb'] / 1024:7.1f} MB   disk {_disk(directory) / 2**20:7.1f} MB   "
+                  f"recall {recall:.3f}   query {_percentiles(stats['samples'])}")
+
+
+if __name__ == "__main__":
+    main()
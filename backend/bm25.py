@@ -0,0 +1,174 @@
+"""
+Lexical BM25 index of knowledge-base chunks.
+
+Vector search is good at paraphrases but routinely misses exact identifiers,
+error codes and function names. This inverted index is maintained next to the
+Chroma collection (same chunk ids, updated on every write and delete) and
+stored in SQLite beside it.
+
+The tokenizer keeps compound identifiers whole and also indexes their parts,
+so "get_vector_store", "ValueError" and "E1102" match both exactly and by
+their components ("vector", "error").
+
+reciprocal_rank_fusion() merges the BM25 and vector rankings;
+is_identifier() tells rag.py when a query can skip embedding altogether.
+"""
+import math
+import os
+import re
+import sqlite3
+import threading
+from collections import Counter
+from typing import AbstractSet, Dict, List, Optional, Sequence, Tuple
+
+# Words joined by ".", "::" or "-" stay one raw token (os.path.join, std::vector, ERR-42)
+_RAW_RE = re.compile(r"[A-Za-z0-9_]+(?:(?:\.|::|-)[A-Za-z0-9_]+)*")
+# camelCase / PascalCase / ACRONYMWord / digits
+_PART_RE = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|[0-9]+")
+_STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "do", "for", "from", "how", "in", "is",
+    "it", "of", "on", "or", "the", "this", "to", "was", "what", "when", "where", "which", "with",
+}
+
+
+def _parts(raw: str) -> List[str]:
+    return [p.lower() for p in _PART_RE.findall(raw)]
+
+
+def tokenize(text: str) -> List[str]:
+    tokens = []
+    for raw in _RAW_RE.findall(text):
+        parts = _parts(raw)
+        if len(parts) > 1:
+            tokens.append(raw.lower())
+        tokens.extend(p for p in parts if len(p) > 1 and p not in _STOPWORDS)
+    return tokens
+
+
+def is_identifier(query: str) -> bool:
+    """A single code-like token: snake_case, camelCase, dotted names, error codes."""
+    query = query.strip().strip("`'\"")
+    if query.endswith("()"):
+        query = query[:-2]
+    if not query or _RAW_RE.fullmatch(query) is None:
+        return False
+    return len(_parts(query)) > 1 or "_" in query or query.isdigit()
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], k: int = 60) -> List[str]:
+    """Merge ranked id lists; an id scores sum(1 / (k + rank)) over the lists it appears in."""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=lambda item: scores[item], reverse=True)
+
+
+class BM25Index:
+    """SQLite-backed inverted index with Okapi BM25 scoring."""
+
+    def __init__(self, db_path: Optional[str] = None, k1: float = 1.2, b: float = 0.75):
+        self.db_path = db_path or ":memory:"
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._docs = 0
+        self._total_length = 0
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._db is None:
+            if self.db_path != ":memory:":
+                os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._db.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS chunks (id TEXT PRIMARY KEY, length INTEGER);
+                CREATE TABLE IF NOT EXISTS postings (
+                    term TEXT, id TEXT, tf INTEGER, PRIMARY KEY (term, id)
+                ) WITHOUT ROWID;
+                CREATE INDEX IF NOT EXISTS postings_by_id ON postings (id);
+                """
+            )
+            self._docs, total = self._db.execute("SELECT COUNT(*), COALESCE(SUM(length), 0) FROM chunks").fetchone()
+            self._total_length = total
+        return self._db
+
+    def _remove(self, conn: sqlite3.Connection, ids: Sequence[str]):
+        for start in range(0, len(ids), 500):
+            part = list(ids[start:start + 500])
+            marks = ",".join("?" * len(part))
+            docs, total = conn.execute(
+                f"SELECT COUNT(*), COALESCE(SUM(length), 0) FROM chunks WHERE id IN ({marks})", part
+            ).fetchone()
+            conn.execute(f"DELETE FROM postings WHERE id IN ({marks})", part)
+            conn.execute(f"DELETE FROM chunks WHERE id IN ({marks})", part)
+            self._docs -= docs
+            self._total_length -= total
+
+    def add(self, ids: Sequence[str], texts: Sequence[str]):
+        """Index chunks, replacing any previous version with the same id."""
+        with self._lock:
+            conn = self._conn()
+            self._remove(conn, ids)
+            for chunk_id, text in zip(ids, texts):
+                counts = Counter(tokenize(text))
+                length = sum(counts.values())
+                conn.execute("INSERT INTO chunks (id, length) VALUES (?, ?)", (chunk_id, length))
+                conn.executemany(
+                    "INSERT INTO postings (term, id, tf) VALUES (?, ?, ?)",
+                    [(term, chunk_id, tf) for term, tf in counts.items()],
+                )
+                self._docs += 1
+                self._total_length += length
+            conn.commit()
+
+    def delete(self, ids: Sequence[str]):
+        with self._lock:
+            conn = self._conn()
+            self._remove(conn, ids)
+            conn.commit()
+
+    def clear(self):
+        with self._lock:
+            conn = self._conn()
+            conn.execute("DELETE FROM postings")
+            conn.execute("DELETE FROM chunks")
+            conn.commit()
+            self._docs = self._total_length = 0
+
+    def count(self) -> int:
+        with self._lock:
+            self._conn()
+            return self._docs
+
+    def search(self, query: str, k: int = 10, allowed: Optional[AbstractSet[str]] = None) -> List[Tuple[str, float]]:
+        """Top-k (chunk id, score) for a query, best first; `allowed` limits the candidates to those ids."""
+        terms = set(tokenize(query))
+        with self._lock:
+            conn = self._conn()
+            if not terms or not self._docs:
+                return []
+            avgdl = self._total_length / self._docs
+            scores: Dict[str, float] = {}
+            for term in terms:
+                rows = conn.execute(
+                    "SELECT p.id, p.tf, c.length FROM postings p JOIN chunks c ON c.id = p.id WHERE p.term = ?",
+                    (term,),
+                ).fetchall()
+                if not rows:
+                    continue
+                idf = math.log(1 + (self._docs - len(rows) + 0.5) / (len(rows) + 0.5))
+                for chunk_id, tf, length in rows:
+                    if allowed is not None and chunk_id not in allowed:
+                        continue
+                    norm = tf + self.k1 * (1 - self.b + self.b * length / avgdl)
+                    scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * tf * (self.k1 + 1) / norm
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return ranked[:k]
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
@@ -0,0 +1,344 @@
+"""
+Semantic index of the selected workspace's source code.
+
+When a workspace is selected, a background thread walks its source files,
+splits them along function and class boundaries (Python via ast, other
+languages via definition patterns) and ingests the chunks into a
+KnowledgeBase of their own, one per workspace under CODE_INDEX_DIR. The same
+thread rescans every CODE_INDEX_INTERVAL seconds; the manifest makes that
+cheap, since only files whose mtime/size changed are re-chunked, and only new
+chunks are embedded.
+
+The search_codebase tool queries the index (hybrid BM25 + vector search) and
+returns ranked snippets with file paths and line ranges, so the agent can
+find code without walking the tree with list_files/read_file.
+"""
+import ast
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from backend import rag
+from backend.config import (
+    CODE_CHUNK_MAX_LINES, CODE_INDEX_DIR, CODE_INDEX_ENABLED, CODE_INDEX_INTERVAL, CODE_INDEX_MAX_FILE_BYTES,
+    CODE_INDEX_MAX_FILES,
+)
+
+logger = logging.getLogger(__name__)
+
+# Resolved at import, before the server changes directory into a workspace
+CODE_INDEX_PATH = rag.index_dir(CODE_INDEX_DIR)
+
+LANGUAGES = {
+    ".py": "python", ".js": "javascript", ".jsx": "javascript", ".mjs": "javascript", ".ts": "typescript",
+    ".tsx": "typescript", ".go": "go", ".rs": "rust", ".java": "java", ".kt": "kotlin", ".scala": "scala",
+    ".c": "c", ".h": "c", ".cc": "cpp", ".cpp": "cpp", ".hpp": "cpp", ".cs": "csharp", ".rb": "ruby",
+    ".php": "php", ".swift": "swift", ".sh": "shell", ".sql": "sql", ".md": "markdown",
+}
+EXCLUDED_DIRS = {
+    ".git", "__pycache__", "node_modules", "venv", ".venv", ".pytest_cache", ".mypy_cache", ".tox", ".vscode",
+    ".idea", "dist", "build", "target", ".next", "uploads",
+    os.path.basename(rag.VECTOR_DB_DIR), os.path.basename(CODE_INDEX_PATH),
+}
+
+# Top-level definitions in brace/keyword languages
+_DEFINITION_RE = re.compile(
+    r"^(?:export\s+)?(?:default\s+)?(?:pub(?:\(\w+\))?\s+)?(?:public\s+|private\s+|protected\s+|internal\s+)?"
+    r"(?:static\s+|abstract\s+|final\s+)*(?:async\s+)?"
+    r"(?:function\*?|class|interface|type|enum|struct|trait|impl|fn|func|def|module|object)\s+(?P<name>[\w.]+)"
+    r"|^(?:export\s+)?(?:const|let|var)\s+(?P<var>\w+)\s*=\s*(?:async\s*)?(?:\(|function)"
+)
+
+
+@dataclass
+class CodeChunk:
+    start: int  # 1-based, inclusive
+    end: int
+    symbol: str
+    kind: str
+
+
+def _python_chunks(text: str, max_lines: int) -> List[CodeChunk]:
+    chunks = []
+    for node in ast.parse(text).body:
+        if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            continue
+        start = min([d.lineno for d in node.decorator_list] + [node.lineno])
+        kind = "class" if isinstance(node, ast.ClassDef) else "function"
+        methods = [n for n in getattr(node, "body", []) if isinstance(n, (ast.FunctionDef, ast.AsyncFunctionDef))]
+        if kind == "class" and methods and node.end_lineno - start + 1 > max_lines:
+            # Large class: the header (docstring, attributes) and each method separately
+            first = min([d.lineno for d in methods[0].decorator_list] + [methods[0].lineno])
+            chunks.append(CodeChunk(start, first - 1, node.name, "class"))
+            for method in methods:
+                method_start = min([d.lineno for d in method.decorator_list] + [method.lineno])
+                chunks.append(CodeChunk(method_start, method.end_lineno, f"{node.name}.{method.name}", "method"))
+        else:
+            chunks.append(CodeChunk(start, node.end_lineno, node.name, kind))
+    return chunks
+
+
+def _pattern_chunks(lines: List[str]) -> List[CodeChunk]:
+    starts = []
+    for number, line in enumerate(lines, start=1):
+        match = _DEFINITION_RE.match(line)
+        if match:
+            starts.append((number, match.group("name") or match.group("var")))
+    chunks = []
+    for i, (start, name) in enumerate(starts):
+        end = starts[i + 1][0] - 1 if i + 1 < len(starts) else len(lines)
+        while end > start and not lines[end - 1].strip():
+            end -= 1
+        chunks.append(CodeChunk(start, end, name, "definition"))
+    return chunks
+
+
+def _fill_gaps(chunks: List[CodeChunk], lines: List[str]) -> List[CodeChunk]:
+    """Add "module" chunks for non-blank lines outside any definition (imports, constants, scripts)."""
+    covered = [False] * (len(lines) + 2)
+    for chunk in chunks:
+        for n in range(chunk.start, chunk.end + 1):
+            covered[n] = True
+    result = list(chunks)
+    start = None
+    for n in range(1, len(lines) + 2):
+        inside = n <= len(lines) and not covered[n]
+        if inside and start is None:
+            start = n
+        elif not inside and start is not None:
+            filled = [i for i in range(start, n) if lines[i - 1].strip()]
+            if filled:
+                result.append(CodeChunk(filled[0], filled[-1], "<module>", "module"))
+            start = None
+    return sorted(result, key=lambda c: c.start)
+
+
+def _split_long(chunks: List[CodeChunk], max_lines: int) -> List[CodeChunk]:
+    result = []
+    for chunk in chunks:
+        if chunk.end - chunk.start + 1 <= max_lines:
+            result.append(chunk)
+            continue
+        for part, start in enumerate(range(chunk.start, chunk.end + 1, max_lines), start=1):
+            end = min(start + max_lines - 1, chunk.end)
+            result.append(CodeChunk(start, end, f"{chunk.symbol} (part {part})", chunk.kind))
+    return result
+
+
+def chunk_source(text: str, language: str, max_lines: int = CODE_CHUNK_MAX_LINES) -> List[CodeChunk]:
+    """Split a source file into definition-aligned chunks of at most max_lines lines."""
+    lines = text.splitlines()
+    chunks: List[CodeChunk] = []
+    if language == "python":
+        try:
+            chunks = _python_chunks(text, max_lines)
+        except SyntaxError:
+            chunks = []
+    elif language != "markdown":
+        chunks = _pattern_chunks(lines)
+    return _split_long(_fill_gaps(chunks, lines), max_lines)
+
+
+def iter_source_files(root: str, max_files: int = CODE_INDEX_MAX_FILES,
+                      max_bytes: int = CODE_INDEX_MAX_FILE_BYTES) -> List[str]:
+    """Indexable source files under root, skipping vendored, generated and hidden directories."""
+    files = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if d not in EXCLUDED_DIRS and not d.startswith("."))
+        for name in sorted(filenames):
+            if os.path.splitext(name)[1].lower() not in LANGUAGES:
+                continue
+            path = os.path.join(dirpath, name)
+            try:
+                if os.path.getsize(path) > max_bytes:
+                    continue
+            except OSError:
+                continue
+            files.append(path)
+            if len(files) >= max_files:
+                logger.warning(f"Code index of {root} truncated at {max_files} files")
+                return files
+    return files
+
+
+def load_code(path: str, root: str) -> list:
+    """Chunk one source file into Documents whose text starts with a path:lines header."""
+    from langchain_core.documents import Document
+
+    language = LANGUAGES.get(os.path.splitext(path)[1].lower(), "text")
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        text = f.read()
+    lines = text.splitlines()
+    rel = os.path.relpath(path, root)
+    docs = []
+    for chunk in chunk_source(text, language):
+        body = "\n".join(lines[chunk.start - 1:chunk.end])
+        docs.append(Document(
+            page_content=f"# {rel}:{chunk.start}-{chunk.end} {chunk.symbol}\n{body}",
+            metadata={
+                "source": path, "path": rel, "language": language, "symbol": chunk.symbol, "kind": chunk.kind,
+                "start_line": chunk.start, "end_line": chunk.end,
+            },
+        ))
+    return docs
+
+
+def format_hits(hits: List[rag.Hit]) -> str:
+    parts = []
+    for rank, hit in enumerate(hits, start=1):
+        meta = hit.metadata or {}
+        body = hit.text.split("\n", 1)[1] if hit.text.startswith("# ") else hit.text
+        parts.append(
+            f"{rank}. {meta.get('path')}:{meta.get('start_line')}-{meta.get('end_line')} "
+            f"{meta.get('symbol')} ({meta.get('kind')})\n```{meta.get('language', '')}\n{body}\n```"
+        )
+    return "\n\n".join(parts)
+
+
+class CodeIndexer:
+    """Keeps a per-workspace code index current from a background thread."""
+
+    def __init__(self, index_dir: str = CODE_INDEX_PATH, interval: float = CODE_INDEX_INTERVAL,
+                 enabled: bool = CODE_INDEX_ENABLED, embedding: Any = None):
+        self.index_dir = index_dir
+        self.interval = interval
+        self.enabled = enabled
+        self._embedding = embedding
+        self.workspace: Optional[str] = None
+        self._kb: Optional[rag.KnowledgeBase] = None
+        self._generation = 0
+        self._lock = threading.Lock()
+        # Held for a whole indexing pass, so a KnowledgeBase is never closed under one
+        self._indexing = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+        self.state = "idle"
+        self.files = 0
+        self.last_indexed: Optional[float] = None
+        self.last_report: Dict[str, Any] = {}
+
+    def _open(self, workspace: str) -> rag.KnowledgeBase:
+        shared = rag.get_knowledge_bases()
+        key = hashlib.sha256(workspace.encode()).hexdigest()[:16]
+        return rag.KnowledgeBase(
+            persist_directory=os.path.join(self.index_dir, key),
+            collection_name="code",
+            embedding=self._embedding or shared.embedding,
+            cache=shared.cache,  # one embedding cache for documents and code
+            pipeline=shared.pipeline,
+            loader=lambda path, on_page: load_code(path, workspace),
+        )
+
+    def select(self, workspace: str):
+        """Switch to a workspace and index it in the background."""
+        if not self.enabled:
+            return
+        workspace = os.path.abspath(workspace)
+        previous = None
+        with self._lock:
+            if workspace != self.workspace:
+                previous = self._kb
+                self.workspace = workspace
+                self._kb = self._open(workspace)
+                self._generation += 1
+                self.last_report = {}
+            if self._thread is None or not self._thread.is_alive():
+                self._stopped = False
+                self._thread = threading.Thread(target=self._loop, name="code-indexer", daemon=True)
+                self._thread.start()
+        if previous is not None:
+            # A pass over the old workspace sees the new generation and stops after its current file
+            with self._indexing:
+                previous.close()
+        self._wake.set()
+
+    def refresh(self):
+        """Rescan now instead of waiting for the next interval."""
+        self._wake.set()
+
+    def _loop(self):
+        while not self._stopped:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._stopped:
+                break
+            try:
+                self.index_now()
+            except Exception as e:
+                logger.error(f"Indexing {self.workspace} failed: {e}")
+                self.state = "error"
+
+    def index_now(self) -> Dict[str, Any]:
+        """Synchronise the index with the workspace; returns the reindex report."""
+        with self._indexing:
+            with self._lock:
+                workspace, kb, generation = self.workspace, self._kb, self._generation
+            if kb is None:
+                raise RuntimeError("No workspace selected.")
+            self.state = "indexing"
+            started = time.perf_counter()
+            files = iter_source_files(workspace)
+            self.files = len(files)
+            report = kb.reindex(
+                workspace, files=files, stop=lambda: self._stopped or generation != self._generation
+            )
+            if generation == self._generation:
+                self.state = "idle"
+                self.last_indexed = time.time()
+                self.last_report = {
+                    key: len(value) if isinstance(value, (list, dict)) else value
+                    for key, value in report.items() if key not in ("directory", "dry_run")
+                }
+                changed = self.last_report["added"] + self.last_report["updated"] + self.last_report["removed"]
+                if changed:
+                    logger.info(f"Code index of {workspace}: {changed} files changed in {time.perf_counter() - started:.1f}s")
+            return report
+
+    def _current(self) -> rag.KnowledgeBase:
+        with self._lock:
+            if self._kb is None:
+                raise RuntimeError("No workspace selected." if self.enabled else "Code index is disabled.")
+            return self._kb
+
+    def search(self, query: str, k: int = 8) -> List[rag.Hit]:
+        return self._current().search(query, k)
+
+    async def asearch(self, query: str, k: int = 8) -> List[rag.Hit]:
+        return await self._current().asearch(query, k)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "workspace": self.workspace,
+            "state": self.state,
+            "files": self.files,
+            "last_indexed": self.last_indexed,
+            "last_report": self.last_report,
+        }
+
+    def stop(self):
+        self._stopped = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        with self._indexing, self._lock:
+            if self._kb is not None:
+                self._kb.close()
+
+
+code_indexer = CodeIndexer()
+
+
+def describe_results(hits: List[rag.Hit], indexer: CodeIndexer) -> str:
+    """Tool output for search_codebase."""
+    if hits:
+        return format_hits(hits)
+    if indexer.state == "indexing" or indexer.last_indexed is None:
+        return f"No matches yet; the workspace index is still being built ({indexer.files} files found)."
+    return "No matching code found in the workspace."
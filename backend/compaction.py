@@ -0,0 +1,218 @@
+"""
+Token-budgeted conversation compaction for the agent node.
+
+Before each LLM call the thread history is checked against the model's prompt
+budget. When it is over budget:
+  1. tool outputs older than the last N turns are replaced by short stubs
+     (in the prompt only; the checkpoint keeps the originals), and
+  2. if that is not enough, everything older than the last N turns is folded
+     into a rolling summary which is stored in the checkpoint, and the folded
+     messages are removed from the thread state.
+
+The system prompt and the last N turns are always sent verbatim.
+"""
+import json
+import logging
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage, ToolMessage
+
+from backend.config import CONTEXT_TOKEN_BUDGET, KEEP_LAST_TURNS, MODEL_TOKEN_BUDGETS, TOOL_STUB_CHARS
+
+logger = logging.getLogger(__name__)
+
+# Rough chars-per-token ratio; good enough for budgeting without a tokenizer
+CHARS_PER_TOKEN = 4
+MESSAGE_OVERHEAD_TOKENS = 4
+
+SUMMARY_PROMPT = (
+    "You maintain a running summary of a conversation between a user and a coding assistant. "
+    "Update the summary with the new messages below. Keep file paths, decisions, open tasks and "
+    "any facts the assistant will need later. Be concise. Output only the updated summary."
+)
+
+
+def budget_for(model_name: str) -> int:
+    """Prompt token budget for a model."""
+    return MODEL_TOKEN_BUDGETS.get(model_name, CONTEXT_TOKEN_BUDGET)
+
+
+def _content_text(content: Any) -> str:
+    if isinstance(content, str):
+        return content
+    return json.dumps(content, default=str)
+
+
+def estimate_tokens(messages: List[BaseMessage]) -> int:
+    """Approximate the prompt size of a list of messages in tokens."""
+    chars = 0
+    for msg in messages:
+        chars += len(_content_text(msg.content))
+        tool_calls = getattr(msg, "tool_calls", None)
+        if tool_calls:
+            chars += len(json.dumps(tool_calls, default=str))
+    return chars // CHARS_PER_TOKEN + MESSAGE_OVERHEAD_TOKENS * len(messages)
+
+
+def recent_turns_start(messages: List[BaseMessage], keep_turns: int) -> int:
+    """Index of the first message of the last `keep_turns` turns (a turn starts at a HumanMessage)."""
+    human_idx = [i for i, m in enumerate(messages) if isinstance(m, HumanMessage)]
+    if keep_turns <= 0 or len(human_idx) <= keep_turns:
+        return 0
+    return human_idx[-keep_turns]
+
+
+def stub_tool_message(msg: ToolMessage) -> ToolMessage:
+    """Replace a tool output with a short stub that keeps its call id."""
+    text = _content_text(msg.content)
+    if len(text) <= TOOL_STUB_CHARS:
+        return msg
+    stub = f"{text[:TOOL_STUB_CHARS]}... [tool output truncated, {len(text)} chars]"
+    return msg.model_copy(update={"content": stub})
+
+
+def with_summary(system_prompt: str, summary: str) -> str:
+    """Append the rolling summary to the system prompt."""
+    if not summary:
+        return system_prompt
+    return f"{system_prompt}\n\nSummary of the earlier conversation:\n{summary}"
+
+
+@dataclass
+class CompactionResult:
+    messages: List[BaseMessage]
+    summary: str
+    removed_ids: List[str] = field(default_factory=list)
+    tokens_before: int = 0
+    tokens_after: int = 0
+    stage: str = "none"
+
+
+class PromptMetrics:
+    """Per-call prompt-size metrics, exposed on GET /metrics."""
+
+    def __init__(self, history: int = 100):
+        self._lock = threading.Lock()
+        self._recent = deque(maxlen=history)
+        self.calls = 0
+        self.compactions = 0
+        self.summaries = 0
+        self.tokens_saved = 0
+
+    def record(self, model_name: str, result: CompactionResult):
+        with self._lock:
+            self.calls += 1
+            if result.stage != "none":
+                self.compactions += 1
+            if result.stage == "summary":
+                self.summaries += 1
+            self.tokens_saved += result.tokens_before - result.tokens_after
+            self._recent.append({
+                "model": model_name,
+                "tokens_before": result.tokens_before,
+                "tokens_after": result.tokens_after,
+                "messages": len(result.messages),
+                "stage": result.stage,
+            })
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            recent = list(self._recent)
+            sizes = [r["tokens_after"] for r in recent]
+            return {
+                "calls": self.calls,
+                "compactions": self.compactions,
+                "summaries": self.summaries,
+                "tokens_saved": self.tokens_saved,
+                "avg_prompt_tokens": round(sum(sizes) / len(sizes), 1) if sizes else 0,
+                "max_prompt_tokens": max(sizes) if sizes else 0,
+                "last": recent[-1] if recent else None,
+            }
+
+
+prompt_metrics = PromptMetrics()
+
+
+def _render_for_summary(messages: List[BaseMessage]) -> str:
+    lines = []
+    for msg in messages:
+        text = _content_text(msg.content)
+        if isinstance(msg, ToolMessage):
+            text = _content_text(stub_tool_message(msg).content)
+        tool_calls = getattr(msg, "tool_calls", None)
+        if tool_calls:
+            text += " [tool calls: " + ", ".join(c["name"] for c in tool_calls) + "]"
+        lines.append(f"{msg.type}: {text}")
+    return "\n".join(lines)
+
+
+async def summarize(llm, summary: str, messages: List[BaseMessage]) -> str:
+    """Fold `messages` into the running `summary` using `llm`."""
+    prompt = [
+        SystemMessage(content=SUMMARY_PROMPT),
+        HumanMessage(content=(
+            f"Current summary:\n{summary or '(none)'}\n\n"
+            f"New messages:\n{_render_for_summary(messages)}"
+        )),
+    ]
+    # Tagged "nostream" so summary tokens are not streamed to the chat client
+    response = await llm.ainvoke(prompt, config={"tags": ["nostream"]})
+    return _content_text(response.content).strip()
+
+
+async def compact(
+    messages: List[BaseMessage],
+    summary: str,
+    system_prompt: str,
+    model_name: str,
+    llm,
+    keep_turns: int = KEEP_LAST_TURNS,
+    budget: Optional[int] = None,
+) -> CompactionResult:
+    """
+    Fit the thread history into the model's prompt budget.
+
+    `messages` is the thread history without the system prompt; `llm` is an
+    unbound chat model used to update the summary. The returned messages do
+    not include the system prompt either; use with_summary() to build it.
+    """
+    budget = budget if budget is not None else budget_for(model_name)
+    system_tokens = estimate_tokens([SystemMessage(content=with_summary(system_prompt, summary))])
+
+    tokens_before = system_tokens + estimate_tokens(messages)
+    result = CompactionResult(messages=list(messages), summary=summary,
+                              tokens_before=tokens_before, tokens_after=tokens_before)
+    if tokens_before <= budget:
+        return result
+
+    cut = recent_turns_start(messages, keep_turns)
+    if cut == 0:
+        # Nothing older than the protected turns; send as is
+        return result
+
+    # Stage 1: stub old tool outputs in the prompt
+    head = [stub_tool_message(m) if isinstance(m, ToolMessage) else m for m in messages[:cut]]
+    tail = list(messages[cut:])
+    stubbed_tokens = system_tokens + estimate_tokens(head + tail)
+    result.messages = head + tail
+    result.tokens_after = stubbed_tokens
+    result.stage = "stub"
+    if stubbed_tokens <= budget:
+        return result
+
+    # Stage 2: fold everything before the protected turns into the summary
+    try:
+        new_summary = await summarize(llm, summary, messages[:cut])
+    except Exception as e:
+        logger.warning(f"Conversation summary failed, sending stubbed history: {e}")
+        return result
+
+    result.summary = new_summary
+    result.messages = tail
+    result.removed_ids = [m.id for m in messages[:cut] if m.id]
+    result.tokens_after = estimate_tokens([SystemMessage(content=with_summary(system_prompt, new_summary))] + tail)
+    result.stage = "summary"
+    return result
@@ -1,4 +1,5 @@
 import os
+import json
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -9,5 +10,128 @@ API_KEY = os.getenv("GEMINI_API_KEY")
 BASE_URL = "https://generativelanguage.googleapis.com/v1beta/openai/"
 MODEL_NAME = "gemini-2.5-flash"
 
+# LLM client registry (see backend/llm_registry.py)
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "64"))
+LLM_HTTP_MAX_CONNECTIONS = int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "20"))
+LLM_HTTP_TIMEOUT = float(os.getenv("LLM_HTTP_TIMEOUT", "120"))
+
+# Conversation compaction (see backend/compaction.py)
+# Prompt token budget per model; MODEL_TOKEN_BUDGETS='{"model": tokens}' overrides entries
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "32000"))
+MODEL_TOKEN_BUDGETS = {
+    "gemini-2.5-flash": 32000,
+    "gemini-2.5-pro": 64000,
+    **json.loads(os.getenv("MODEL_TOKEN_BUDGETS", "{}")),
+}
+KEEP_LAST_TURNS = int(os.getenv("KEEP_LAST_TURNS", "4"))
+TOOL_STUB_CHARS = int(os.getenv("TOOL_STUB_CHARS", "200"))
+
+# Per-turn tool selection (see backend/tool_router.py)
+TOOL_ROUTER_ENABLED = os.getenv("TOOL_ROUTER_ENABLED", "true").lower() == "true"
+TOOL_ROUTER_TOP_K = int(os.getenv("TOOL_ROUTER_TOP_K", "8"))
+TOOL_ROUTER_MIN_SCORE = float(os.getenv("TOOL_ROUTER_MIN_SCORE", "0.2"))
+TOOL_ROUTER_PINNED = [
+    name.strip()
+    for name in os.getenv("TOOL_ROUTER_PINNED", "read_file,write_file,list_files,run_command").split(",")
+    if name.strip()
+]
+
+# Tool execution (see backend/tool_executor.py)
+TOOL_CONCURRENCY = int(os.getenv("TOOL_CONCURRENCY", "4"))
+TOOL_TIMEOUT = float(os.getenv("TOOL_TIMEOUT", "60"))
+# Per-tool overrides, e.g. TOOL_TIMEOUTS='{"network_speed_test": 120}'
+TOOL_TIMEOUTS = {
+    "run_command": 35,
+    "network_speed_test": 120,
+    **json.loads(os.getenv("TOOL_TIMEOUTS", "{}")),
+}
+# Tell the model that independent tool calls may be batched into one step
+PARALLEL_TOOL_CALLS = os.getenv("PARALLEL_TOOL_CALLS", "false").lower() == "true"
+
+# Shared async HTTP client for network tools (see backend/http_client.py)
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "10"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "50"))
+HTTP_MAX_PER_HOST = int(os.getenv("HTTP_MAX_PER_HOST", "8"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+
+# Tool result memoization (see backend/memo.py); set MEMO_CACHE_DB to a path to persist entries
+MEMO_CACHE_SIZE = int(os.getenv("MEMO_CACHE_SIZE", "512"))
+MEMO_CACHE_DB = os.getenv("MEMO_CACHE_DB", "")
+
+# Worker processes for CPU-bound tools (see backend/process_pool.py); 0 runs them in-process
+CPU_POOL_SIZE = int(os.getenv("CPU_POOL_SIZE", str(min(2, os.cpu_count() or 1))))
+CPU_TOOL_TIMEOUT = float(os.getenv("CPU_TOOL_TIMEOUT", "30"))
+# Longest a worker may spend on its preload (imports, NLP model loading) before it is replaced;
+# that time does not count against CPU_TOOL_TIMEOUT
+CPU_WORKER_START_TIMEOUT = float(os.getenv("CPU_WORKER_START_TIMEOUT", "600"))
+
+# Micro-batched NLP inference (see backend/batching.py)
+NLP_BATCH_MAX_SIZE = int(os.getenv("NLP_BATCH_MAX_SIZE", "16"))
+NLP_BATCH_WINDOW_MS = float(os.getenv("NLP_BATCH_WINDOW_MS", "10"))
+# Build the sentiment and summarization pipelines when a CPU pool worker starts, not on its first call
+NLP_PRELOAD_MODELS = os.getenv("NLP_PRELOAD_MODELS", "true").lower() == "true"
+
+# Background knowledge-base ingestion (see backend/ingest_jobs.py)
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "32"))
+# Chunks per embedding request; progress is reported after each batch
+INGEST_EMBED_BATCH = int(os.getenv("INGEST_EMBED_BATCH", "64"))
+# Rate-adaptive embedding during ingestion (see backend/embed_pipeline.py): batches in flight at most,
+# retries per failed batch, exponential back-off bounds in seconds and the factor applied to concurrency on a 429
+EMBED_MAX_CONCURRENCY = int(os.getenv("EMBED_MAX_CONCURRENCY", "4"))
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", "5"))
+EMBED_BACKOFF_BASE = float(os.getenv("EMBED_BACKOFF_BASE", "0.5"))
+EMBED_BACKOFF_MAX = float(os.getenv("EMBED_BACKOFF_MAX", "30"))
+EMBED_AIMD_DECREASE = float(os.getenv("EMBED_AIMD_DECREASE", "0.5"))
+# Documents are streamed: PDFs are parsed this many pages per reader, text files in segments of this many characters
+INGEST_PAGE_WINDOW = int(os.getenv("INGEST_PAGE_WINDOW", "16"))
+TEXT_SEGMENT_CHARS = int(os.getenv("TEXT_SEGMENT_CHARS", "65536"))
+# Longest text the pdf_to_text tool returns (0: no limit); extraction stops at the page that reaches it
+PDF_TEXT_MAX_CHARS = int(os.getenv("PDF_TEXT_MAX_CHARS", "0"))
+
+# Document embedding cache (see backend/embedding_cache.py); relative paths resolve against the startup directory
+EMBEDDING_CACHE_DB = os.getenv("EMBEDDING_CACHE_DB", "embedding_cache.sqlite")
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "4096"))
+
+# Knowledge-base retrieval: BM25 + vector search merged by reciprocal-rank fusion (see backend/bm25.py)
+RAG_HYBRID = os.getenv("RAG_HYBRID", "true").lower() == "true"
+RAG_FUSION_CANDIDATES = int(os.getenv("RAG_FUSION_CANDIDATES", "20"))
+RAG_RRF_K = int(os.getenv("RAG_RRF_K", "60"))
+# Repeated-query caches in backend/rag.py: result ids per query (dropped on every write) and query embeddings
+RAG_QUERY_CACHE_SIZE = int(os.getenv("RAG_QUERY_CACHE_SIZE", "256"))
+RAG_QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("RAG_QUERY_EMBEDDING_CACHE_SIZE", "1024"))
+# Query embeddings requested at the same time are sent as one batch (see backend/batching.py)
+RAG_QUERY_BATCHING = os.getenv("RAG_QUERY_BATCHING", "true").lower() == "true"
+RAG_QUERY_BATCH_SIZE = int(os.getenv("RAG_QUERY_BATCH_SIZE", "32"))
+RAG_QUERY_BATCH_WINDOW_MS = float(os.getenv("RAG_QUERY_BATCH_WINDOW_MS", "5"))
+RAG_QUERY_BATCH_CONCURRENCY = int(os.getenv("RAG_QUERY_BATCH_CONCURRENCY", "4"))
+
+# Semantic index of the selected workspace's source code (see backend/code_index.py)
+CODE_INDEX_ENABLED = os.getenv("CODE_INDEX_ENABLED", "true").lower() == "true"
+CODE_INDEX_DIR = os.getenv("CODE_INDEX_DIR", "code_index")
+# Seconds between rescans for changed files
+CODE_INDEX_INTERVAL = float(os.getenv("CODE_INDEX_INTERVAL", "30"))
+CODE_INDEX_MAX_FILES = int(os.getenv("CODE_INDEX_MAX_FILES", "5000"))
+CODE_INDEX_MAX_FILE_BYTES = int(os.getenv("CODE_INDEX_MAX_FILE_BYTES", "262144"))
+CODE_CHUNK_MAX_LINES = int(os.getenv("CODE_CHUNK_MAX_LINES", "80"))
+
+# Embedding provider for the knowledge base and code index (see backend/embeddings.py):
+# "gemini" (remote), "hashing" (local, no model download) or "sentence-transformers" (local EMBEDDING_MODEL)
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "gemini").lower()
+EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", "512"))
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+
+# Knowledge-base vector store: "chroma", or "numpy" for the memory-mapped int8 store in backend/numpy_store.py
+VECTOR_STORE = os.getenv("VECTOR_STORE", "chroma").lower()
+# numpy store: candidates per requested result re-scored with the float32 vectors (0 ranks by the int8 scan alone)
+NUMPY_STORE_RESCORE = int(os.getenv("NUMPY_STORE_RESCORE", "4"))
+
+# Where indexes, uploads and the embedding cache live; empty means the directory the server starts in
+DATA_DIR = os.getenv("DATA_DIR", "")
+# Knowledge-base collections (one per workspace/tenant, see KnowledgeBases in backend/rag.py):
+# handles kept open at once (least recently used are closed) and collections allowed on disk
+KB_MAX_OPEN_COLLECTIONS = int(os.getenv("KB_MAX_OPEN_COLLECTIONS", "8"))
+KB_MAX_COLLECTIONS = int(os.getenv("KB_MAX_COLLECTIONS", "100"))
+
 if not API_KEY:
     raise ValueError("GEMINI_API_KEY not found in environment variables. Please check your .env file.")
@@ -8,161 +8,141 @@ import uuid
 import zipfile
 import secrets
 import string
+import asyncio
+from backend.http_client import http
+from backend.memo import memoize
+from backend.process_pool import cpu_bound
+from backend.batching import MicroBatcher
+from backend.config import NLP_PRELOAD_MODELS, PDF_TEXT_MAX_CHARS, VECTOR_STORE
 
 # ----------------- Optional Dependencies -----------------
+# Resolved lazily on first use (see backend/lazy.py) so importing this module
+# stays cheap. `if not dep:` checks installation without importing it.
+
+from backend.lazy import lazy_import
 
 # System info
-try:
-    import psutil
-except ImportError:
-    psutil = None
+psutil = lazy_import("psutil")
 
 # DuckDuckGo search
-try:
-    from duckduckgo_search import DDGS
-except ImportError:
-    DDGS = None
+DDGS = lazy_import("duckduckgo_search", "DDGS", package="duckduckgo-search")
 
 # Wikipedia
-try:
-    import wikipedia
-except ImportError:
-    wikipedia = None
+wikipedia = lazy_import("wikipedia")
 
 # BeautifulSoup for HTML parsing
-try:
-    from bs4 import BeautifulSoup
-except ImportError:
-    BeautifulSoup = None
+BeautifulSoup = lazy_import("bs4", "BeautifulSoup", package="beautifulsoup4")
 
 # Translation
-try:
-    from deep_translator import GoogleTranslator
-except ImportError:
-    GoogleTranslator = None
+GoogleTranslator = lazy_import("deep_translator", "GoogleTranslator", package="deep-translator")
 
 # Language detection
-try:
-    from langdetect import detect as langdetect_detect
-except ImportError:
-    langdetect_detect = None
+langdetect_detect = lazy_import("langdetect", "detect")
 
 # Transformers for NLP (sentiment, summarization)
-try:
-    from transformers import pipeline as hf_pipeline
-except ImportError:
-    hf_pipeline = None
+hf_pipeline = lazy_import("transformers", "pipeline")
 
 # Sympy for symbolic math
-try:
-    import sympy as sp
-except ImportError:
-    sp = None
+sp = lazy_import("sympy")
 
 # Geopy for geocoding
-try:
-    from geopy.geocoders import Nominatim
-except ImportError:
-    Nominatim = None
+Nominatim = lazy_import("geopy.geocoders", "Nominatim", package="geopy")
 
 # Pillow for image info
-try:
-    from PIL import Image
-except ImportError:
-    Image = None
+Image = lazy_import("PIL.Image", package="Pillow")
 
 # Text-to-speech
-try:
-    import pyttsx3
-except ImportError:
-    pyttsx3 = None
+pyttsx3 = lazy_import("pyttsx3")
 
 # yfinance for ticker prices
-try:
-    import yfinance as yf
-except ImportError:
-    yf = None
+yf = lazy_import("yfinance")
 
 # Markdown
-try:
-    import markdown as md_lib
-except ImportError:
-    md_lib = None
+md_lib = lazy_import("markdown")
 
 # Timezone conversion
-try:
-    import pytz
-except ImportError:
-    pytz = None
+pytz = lazy_import("pytz")
 
 # RSS
-try:
-    import feedparser
-except ImportError:
-    feedparser = None
+feedparser = lazy_import("feedparser")
 
 # Holidays
-try:
-    import holidays
-except ImportError:
-    holidays = None
+holidays = lazy_import("holidays")
 
 # QR code
-try:
-    import qrcode
-except ImportError:
-    qrcode = None
+qrcode = lazy_import("qrcode")
 
 # PDF
-try:
-    import PyPDF2
-except ImportError:
-    PyPDF2 = None
+PyPDF2 = lazy_import("PyPDF2")
 
 # Network speed test
-try:
-    import speedtest
-except ImportError:
-    speedtest = None
+speedtest = lazy_import("speedtest", package="speedtest-cli")
 
 # Clipboard
-try:
-    import pyperclip
-except ImportError:
-    pyperclip = None
+pyperclip = lazy_import("pyperclip")
 
 # Code formatter
-try:
-    import black
-except ImportError:
-    black = None
+black = lazy_import("black")
 
 # Linter
-try:
-    from flake8.api import legacy as flake8_legacy
-except ImportError:
-    flake8_legacy = None
+flake8_legacy = lazy_import("flake8.api.legacy", package="flake8")
+
+# RAG (imports the vector store and the embedding client, so it is resolved on first search)
+rag = lazy_import("backend.rag")
+code_index = lazy_import("backend.code_index")
+# What the RAG tools need installed: the proxies above only probe "backend", which
+# always exists. The numpy vector store needs nothing beyond the core requirements.
+chromadb = lazy_import("chromadb")
+vector_store_deps = {"chromadb": chromadb} if VECTOR_STORE == "chroma" else {}
+
 
-# RAG
-try:
-    from backend.rag import query_knowledge_base
-except ImportError:
-    query_knowledge_base = None
+def _vector_store_missing():
+    """The "not installed" error of the RAG tools, or None when the vector store can be used."""
+    missing = [package for package, dep in vector_store_deps.items() if not dep]
+    return f"Error: '{missing[0]}' library not installed." if missing else None
 
 # ========================= CORE TOOLS =========================
 
-def search_knowledge_base(query: str):
-    """Search the uploaded documents (PDF/Text) for answers."""
-    if query_knowledge_base is None:
-        return "Error: RAG module not initialized or dependencies missing."
+def _knowledge_filter(source: str, workspace: str, page_from: int, page_to: int,
+                      uploaded_after: str, uploaded_before: str):
+    sources = [s.strip() for s in source.split(",")] if source else None
+    return rag.build_filter(sources, workspace, page_from, page_to, uploaded_after, uploaded_before)
+
+def _format_knowledge_hits(hits):
+    if not hits:
+        return "No relevant information found in the knowledge base."
+    parts = []
+    for hit in hits:
+        meta = hit.metadata or {}
+        where = meta.get("filename") or os.path.basename(meta.get("source", ""))
+        if "page" in meta:
+            where += f", page {meta['page'] + 1}"
+        parts.append(f"[{where}]\n{hit.text}")
+    return "\n\n---\n\n".join(parts)
+
+def search_knowledge_base(query: str, source: str = "", workspace: str = "", page_from: int = 0, page_to: int = 0,
+                          uploaded_after: str = "", uploaded_before: str = ""):
+    """Search the uploaded documents (PDF/Text) for answers. Optionally limit to files (comma-separated names), a workspace path, a 1-based page range, or an upload time range (ISO dates)."""
+    missing = _vector_store_missing()
+    if missing:
+        return missing
     try:
-        results = query_knowledge_base(query)
-        if not results:
-            return "No relevant information found in the knowledge base."
-        return "\n\n---\n\n".join(results)
+        where = _knowledge_filter(source, workspace, page_from, page_to, uploaded_after, uploaded_before)
+        return _format_knowledge_hits(rag.search_knowledge_base(query, where=where))
     except Exception as e:
         return f"Error searching knowledge base: {str(e)}"
 
+def search_codebase(query: str, k: int = 8):
+    """Search the current workspace's source code by meaning or identifier. Returns ranked snippets with file paths and line ranges."""
+    missing = _vector_store_missing()
+    if missing:
+        return missing
+    try:
+        hits = code_index.code_indexer.search(query, k)
+        return code_index.describe_results(hits, code_index.code_indexer)
+    except Exception as e:
+        return f"Error searching codebase: {str(e)}"
+
 def get_weather(city: str):
     """Get current weather for a city."""
     try:
@@ -264,7 +244,7 @@ def get_time(_=None):
 # 1) Wikipedia summary
 def wiki_summary(query: str, sentences: int = 3):
     """Get a short summary from Wikipedia."""
-    if wikipedia is None:
+    if not wikipedia:
         return "Error: 'wikipedia' library not installed."
     try:
         return wikipedia.summary(query, sentences=sentences)
@@ -310,7 +290,7 @@ def get_public_ip(_=None):
 # 5) Fetch page title
 def fetch_page_title(url: str):
     """Fetch the <title> of a URL."""
-    if BeautifulSoup is None:
+    if not BeautifulSoup:
         return "Error: 'beautifulsoup4' library not installed."
     try:
         r = requests.get(url, timeout=5)
@@ -324,7 +304,7 @@ def fetch_page_title(url: str):
 # 6) Translate text
 def translate_text(text: str, target_lang: str = "en"):
     """Translate text using GoogleTranslator (deep-translator)."""
-    if GoogleTranslator is None:
+    if not GoogleTranslator:
         return "Error: 'deep-translator' library not installed."
     try:
         return GoogleTranslator(source="auto", target=target_lang).translate(text)
@@ -335,7 +315,7 @@ def translate_text(text: str, target_lang: str = "en"):
 # 7) Detect language
 def detect_language(text: str):
     """Detect language of text."""
-    if langdetect_detect is None:
+    if not langdetect_detect:
         return "Error: 'langdetect' library not installed."
     try:
         lang = langdetect_detect(text)
@@ -345,43 +325,109 @@ def detect_language(text: str):
 
 
 # 8) Sentiment analysis
+# Single and list calls are queued and run as one padded batch (backend/batching.py);
+# the batch itself executes in the CPU pool.
 _sentiment_pipe = None
+_summarizer = None
+
+def _sentiment_model():
+    global _sentiment_pipe
+    if _sentiment_pipe is None:
+        _sentiment_pipe = hf_pipeline("sentiment-analysis")
+    return _sentiment_pipe
+
+def _summarization_model():
+    global _summarizer
+    if _summarizer is None:
+        _summarizer = hf_pipeline("summarization")
+    return _summarizer
+
+def _load_nlp_models():
+    """
+    CPU pool warm-up hook: build both pipelines when a worker starts, outside
+    the per-call timeout, so a first (or post-timeout) batch does not have to
+    load a model within CPU_TOOL_TIMEOUT.
+    """
+    if not NLP_PRELOAD_MODELS or not hf_pipeline:
+        return
+    for load in (_sentiment_model, _summarization_model):
+        try:
+            load()
+        except Exception:
+            pass  # loaded (and reported) on the first call instead
+
+_NLP_PRELOAD = ("transformers", "backend.core_tools:_load_nlp_models")
+
+@cpu_bound(preload=_NLP_PRELOAD)
+def _run_sentiment(texts: list):
+    return _sentiment_model()(texts, batch_size=len(texts))
+
+sentiment_batcher = MicroBatcher("sentiment", lambda _, texts: _run_sentiment(texts))
+
+def _format_sentiment(result):
+    if isinstance(result, str):
+        return result
+    return f"Label: {result['label']}, score: {result['score']:.3f}"
+
 def sentiment(text: str):
     """Sentiment analysis using transformers."""
-    global _sentiment_pipe
-    if hf_pipeline is None:
+    if not hf_pipeline:
+        return "Error: 'transformers' library not installed."
+    try:
+        return _format_sentiment(sentiment_batcher.submit(text).result())
+    except Exception as e:
+        return f"Error in sentiment analysis: {e}"
+
+
+def sentiment_batch(texts: list[str]):
+    """Sentiment analysis for a list of texts in one batched call."""
+    if not hf_pipeline:
         return "Error: 'transformers' library not installed."
     try:
-        if _sentiment_pipe is None:
-            _sentiment_pipe = hf_pipeline("sentiment-analysis")
-        result = _sentiment_pipe(text)[0]
-        return f"Label: {result['label']}, score: {result['score']:.3f}"
+        futures = sentiment_batcher.submit_many(texts)
+        return "\n".join(f"{i}. {_format_sentiment(f.result())}" for i, f in enumerate(futures, 1))
     except Exception as e:
         return f"Error in sentiment analysis: {e}"
 
 
 # 9) Text summarization
-_summarizer = None
+@cpu_bound(preload=_NLP_PRELOAD)
+def _run_summarize(texts: list, max_tokens: int):
+    results = _summarization_model()(
+        texts, max_length=max_tokens, min_length=30, do_sample=False, batch_size=len(texts)
+    )
+    return [r["summary_text"] for r in results]
+
+# Batches are keyed by max_tokens so only requests with the same limit are mixed
+summarize_batcher = MicroBatcher("summarize", lambda max_tokens, texts: _run_summarize(texts, max_tokens))
+
 def summarize_text(text: str, max_tokens: int = 130):
     """Summarize text using transformers."""
-    global _summarizer
-    if hf_pipeline is None:
+    if not hf_pipeline:
         return "Error: 'transformers' library not installed."
     try:
-        if _summarizer is None:
-            _summarizer = hf_pipeline("summarization")
-        summary = _summarizer(
-            text, max_length=max_tokens, min_length=30, do_sample=False
-        )[0]["summary_text"]
-        return summary
+        return summarize_batcher.submit(text, key=max_tokens).result()
+    except Exception as e:
+        return f"Error summarizing: {e}"
+
+
+def summarize_batch(texts: list[str], max_tokens: int = 130):
+    """Summarize a list of texts in one batched call."""
+    if not hf_pipeline:
+        return "Error: 'transformers' library not installed."
+    try:
+        futures = summarize_batcher.submit_many(texts, key=max_tokens)
+        return "\n\n".join(f"{i}. {f.result()}" for i, f in enumerate(futures, 1))
     except Exception as e:
         return f"Error summarizing: {e}"
 
 
 # 10) Solve equation (symbolic)
+@memoize()
+@cpu_bound(preload=("sympy",))
 def solve_equation(equation: str, var: str = "x"):
     """Solve a simple equation like '2*x + 3 = 7'."""
-    if sp is None:
+    if not sp:
         return "Error: 'sympy' library not installed."
     try:
         x = sp.symbols(var)
@@ -396,7 +442,7 @@ def solve_equation(equation: str, var: str = "x"):
 # 11) Disk usage
 def get_disk_usage(path: str = "/"):
     """Get disk usage for a path."""
-    if psutil is None:
+    if not psutil:
         return "Error: 'psutil' library not installed."
     try:
         du = psutil.disk_usage(path)
@@ -411,7 +457,7 @@ def get_disk_usage(path: str = "/"):
 # 12) List processes
 def list_processes(limit: int = 10):
     """List top processes by CPU usage."""
-    if psutil is None:
+    if not psutil:
         return "Error: 'psutil' library not installed."
     try:
         procs = []
@@ -478,7 +524,7 @@ def list_todos(_=None):
 def convert_time(time_str: str, from_tz: str, to_tz: str,
                  fmt: str = "%Y-%m-%d %H:%M"):
     """Convert time between timezones."""
-    if pytz is None:
+    if not pytz:
         return "Error: 'pytz' library not installed."
     try:
         from_zone = pytz.timezone(from_tz)
@@ -492,15 +538,19 @@ def convert_time(time_str: str, from_tz: str, to_tz: str,
 
 # 17–18) Geocoding & reverse geocoding
 _geocoder = None
-if Nominatim is not None:
-    _geocoder = Nominatim(user_agent="agent_tools")
+def _get_geocoder():
+    """Create the Nominatim geocoder on first use."""
+    global _geocoder
+    if _geocoder is None:
+        _geocoder = Nominatim(user_agent="agent_tools")
+    return _geocoder
 
 def geocode_address(address: str):
     """Address -> coordinates (lat, lon)."""
-    if _geocoder is None:
+    if not Nominatim:
         return "Error: 'geopy' library not installed."
     try:
-        loc = _geocoder.geocode(address)
+        loc = _get_geocoder().geocode(address)
         if not loc:
             return "Address not found."
         return f"{loc.address}\nLat: {loc.latitude}, Lon: {loc.longitude}"
@@ -510,10 +560,10 @@ def geocode_address(address: str):
 
 def reverse_geocode(lat: float, lon: float):
     """Coordinates -> address."""
-    if _geocoder is None:
+    if not Nominatim:
         return "Error: 'geopy' library not installed."
     try:
-        loc = _geocoder.reverse((lat, lon))
+        loc = _get_geocoder().reverse((lat, lon))
         if not loc:
             return "Location not found."
         return loc.address
@@ -522,9 +572,10 @@ def reverse_geocode(lat: float, lon: float):
 
 
 # 19) Image info
+@memoize(file_args=("path",))
 def image_info(path: str):
     """Get basic image info."""
-    if Image is None:
+    if not Image:
         return "Error: 'Pillow' library not installed."
     try:
         if not os.path.exists(path):
@@ -540,7 +591,7 @@ _tts_engine = None
 def text_to_speech(text: str, out_file: str = "output.wav"):
     """Text to speech (saves audio to a file)."""
     global _tts_engine
-    if pyttsx3 is None:
+    if not pyttsx3:
         return "Error: 'pyttsx3' library not installed."
     try:
         if _tts_engine is None:
@@ -555,7 +606,7 @@ def text_to_speech(text: str, out_file: str = "output.wav"):
 # 21) Ticker price
 def get_ticker_price(symbol: str):
     """Get current price for a stock/crypto ticker."""
-    if yf is None:
+    if not yf:
         return "Error: 'yfinance' library not installed."
     try:
         ticker = yf.Ticker(symbol)
@@ -569,9 +620,10 @@ def get_ticker_price(symbol: str):
 
 
 # 22) Markdown -> HTML
+@memoize()
 def markdown_to_html(text: str):
     """Convert markdown to HTML."""
-    if md_lib is None:
+    if not md_lib:
         return "Error: 'markdown' library not installed."
     try:
         return md_lib.markdown(text)
@@ -604,7 +656,7 @@ def hn_top_stories(limit: int = 5):
 # 24) RSS feed reader
 def rss_headlines(url: str, limit: int = 5):
     """Get headlines from an RSS feed."""
-    if feedparser is None:
+    if not feedparser:
         return "Error: 'feedparser' library not installed."
     try:
         feed = feedparser.parse(url)
@@ -617,7 +669,7 @@ def rss_headlines(url: str, limit: int = 5):
 # 25) Public holiday checker
 def is_public_holiday(date_str: str, country: str = "IN"):
     """Check if a given date (YYYY-MM-DD) is a public holiday in a given country."""
-    if holidays is None:
+    if not holidays:
         return "Error: 'holidays' library not installed."
     try:
         year = int(date_str.split("-")[0])
@@ -646,6 +698,7 @@ def generate_uuid(_=None):
 
 
 # 28) JSON pretty printer / validator
+@memoize()
 def pretty_json(raw: str):
     """Validate and pretty-print JSON."""
     try:
@@ -670,7 +723,7 @@ def shorten_url(url: str):
 # 30) QR code generator
 def generate_qr(data: str, filename: str = "qr.png"):
     """Generate a QR code image."""
-    if qrcode is None:
+    if not qrcode:
         return "Error: 'qrcode' library not installed."
     try:
         img = qrcode.make(data)
@@ -715,18 +768,27 @@ def unzip_file(zip_path: str, dest: str = "./unzipped"):
 
 
 # 33) PDF text extractor
-def pdf_to_text(path: str):
-    """Extract text from a PDF file."""
-    if PyPDF2 is None:
+@memoize(file_args=("path",))
+def pdf_to_text(path: str, max_chars: int = PDF_TEXT_MAX_CHARS):
+    """Extract text from a PDF file. With max_chars > 0, stops after that many characters and says so."""
+    if not PyPDF2:
         return "Error: 'PyPDF2' library not installed."
     try:
         if not os.path.exists(path):
             return f"File '{path}' not found."
-        text = []
+        text, size = [], 0
         with open(path, "rb") as f:
             reader = PyPDF2.PdfReader(f)
-            for page in reader.pages:
-                text.append(page.extract_text() or "")
+            total = len(reader.pages)
+            for number, page in enumerate(reader.pages, start=1):
+                page_text = page.extract_text() or ""
+                if max_chars > 0 and size + len(page_text) > max_chars:
+                    # Pages past the limit are never extracted
+                    text.append(page_text[:max(0, max_chars - size)])
+                    text.append(f"[Truncated at {max_chars} characters, on page {number} of {total}]")
+                    break
+                text.append(page_text)
+                size += len(page_text) + 1
         return "\n".join(text)
     except Exception as e:
         return f"Error reading PDF: {e}"
@@ -783,7 +845,7 @@ def system_uptime(_=None):
 # 37) Network speed test
 def network_speed_test(_=None):
     """Run a simple network speed test."""
-    if speedtest is None:
+    if not speedtest:
         return "Error: 'speedtest-cli' library not installed."
     try:
         st = speedtest.Speedtest()
@@ -798,7 +860,7 @@ def network_speed_test(_=None):
 # 38–39) Clipboard operations
 def clipboard_set(text: str):
     """Set system clipboard text."""
-    if pyperclip is None:
+    if not pyperclip:
         return "Error: 'pyperclip' library not installed."
     try:
         pyperclip.copy(text)
@@ -809,7 +871,7 @@ def clipboard_set(text: str):
 
 def clipboard_get(_=None):
     """Get system clipboard text."""
-    if pyperclip is None:
+    if not pyperclip:
         return "Error: 'pyperclip' library not installed."
     try:
         return pyperclip.paste()
@@ -818,9 +880,11 @@ def clipboard_get(_=None):
 
 
 # 40) Python code formatter (black)
+@memoize()
+@cpu_bound(preload=("black",))
 def format_python(code: str):
     """Format Python code with black."""
-    if black is None:
+    if not black:
         return "Error: 'black' library not installed."
     try:
         return black.format_str(code, mode=black.FileMode())
@@ -829,9 +893,10 @@ def format_python(code: str):
 
 
 # 41) Python linter (flake8)
+@cpu_bound(preload=("flake8.api.legacy",))
 def lint_python(code: str, filename: str = "temp_code.py"):
     """Lint Python code with flake8."""
-    if flake8_legacy is None:
+    if not flake8_legacy:
         return "Error: 'flake8' library not installed."
     try:
         with open(filename, "w", encoding="utf-8") as f:
@@ -859,7 +924,7 @@ def programming_joke(_=None):
 # 43) Page meta (title + description)
 def fetch_page_meta(url: str):
     """Fetch page title and meta description."""
-    if BeautifulSoup is None:
+    if not BeautifulSoup:
         return "Error: 'beautifulsoup4' library not installed."
     try:
         r = requests.get(url, timeout=5)
@@ -886,10 +951,154 @@ def tail_file(path: str, lines: int = 20):
         return f"Error tailing file: {e}"
 
 
+# ================= ASYNC NETWORK TOOLS =================
+# Async variants of the network-bound tools above. They share the pooled
+# client in backend.http_client instead of opening a connection per call.
+# tools.py registers them as the coroutine of the matching tool so LangGraph
+# awaits them natively; the sync versions remain the fallback.
+# The knowledge-base search awaits the embedding API the same way.
+
+async def asearch_knowledge_base(query: str, source: str = "", workspace: str = "", page_from: int = 0,
+                                 page_to: int = 0, uploaded_after: str = "", uploaded_before: str = ""):
+    """Search the uploaded documents (PDF/Text) for answers. Optionally limit to files (comma-separated names), a workspace path, a 1-based page range, or an upload time range (ISO dates)."""
+    missing = _vector_store_missing()
+    if missing:
+        return missing
+    try:
+        where = _knowledge_filter(source, workspace, page_from, page_to, uploaded_after, uploaded_before)
+        return _format_knowledge_hits(await rag.asearch_knowledge_base(query, where=where))
+    except Exception as e:
+        return f"Error searching knowledge base: {str(e)}"
+
+
+async def asearch_codebase(query: str, k: int = 8):
+    """Search the current workspace's source code by meaning or identifier. Returns ranked snippets with file paths and line ranges."""
+    missing = _vector_store_missing()
+    if missing:
+        return missing
+    try:
+        hits = await code_index.code_indexer.asearch(query, k)
+        return code_index.describe_results(hits, code_index.code_indexer)
+    except Exception as e:
+        return f"Error searching codebase: {str(e)}"
+
+
+async def aget_weather(city: str):
+    """Get current weather for a city."""
+    try:
+        response = await http.get(f"https://wttr.in/{city}?format=%C+%t")
+        if response.status_code == 200:
+            return f"The weather in {city} is {response.text.strip()}."
+        return f"Error: Could not fetch weather (Status {response.status_code})"
+    except Exception as e:
+        return f"Error fetching weather: {str(e)}"
+
+
+async def aconvert_currency(amount: float, from_cur: str, to_cur: str):
+    """Convert currency using exchangerate.host."""
+    try:
+        url = f"https://api.exchangerate.host/convert?from={from_cur}&to={to_cur}&amount={amount}"
+        r = (await http.get(url)).json()
+        if r.get("result") is None:
+            return "Error converting currency."
+        return f"{amount} {from_cur} = {r['result']} {to_cur}"
+    except Exception as e:
+        return f"Error converting currency: {e}"
+
+
+async def aip_geolocate(ip: str = ""):
+    """Geolocate an IP using ip-api.com."""
+    try:
+        data = (await http.get(f"http://ip-api.com/json/{ip or ''}")).json()
+        if data.get("status") != "success":
+            return f"Error: {data.get('message', 'lookup failed')}"
+        return f"{data['query']}: {data['country']}, {data['regionName']}, {data['city']}"
+    except Exception as e:
+        return f"Error geolocating IP: {e}"
+
+
+async def aget_public_ip(_=None):
+    """Get public IP address."""
+    try:
+        return (await http.get("https://api64.ipify.org?format=text")).text.strip()
+    except Exception as e:
+        return f"Error getting IP: {e}"
+
+
+async def afetch_page_title(url: str):
+    """Fetch the <title> of a URL."""
+    if not BeautifulSoup:
+        return "Error: 'beautifulsoup4' library not installed."
+    try:
+        r = await http.get(url)
+        soup = BeautifulSoup(r.text, "html.parser")
+        title = soup.title.string if soup.title else "No title found"
+        return title.strip()
+    except Exception as e:
+        return f"Error fetching title: {e}"
+
+
+async def ahn_top_stories(limit: int = 5):
+    """Get top stories from Hacker News."""
+    try:
+        top_ids = (await http.get("https://hacker-news.firebaseio.com/v0/topstories.json")).json()[:limit]
+        # Fetch the items concurrently; gather keeps the ranking order
+        responses = await asyncio.gather(*(
+            http.get(f"https://hacker-news.firebaseio.com/v0/item/{sid}.json") for sid in top_ids
+        ))
+        stories = []
+        for resp in responses:
+            item = resp.json()
+            stories.append(f"- {item.get('title')} ({item.get('url', 'no url')})")
+        return "\n".join(stories)
+    except Exception as e:
+        return f"Error fetching Hacker News: {e}"
+
+
+async def ashorten_url(url: str):
+    """Shorten a URL using TinyURL."""
+    try:
+        resp = await http.get("https://tinyurl.com/api-create.php", params={"url": url})
+        if resp.status_code == 200:
+            return resp.text.strip()
+        return f"Error shortening URL: status {resp.status_code}"
+    except Exception as e:
+        return f"Error shortening URL: {e}"
+
+
+async def aprogramming_joke(_=None):
+    """Get a random programming joke."""
+    try:
+        r = (await http.get("https://official-joke-api.appspot.com/jokes/programming/random")).json()
+        if not r:
+            return "No joke found."
+        j = r[0]
+        return f"{j['setup']}\n{j['punchline']}"
+    except Exception as e:
+        return f"Error fetching joke: {e}"
+
+
+async def afetch_page_meta(url: str):
+    """Fetch page title and meta description."""
+    if not BeautifulSoup:
+        return "Error: 'beautifulsoup4' library not installed."
+    try:
+        r = await http.get(url)
+        soup = BeautifulSoup(r.text, "html.parser")
+        title = soup.title.string.strip() if soup.title else "No title"
+        desc_tag = soup.find("meta", attrs={"name": "description"})
+        desc = desc_tag["content"].strip() if desc_tag and desc_tag.get("content") else "No description"
+        return f"Title: {title}\nDescription: {desc}"
+    except Exception as e:
+        return f"Error fetching page meta: {e}"
+
+
 # ================= TOOL REGISTRY =================
 
 available_tools = {
     # Core tools
+    "search_knowledge_base": search_knowledge_base,
+    "search_codebase": search_codebase,
     "get_weather": get_weather,
     "run_command": run_command,
     "web_search": web_search,
@@ -908,7 +1117,9 @@ available_tools = {
     "translate_text": translate_text,
     "detect_language": detect_language,
     "sentiment": sentiment,
+    "sentiment_batch": sentiment_batch,
     "summarize_text": summarize_text,
+    "summarize_batch": summarize_batch,
     "solve_equation": solve_equation,
     "get_disk_usage": get_disk_usage,
     "list_processes": list_processes,
@@ -947,3 +1158,64 @@ available_tools = {
     "fetch_page_meta": fetch_page_meta,
     "tail_file": tail_file,
 }
+
+# Async implementations, keyed by the name of the sync tool they replace
+async_tools = {
+    "search_knowledge_base": asearch_knowledge_base,
+    "search_codebase": asearch_codebase,
+    "get_weather": aget_weather,
+    "convert_currency": aconvert_currency,
+    "ip_geolocate": aip_geolocate,
+    "get_public_ip": aget_public_ip,
+    "fetch_page_title": afetch_page_title,
+    "hn_top_stories": ahn_top_stories,
+    "shorten_url": ashorten_url,
+    "programming_joke": aprogramming_joke,
+    "fetch_page_meta": afetch_page_meta,
+}
+
+# Optional dependencies each tool needs, for availability reports
+tool_dependencies = {
+    "web_search": {"duckduckgo-search": DDGS},
+    "get_system_info": {"psutil": psutil},
+    "wiki_summary": {"wikipedia": wikipedia},
+    "fetch_page_title": {"beautifulsoup4": BeautifulSoup},
+    "translate_text": {"deep-translator": GoogleTranslator},
+    "detect_language": {"langdetect": langdetect_detect},
+    "sentiment": {"transformers": hf_pipeline},
+    "summarize_text": {"transformers": hf_pipeline},
+    "sentiment_batch": {"transformers": hf_pipeline},
+    "summarize_batch": {"transformers": hf_pipeline},
+    "solve_equation": {"sympy": sp},
+    "get_disk_usage": {"psutil": psutil},
+    "list_processes": {"psutil": psutil},
+    "convert_time": {"pytz": pytz},
+    "geocode_address": {"geopy": Nominatim},
+    "reverse_geocode": {"geopy": Nominatim},
+    "image_info": {"Pillow": Image},
+    "text_to_speech": {"pyttsx3": pyttsx3},
+    "get_ticker_price": {"yfinance": yf},
+    "markdown_to_html": {"markdown": md_lib},
+    "rss_headlines": {"feedparser": feedparser},
+    "is_public_holiday": {"holidays": holidays},
+    "generate_qr": {"qrcode": qrcode},
+    "pdf_to_text": {"PyPDF2": PyPDF2},
+    "network_speed_test": {"speedtest-cli": speedtest},
+    "clipboard_set": {"pyperclip": pyperclip},
+    "clipboard_get": {"pyperclip": pyperclip},
+    "format_python": {"black": black},
+    "lint_python": {"flake8": flake8_legacy},
+    "fetch_page_meta": {"beautifulsoup4": BeautifulSoup},
+    "search_knowledge_base": vector_store_deps,
+    "search_codebase": vector_store_deps,
+}
+
+
+def tool_availability():
+    """Which tools can run, based on installed optional dependencies (nothing is imported)."""
+    report = {}
+    for name in available_tools:
+        deps = tool_dependencies.get(name, {})
+        missing = [package for package, dep in deps.items() if not dep]
+        report[name] = {"available": not missing, "missing": missing}
+    return report
@@ -0,0 +1,244 @@
+"""
+Rate-adaptive embedding of document chunks during ingestion.
+
+Chunks are embedded INGEST_EMBED_BATCH at a time, with up to
+EMBED_MAX_CONCURRENCY batches in flight across every ingestion running on
+the event loop. The number allowed in flight adapts AIMD-style: each
+successful batch raises it by 1/limit (about +1 per round of batches, up to
+the maximum) and a rate-limit response (HTTP 429) halves it, at most once
+per back-off interval, so a burst of 429s from the same round counts once.
+
+A failed batch is retried on its own, after an exponential back-off with
+jitter, or after the server's Retry-After when it sends one. The batches
+that already succeeded are kept. Rate limits, 5xx responses, timeouts and
+connection errors are retried up to EMBED_MAX_RETRIES times; any other
+error fails the batch at once.
+
+The sync path (embed_sync), used by reindexing and the code index, runs
+its batches one after another with the same retries.
+
+stats() reports batches, retries, rate limits, the current limit and
+chunks/sec over the time a batch was in flight, for GET /metrics.
+"""
+import asyncio
+import logging
+import random
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+from backend.config import (
+    EMBED_AIMD_DECREASE, EMBED_BACKOFF_BASE, EMBED_BACKOFF_MAX, EMBED_MAX_CONCURRENCY, EMBED_MAX_RETRIES,
+    INGEST_EMBED_BATCH,
+)
+
+logger = logging.getLogger(__name__)
+
+_TRANSIENT_NAMES = ("APIConnectionError", "APITimeoutError", "ConnectError", "ReadTimeout", "ConnectTimeout")
+
+
+def status_code(exc: BaseException) -> Optional[int]:
+    """HTTP status of an embedding-client error (openai and httpx errors carry one), or None."""
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def is_rate_limited(exc: BaseException) -> bool:
+    return status_code(exc) == 429 or type(exc).__name__ == "RateLimitError"
+
+
+def is_retryable(exc: BaseException) -> bool:
+    status = status_code(exc)
+    if status is not None:
+        return status in (408, 429) or status >= 500
+    return is_rate_limited(exc) or isinstance(exc, (ConnectionError, TimeoutError)) or \
+        type(exc).__name__ in _TRANSIENT_NAMES
+
+
+def retry_after(exc: BaseException) -> Optional[float]:
+    """Seconds from a Retry-After header, when the error carries the response."""
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class _Gate:
+    """In-flight batch counter for one event loop; waits while the count is at the limit."""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.changed = asyncio.Condition()
+
+
+class EmbeddingPipeline:
+    """Batched embedding with bounded, AIMD-adapted concurrency and per-batch retries."""
+
+    def __init__(
+        self,
+        batch_size: int = INGEST_EMBED_BATCH,
+        max_concurrency: int = EMBED_MAX_CONCURRENCY,
+        max_retries: int = EMBED_MAX_RETRIES,
+        backoff_base: float = EMBED_BACKOFF_BASE,
+        backoff_max: float = EMBED_BACKOFF_MAX,
+        decrease: float = EMBED_AIMD_DECREASE,
+    ):
+        self.batch_size = max(1, batch_size)
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max(0, max_retries)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.decrease = decrease
+        self.limit = float(self.max_concurrency)
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+        self._gates: Dict[asyncio.AbstractEventLoop, _Gate] = {}
+        self._busy_since: Optional[float] = None
+        self._active = 0
+        self._counts = {"batches": 0, "chunks": 0, "retries": 0, "rate_limited": 0, "failed": 0, "busy_seconds": 0.0}
+
+    # ------------------------------------------------------------------
+    # AIMD state (shared by the async and sync paths)
+    # ------------------------------------------------------------------
+
+    def _on_success(self, chunks: int):
+        with self._lock:
+            self.limit = min(float(self.max_concurrency), self.limit + 1.0 / self.limit)
+            self._counts["batches"] += 1
+            self._counts["chunks"] += chunks
+
+    def _on_error(self, exc: BaseException, attempt: int) -> Optional[float]:
+        """Seconds to wait before retrying, or None if the batch has failed for good."""
+        with self._lock:
+            if not is_retryable(exc) or attempt >= self.max_retries:
+                self._counts["failed"] += 1
+                return None
+            self._counts["retries"] += 1
+            if is_rate_limited(exc):
+                self._counts["rate_limited"] += 1
+                now = time.monotonic()
+                if now - self._last_decrease >= self.backoff_base:
+                    self.limit = max(1.0, self.limit * self.decrease)
+                    self._last_decrease = now
+                    logger.warning(f"Embedding rate limited; allowing {self.limit:.1f} concurrent batches")
+        delay = retry_after(exc)
+        if delay is None:
+            delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        return min(delay, self.backoff_max)
+
+    def _busy(self, delta: int):
+        with self._lock:
+            now = time.perf_counter()
+            if self._active == 0 and delta > 0:
+                self._busy_since = now
+            self._active += delta
+            if self._active == 0 and self._busy_since is not None:
+                self._counts["busy_seconds"] += now - self._busy_since
+                self._busy_since = None
+
+    # ------------------------------------------------------------------
+    # Async path
+    # ------------------------------------------------------------------
+
+    def _gate(self) -> _Gate:
+        # asyncio primitives belong to the loop they were created on
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            gate = self._gates.get(loop)
+            if gate is None:
+                self._gates = {l: g for l, g in self._gates.items() if not l.is_closed()}
+                gate = self._gates[loop] = _Gate()
+            return gate
+
+    async def _acquire(self, gate: _Gate):
+        async with gate.changed:
+            await gate.changed.wait_for(lambda: gate.in_flight < int(self.limit))
+            gate.in_flight += 1
+
+    async def _release(self, gate: _Gate):
+        async with gate.changed:
+            gate.in_flight -= 1
+            gate.changed.notify_all()
+
+    async def _embed_batch(self, embedding: Any, texts: Sequence[str]) -> List[List[float]]:
+        gate = self._gate()
+        attempt = 0
+        while True:
+            await self._acquire(gate)
+            self._busy(1)
+            try:
+                vectors = await embedding.aembed_documents(list(texts))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                delay = self._on_error(e, attempt)
+                if delay is None:
+                    raise
+            else:
+                self._on_success(len(texts))
+                return vectors
+            finally:
+                self._busy(-1)
+                await self._release(gate)
+            attempt += 1
+            # Only this batch waits; the others keep going at the reduced limit
+            await asyncio.sleep(delay)
+
+    async def embed(self, embedding: Any, texts: Sequence[str]) -> List[List[float]]:
+        """Embed `texts` in batches, several at once; vectors come back in input order."""
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        if len(batches) == 1:
+            return await self._embed_batch(embedding, batches[0])
+        tasks = [asyncio.ensure_future(self._embed_batch(embedding, batch)) for batch in batches]
+        try:
+            results = await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        return [vector for vectors in results for vector in vectors]
+
+    # ------------------------------------------------------------------
+    # Sync path
+    # ------------------------------------------------------------------
+
+    def embed_sync(self, embedding: Any, texts: Sequence[str]) -> List[List[float]]:
+        """Embed `texts` batch by batch in the calling thread, with the same retries."""
+        out: List[List[float]] = []
+        for start in range(0, len(texts), self.batch_size):
+            batch = list(texts[start:start + self.batch_size])
+            attempt = 0
+            while True:
+                self._busy(1)
+                try:
+                    out.extend(embedding.embed_documents(batch))
+                    self._on_success(len(batch))
+                    break
+                except Exception as e:
+                    delay = self._on_error(e, attempt)
+                    if delay is None:
+                        raise
+                finally:
+                    self._busy(-1)
+                attempt += 1
+                time.sleep(delay)
+        return out
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = dict(self._counts)
+            busy = counts.pop("busy_seconds")
+            if self._busy_since is not None:
+                busy += time.perf_counter() - self._busy_since
+            return {
+                **counts,
+                "batch_size": self.batch_size,
+                "max_concurrency": self.max_concurrency,
+                "limit": round(self.limit, 2),
+                "in_flight": self._active,
+                "chunks_per_sec": round(counts["chunks"] / busy, 2) if busy else 0.0,
+            }
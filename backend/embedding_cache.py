@@ -0,0 +1,127 @@
+"""
+Persistent cache of document embeddings.
+
+Vectors are keyed by SHA-256 of (embedding model, chunk text), so a chunk
+that was embedded once is never sent to the embedding API again, whether it
+comes back in a re-upload, a slightly edited document or another file.
+
+Entries live in an in-memory LRU in front of a SQLite table (float32 blobs)
+at EMBEDDING_CACHE_DB; an empty path keeps the cache in memory only.
+"""
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from backend.config import EMBEDDING_CACHE_SIZE
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def model_name(embedding: Any) -> str:
+    """Identifier of an embedding client, used to keep vectors of different models apart."""
+    name = getattr(embedding, "model", None) or getattr(embedding, "model_name", None)
+    return str(name) if name else type(embedding).__name__
+
+
+class EmbeddingCache:
+    """Memory LRU + optional SQLite store of embeddings keyed by model and content."""
+
+    def __init__(self, db_path: Optional[str] = None, maxsize: int = EMBEDDING_CACHE_SIZE):
+        self.db_path = db_path or None
+        self.maxsize = max(1, maxsize)
+        self._entries: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self.hits = 0
+        self.misses = 0
+
+    def _conn(self) -> Optional[sqlite3.Connection]:
+        if not self.db_path:
+            return None
+        if self._db is None:
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, model TEXT, vector BLOB)")
+            self._db.commit()
+        return self._db
+
+    @staticmethod
+    def key(model: str, text: str) -> str:
+        return hashlib.sha256(f"{model}\0{content_hash(text)}".encode()).hexdigest()
+
+    def _remember(self, key: str, vector: List[float]):
+        self._entries[key] = vector
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def get_many(self, model: str, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        """Cached vector for each text, or None where it has not been embedded yet."""
+        keys = [self.key(model, text) for text in texts]
+        found: Dict[str, List[float]] = {}
+        with self._lock:
+            for key in keys:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    found[key] = self._entries[key]
+            pending = [key for key in dict.fromkeys(keys) if key not in found]
+            conn = self._conn()
+            if conn is not None and pending:
+                # Stay below SQLite's bound-parameter limit
+                for start in range(0, len(pending), 500):
+                    part = pending[start:start + 500]
+                    rows = conn.execute(
+                        f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(part))})", part
+                    ).fetchall()
+                    for key, blob in rows:
+                        vector = np.frombuffer(blob, dtype=np.float32).tolist()
+                        found[key] = vector
+                        self._remember(key, vector)
+            result = [found.get(key) for key in keys]
+            hits = sum(vector is not None for vector in result)
+            self.hits += hits
+            self.misses += len(result) - hits
+        return result
+
+    def put_many(self, model: str, texts: Sequence[str], vectors: Sequence[Sequence[float]]):
+        rows = []
+        with self._lock:
+            for text, vector in zip(texts, vectors):
+                key = self.key(model, text)
+                self._remember(key, list(vector))
+                rows.append((key, model, np.asarray(vector, dtype=np.float32).tobytes()))
+            conn = self._conn()
+            if conn is not None and rows:
+                conn.executemany("INSERT OR REPLACE INTO embeddings (key, model, vector) VALUES (?, ?, ?)", rows)
+                conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            conn = self._conn()
+            if conn is not None:
+                conn.execute("DELETE FROM embeddings")
+                conn.commit()
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "disk": bool(self.db_path),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
@@ -0,0 +1,182 @@
+"""
+Embedding providers for the knowledge base and the code index.
+
+EMBEDDING_PROVIDER selects one:
+  - "gemini": text-embedding-004 through the Gemini OpenAI-compatible
+    endpoint (the default; one network round trip per batch),
+  - "hashing": a local CPU model. Words, identifier parts and character
+    trigrams are hashed into EMBEDDING_DIM signed buckets with sublinear term
+    frequency and L2-normalized. A whole batch is built with one scatter-add
+    in NumPy, so it needs no model download and no network,
+  - "sentence-transformers": a SentenceTransformer model loaded from
+    EMBEDDING_MODEL (a local path or hub name), if the package is installed.
+
+Every provider is a LangChain Embeddings, so Chroma, the embedding cache
+(which keys vectors by the provider's model name) and the async paths in
+rag.py work unchanged. embed_queries() embeds several search queries at once
+through the query path. Providers produce vectors of different sizes, so each
+one gets its own vector-store directory (store_suffix()).
+"""
+import asyncio
+import zlib
+from functools import lru_cache
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from backend.bm25 import tokenize
+from backend.config import API_KEY, BASE_URL, EMBEDDING_DIM, EMBEDDING_MODEL, EMBEDDING_PROVIDER, INGEST_EMBED_BATCH
+
+DEFAULT_PROVIDER = "gemini"
+
+
+@lru_cache(maxsize=1 << 16)
+def _bucket(feature: str, dim: int) -> Tuple[int, float]:
+    # One hash gives both the bucket and a sign, so collisions cancel out on average
+    h = zlib.crc32(feature.encode("utf-8"))
+    return h % dim, 1.0 if (h >> 31) & 1 else -1.0
+
+
+def _features(text: str) -> List[Tuple[str, float]]:
+    features = []
+    for token in tokenize(text):
+        features.append((token, 1.0))
+        padded = f" {token} "
+        features.extend((f"#{padded[i:i + 3]}", 0.5) for i in range(len(padded) - 2))
+    return features
+
+
+class HashingEmbeddings(Embeddings):
+    """Local bag-of-features embeddings: hashed words and character trigrams, batched in NumPy."""
+
+    def __init__(self, dim: int = EMBEDDING_DIM):
+        self.dim = dim
+        self.model = f"hashing-{dim}"
+
+    def embed_array(self, texts: List[str]) -> np.ndarray:
+        rows, cols, values = [], [], []
+        for row, text in enumerate(texts):
+            for feature, weight in _features(text):
+                col, sign = _bucket(feature, self.dim)
+                rows.append(row)
+                cols.append(col)
+                values.append(sign * weight)
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        np.add.at(matrix, (np.asarray(rows, dtype=np.intp), np.asarray(cols, dtype=np.intp)), values)
+        # Sublinear term frequency: a word repeated 20 times should not swamp the rest
+        matrix = np.sign(matrix) * np.log1p(np.abs(matrix))
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_array(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_array([text])[0].tolist()
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_documents(texts)  # queries and documents are embedded alike
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        # Microseconds per text; not worth a thread hop for a query, but batches can be large
+        if len(texts) <= 8:
+            return self.embed_documents(texts)
+        return await asyncio.to_thread(self.embed_documents, texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return self.embed_query(text)
+
+
+class SentenceTransformerEmbeddings(Embeddings):
+    """A sentence-transformers model run on the local CPU/GPU; loaded on first use."""
+
+    def __init__(self, model: str = EMBEDDING_MODEL, batch_size: int = INGEST_EMBED_BATCH):
+        self.model = model
+        self.batch_size = batch_size
+        self._encoder = None
+
+    @property
+    def encoder(self):
+        if self._encoder is None:
+            from sentence_transformers import SentenceTransformer
+
+            self._encoder = SentenceTransformer(self.model)
+        return self._encoder
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = self.encoder.encode(list(texts), batch_size=self.batch_size, normalize_embeddings=True)
+        return np.asarray(vectors, dtype=np.float32).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_documents(texts)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await asyncio.to_thread(self.embed_documents, texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await asyncio.to_thread(self.embed_query, text)
+
+
+def _gemini() -> Embeddings:
+    from langchain_openai import OpenAIEmbeddings
+
+    # Note: Google's OpenAI adapter might not support embeddings strictly compatible with this class
+    return OpenAIEmbeddings(
+        api_key=API_KEY,
+        base_url=BASE_URL,
+        model="text-embedding-004",  # Google's embedding model
+        check_embedding_ctx_length=False,
+        # Retries and backoff belong to backend.embed_pipeline, which also counts them
+        max_retries=0,
+    )
+
+
+def _sentence_transformers() -> Embeddings:
+    import importlib.util
+
+    if importlib.util.find_spec("sentence_transformers") is None:
+        raise ValueError("EMBEDDING_PROVIDER=sentence-transformers requires the sentence-transformers package")
+    return SentenceTransformerEmbeddings()
+
+
+PROVIDERS: Dict[str, Callable[[], Embeddings]] = {
+    "gemini": _gemini,
+    "hashing": HashingEmbeddings,
+    "sentence-transformers": _sentence_transformers,
+}
+
+
+def embed_queries(embedding: Embeddings, texts: List[str]) -> List[List[float]]:
+    """
+    Query vectors for several texts, each equal to embed_query(text). Uses
+    one request when the provider can batch its query path (an embed_queries
+    method, or OpenAIEmbeddings, whose embed_query() is embed_documents() of
+    one text); otherwise embeds the texts one by one.
+    """
+    batched = getattr(embedding, "embed_queries", None)
+    if batched is not None:
+        return batched(texts)
+    from langchain_openai import OpenAIEmbeddings
+
+    if isinstance(embedding, OpenAIEmbeddings):
+        return embedding.embed_documents(texts)
+    return [embedding.embed_query(text) for text in texts]
+
+
+def create_embeddings(provider: str = EMBEDDING_PROVIDER) -> Embeddings:
+    """Embedding client for the configured provider."""
+    try:
+        factory = PROVIDERS[provider]
+    except KeyError:
+        raise ValueError(f"Unknown EMBEDDING_PROVIDER '{provider}'; expected one of {', '.join(PROVIDERS)}")
+    return factory()
+
+
+def store_suffix(provider: str = EMBEDDING_PROVIDER) -> str:
+    """Directory suffix that keeps vector stores of different providers apart ("" for the default)."""
+    return "" if provider == DEFAULT_PROVIDER else "_" + provider.replace("-", "_")
@@ -1,29 +1,35 @@
 from typing import Annotated, Literal, TypedDict
-from langchain_openai import ChatOpenAI
-from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
+from langchain_core.messages import HumanMessage, SystemMessage, AIMessage, RemoveMessage
 from langgraph.graph import StateGraph, START, END, MessagesState
-from langgraph.prebuilt import ToolNode, tools_condition
-from backend.config import API_KEY, BASE_URL, MODEL_NAME
+from langgraph.prebuilt import tools_condition
+from backend.config import MODEL_NAME, PARALLEL_TOOL_CALLS, TOOL_ROUTER_ENABLED
 from backend.tools import TOOLS
+from backend.llm_registry import LLMRegistry
+from backend.compaction import compact, prompt_metrics, with_summary
+from backend.tool_router import ToolRouter, current_turn
+from backend.tool_executor import PARALLEL_TOOLS_HINT, ParallelToolNode
 
-# Initialize LLM
-llm = ChatOpenAI(
-    api_key=API_KEY,
-    base_url=BASE_URL,
-    model=MODEL_NAME,
-    temperature=0,
-)
+# Tool-bound LLM clients are cached per (model, temperature, json_mode, tool subset)
+llm_registry = LLMRegistry(TOOLS)
 
-# Bind tools
-llm_with_tools = llm.bind_tools(TOOLS)
+# Scores tools against each user turn so only the relevant subset is bound
+tool_router = ToolRouter(TOOLS, llm_registry.tool_schemas())
+
+# Runs the tool calls of one AIMessage concurrently, with per-tool timeouts
+tool_node = ParallelToolNode(TOOLS)
 
 SYSTEM_MSG = "You are Nexus AI, an intelligent coding assistant. - When asked to create or modify code, ALWAYS use the 'write_file' tool to save the code directly to the file. - If the user asks for a React component, create it in a suitable file (e.g., src/components/MyComponent.jsx). - After writing a file, confirm to the user that it has been created."
 
 from langchain_core.runnables import RunnableConfig
 
+class AgentState(MessagesState):
+    # Rolling summary of history folded away by compaction (persisted in the checkpoint)
+    summary: str
+
 # Define the graph
-async def agent(state: MessagesState, config: RunnableConfig):
+async def agent(state: AgentState, config: RunnableConfig):
     messages = state["messages"]
+    summary = state.get("summary", "")
     
     # Read config
     conf = config.get("configurable", {})
@@ -31,38 +37,46 @@ async def agent(state: MessagesState, config: RunnableConfig):
     temperature = conf.get("temperature", 0.7)
     custom_system_prompt = conf.get("system_prompt")
     json_mode = conf.get("json_mode", False)
+    parallel_tool_calls = conf.get("parallel_tool_calls", PARALLEL_TOOL_CALLS)
     
-    # Initialize LLM dynamically
-    llm = ChatOpenAI(
-        api_key=API_KEY,
-        base_url=BASE_URL,
-        model=model_name,
-        temperature=temperature,
-    )
-    llm_with_tools = llm.bind_tools(TOOLS)
+    # Bind only the tools relevant to this turn (plus the pinned core set)
+    tool_names = None
+    if TOOL_ROUTER_ENABLED:
+        turn = current_turn(messages)
+        tool_names = tool_router.select(turn["text"], extra=turn["called"])
+
+    # Reuse a cached tool-bound client for these settings
+    llm_with_tools = llm_registry.get(model_name, temperature, json_mode, tool_names, parallel_tool_calls)
     
     # Determine system prompt
     current_system_msg = custom_system_prompt if custom_system_prompt else SYSTEM_MSG
     
     if json_mode:
         current_system_msg += " You must answer in strict JSON format. Do not include markdown code blocks, backticks, or any explanation. Output raw JSON only."
+
+    if parallel_tool_calls:
+        current_system_msg += PARALLEL_TOOLS_HINT
     
-    # Prepend system message if not present or different
-    # (Simplification: Just ensure the first message is SystemMessage with correct content)
-    if not messages or not isinstance(messages[0], SystemMessage):
-        messages = [SystemMessage(content=current_system_msg)] + messages
-    elif isinstance(messages[0], SystemMessage) and messages[0].content != current_system_msg:
-        # Update existing system message if config changed
-        messages[0] = SystemMessage(content=current_system_msg)
-    
-    # We invoke with the full history
+    # The system prompt is rebuilt on every call; drop any stale copy from the history
+    history = [m for m in messages if not isinstance(m, SystemMessage)]
+
+    # Fit the history into the model's prompt budget before calling it
+    compacted = await compact(history, summary, current_system_msg, model_name, llm_with_tools.bound)
+    prompt_metrics.record(model_name, compacted)
+
+    messages = [SystemMessage(content=with_summary(current_system_msg, compacted.summary))] + compacted.messages
+
     response = await llm_with_tools.ainvoke(messages)
-    return {"messages": [response]}
 
-workflow = StateGraph(MessagesState)
+    update = {"messages": [RemoveMessage(id=msg_id) for msg_id in compacted.removed_ids] + [response]}
+    if compacted.summary != summary:
+        update["summary"] = compacted.summary
+    return update
+
+workflow = StateGraph(AgentState)
 
 workflow.add_node("agent", agent)
-workflow.add_node("tools", ToolNode(TOOLS))
+workflow.add_node("tools", tool_node)
 
 workflow.add_edge(START, "agent")
 workflow.add_conditional_edges("agent", tools_condition)
@@ -0,0 +1,131 @@
+"""
+Shared, pooled async HTTP client for network-bound tools.
+
+One httpx.AsyncClient is reused by every async tool so TCP/TLS connections are
+kept alive between calls. A per-host semaphore caps concurrent requests to any
+single host, and all requests share one timeout policy. Clients are bound to
+an event loop, so each loop gets its own; the pool of a loop that has closed
+is shut down by the next request, and aclose() shuts down all of them.
+"""
+import asyncio
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+
+from backend.config import HTTP_KEEPALIVE_EXPIRY, HTTP_MAX_CONNECTIONS, HTTP_MAX_PER_HOST, HTTP_TIMEOUT
+
+USER_AGENT = "NexusAI/1.0 (+https://github.com/PatilLaxmikant/Nexus-AI)"
+
+
+class AsyncHTTPClient:
+    """Lazily created httpx.AsyncClient with per-host connection limits."""
+
+    def __init__(
+        self,
+        timeout: float = HTTP_TIMEOUT,
+        max_connections: int = HTTP_MAX_CONNECTIONS,
+        max_per_host: int = HTTP_MAX_PER_HOST,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.max_per_host = max(1, max_per_host)
+        self.transport = transport
+        # httpx clients and semaphores are bound to the loop they were first used on, so each loop gets its own
+        self._clients: Dict[asyncio.AbstractEventLoop, Tuple[httpx.AsyncClient, Dict[str, asyncio.Semaphore]]] = {}
+        self._stale: List[httpx.AsyncClient] = []
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+
+    def _new_client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            timeout=self.timeout,
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_connections,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+            ),
+            headers={"User-Agent": USER_AGENT},
+            follow_redirects=True,
+            transport=self.transport,
+        )
+
+    def _entry(self) -> Tuple[httpx.AsyncClient, Dict[str, asyncio.Semaphore]]:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            entry = self._clients.get(loop)
+            if entry is None:
+                # Clients of loops that have finished can no longer be used; the next request closes them
+                for old in [l for l in self._clients if l.is_closed()]:
+                    self._stale.append(self._clients.pop(old)[0])
+                entry = self._clients[loop] = (self._new_client(), {})
+            return entry
+
+    def client(self) -> httpx.AsyncClient:
+        """The shared client for the running event loop."""
+        return self._entry()[0]
+
+    def _host_limit(self, url: str) -> asyncio.Semaphore:
+        host_limits = self._entry()[1]
+        host = urlsplit(url).netloc
+        if host not in host_limits:
+            host_limits[host] = asyncio.Semaphore(self.max_per_host)
+        return host_limits[host]
+
+    @staticmethod
+    async def _close_quietly(client: httpx.AsyncClient):
+        try:
+            await client.aclose()
+        except RuntimeError:
+            # Its sockets belong to a closed loop; the pool is emptied anyway and they are freed with it
+            pass
+
+    async def _close_stale(self):
+        with self._lock:
+            stale, self._stale = self._stale, []
+        for client in stale:
+            await self._close_quietly(client)
+
+    async def get(self, url: str, **kwargs: Any) -> httpx.Response:
+        client = self.client()
+        await self._close_stale()
+        async with self._host_limit(url):
+            with self._lock:
+                self.requests += 1
+            try:
+                return await client.get(url, **kwargs)
+            except Exception:
+                with self._lock:
+                    self.errors += 1
+                raise
+
+    async def aclose(self):
+        """Close every loop's pool. Called from the server lifespan on shutdown."""
+        current = asyncio.get_running_loop()
+        with self._lock:
+            clients, self._clients = self._clients, {}
+            self._stale.extend(client for loop, (client, _) in clients.items() if loop.is_closed())
+        for loop, (client, _) in clients.items():
+            if loop is current:
+                await client.aclose()
+            elif not loop.is_closed():
+                # Still running in another thread: close it there
+                await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(client.aclose(), loop))
+        await self._close_stale()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "errors": self.errors,
+                "clients": len(self._clients),
+                "hosts": sum(len(host_limits) for _, host_limits in self._clients.values()),
+                "max_per_host": self.max_per_host,
+            }
+
+
+# Shared instance used by the async tools in backend.core_tools
+http = AsyncHTTPClient()
@@ -0,0 +1,261 @@
+"""
+Background ingestion jobs for the knowledge base.
+
+POST /upload saves the file, queues an IngestJob and returns its id at once.
+A fixed number of worker tasks (INGEST_WORKERS) take jobs off a bounded
+queue (INGEST_QUEUE_SIZE) and run the async ingest path in backend.rag, so
+parsing and embedding a large PDF neither holds the HTTP request open nor
+competes with more than a few other ingestions.
+
+Jobs report pages parsed, chunks embedded, embedding-cache hits and
+throughput. Clients poll GET /upload/jobs/{id} or follow
+GET /upload/jobs/{id}/events, which streams a snapshot on every change until
+the job finishes. A queued job is cancelled
+before it starts; a running one has its task cancelled and the chunks it
+already wrote are removed.
+"""
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from backend.config import INGEST_QUEUE_SIZE, INGEST_WORKERS
+
+logger = logging.getLogger(__name__)
+
+QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED = "queued", "running", "succeeded", "failed", "cancelled"
+FINISHED_STATES = (SUCCEEDED, FAILED, CANCELLED)
+
+# async ingest(path, progress, tags, collection) -> number of chunks
+IngestFn = Callable[
+    [str, Callable[[Dict[str, int]], None], Optional[Dict[str, Any]], Optional[str]], Awaitable[int]
+]
+
+
+class QueueFullError(Exception):
+    pass
+
+
+@dataclass
+class IngestJob:
+    id: str
+    filename: str
+    path: str
+    tags: Optional[Dict[str, Any]] = None  # extra chunk metadata, e.g. the workspace
+    collection: Optional[str] = None  # knowledge-base collection; None is the active one
+    status: str = QUEUED
+    pages_parsed: int = 0
+    chunks_total: int = 0
+    chunks_embedded: int = 0
+    cache_hits: int = 0
+    chunks_reused: int = 0
+    error: Optional[str] = None
+    created: float = field(default_factory=time.time)
+    started: Optional[float] = None
+    finished: Optional[float] = None
+    _task: Optional[asyncio.Task] = field(default=None, repr=False)
+    _changed: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+
+    @property
+    def done(self) -> bool:
+        return self.status in FINISHED_STATES
+
+    def notify(self):
+        # Wake current waiters; later waiters get a fresh event
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    def snapshot(self) -> Dict[str, Any]:
+        elapsed = 0.0
+        if self.started:
+            elapsed = (self.finished or time.time()) - self.started
+        return {
+            "job_id": self.id,
+            "filename": self.filename,
+            "collection": self.collection,
+            "status": self.status,
+            "pages_parsed": self.pages_parsed,
+            "chunks_total": self.chunks_total,
+            "chunks_embedded": self.chunks_embedded,
+            "cache_hits": self.cache_hits,
+            "chunks_reused": self.chunks_reused,
+            "chunks_per_sec": round(self.chunks_embedded / elapsed, 2) if elapsed else 0.0,
+            "elapsed_seconds": round(elapsed, 3),
+            "error": self.error,
+        }
+
+
+async def _rag_ingest(path: str, progress: Callable[[Dict[str, int]], None],
+                      tags: Optional[Dict[str, Any]] = None, collection: Optional[str] = None) -> int:
+    # Imported on first job: loading Chroma and the embedding client is slow
+    from backend.rag import aingest_file
+    return await aingest_file(path, progress=progress, tags=tags, collection=collection)
+
+
+class IngestJobQueue:
+    """Bounded queue of ingestion jobs served by a fixed pool of worker tasks."""
+
+    def __init__(
+        self,
+        ingest: IngestFn = _rag_ingest,
+        workers: int = INGEST_WORKERS,
+        max_queued: int = INGEST_QUEUE_SIZE,
+        keep_finished: int = 100,
+    ):
+        self.ingest = ingest
+        self.workers = max(1, workers)
+        self.max_queued = max(1, max_queued)
+        self.keep_finished = keep_finished
+        self._jobs: "OrderedDict[str, IngestJob]" = OrderedDict()
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def start(self):
+        """Start the worker tasks on the running loop. Idempotent; also called on first submit."""
+        loop = asyncio.get_running_loop()
+        if self._workers and self._loop is loop:
+            return
+        self._loop = loop
+        self._queue = asyncio.Queue(maxsize=self.max_queued)
+        self._workers = [loop.create_task(self._worker(i), name=f"ingest-worker-{i}") for i in range(self.workers)]
+
+    async def shutdown(self):
+        """Stop the workers. Running jobs are cancelled, and so are queued ones: they would never run."""
+        running = [job._task for job in self._jobs.values() if job._task is not None and not job._task.done()]
+        for task in running:
+            task.cancel()
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*running, *self._workers, return_exceptions=True)
+        self._workers = []
+        for job in self._jobs.values():
+            if not job.done:
+                # Its file stays in the uploads folder; a reindex ingests it
+                self._finish(job, CANCELLED, "Server shut down before the job ran")
+
+    # ------------------------------------------------------------------
+    # Jobs
+    # ------------------------------------------------------------------
+
+    def submit(self, path: str, filename: str, tags: Optional[Dict[str, Any]] = None,
+               collection: Optional[str] = None) -> IngestJob:
+        self.start()
+        job = IngestJob(id=uuid.uuid4().hex, filename=filename, path=path, tags=tags, collection=collection)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise QueueFullError(f"Ingestion queue is full ({self.max_queued} jobs waiting)")
+        self._jobs[job.id] = job
+        self._prune()
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        return self._jobs.get(job_id)
+
+    def list(self) -> List[Dict[str, Any]]:
+        return [job.snapshot() for job in self._jobs.values()]
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a queued or running job. Returns False if it already finished."""
+        job = self._jobs.get(job_id)
+        if job is None or job.done:
+            return False
+        if job._task is not None:
+            job._task.cancel()
+        else:
+            self._finish(job, CANCELLED)
+        return True
+
+    async def cancel_collection(self, collection: str) -> int:
+        """Cancel every unfinished job that writes into `collection` and wait for the running ones to stop."""
+        jobs = [job for job in self._jobs.values() if job.collection == collection and not job.done]
+        for job in jobs:
+            self.cancel(job.id)
+        # A cancelled ingestion removes the chunks it already wrote before it returns
+        await asyncio.gather(*(job._task for job in jobs if job._task is not None), return_exceptions=True)
+        return len(jobs)
+
+    async def events(self, job_id: str) -> AsyncIterator[Dict[str, Any]]:
+        """Yield a snapshot now and after every change, ending with the final state."""
+        job = self._jobs[job_id]
+        while True:
+            changed = job._changed
+            yield job.snapshot()
+            if job.done:
+                return
+            await changed.wait()
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.done]
+        for job_id in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self._jobs[job_id]
+
+    # ------------------------------------------------------------------
+    # Workers
+    # ------------------------------------------------------------------
+
+    def _finish(self, job: IngestJob, status: str, error: Optional[str] = None):
+        job.status = status
+        job.error = error
+        job.finished = time.time()
+        job.notify()
+
+    def _progress(self, job: IngestJob) -> Callable[[Dict[str, int]], None]:
+        loop = self._loop
+
+        def apply(counters: Dict[str, int]):
+            for name, value in counters.items():
+                setattr(job, name, value)
+            job.notify()
+
+        # rag reports page progress from its loader thread
+        return lambda counters: loop.call_soon_threadsafe(apply, counters)
+
+    async def _run(self, job: IngestJob):
+        job.status = RUNNING
+        job.started = time.time()
+        job.notify()
+        try:
+            chunks = await self.ingest(job.path, self._progress(job), job.tags, job.collection)
+        except asyncio.CancelledError:
+            self._finish(job, CANCELLED)
+            raise
+        except Exception as e:
+            logger.error(f"Ingestion of '{job.filename}' failed: {e}")
+            self._finish(job, FAILED, str(e))
+            return
+        # Let progress callbacks scheduled from the loader thread land first
+        await asyncio.sleep(0)
+        job.chunks_total = job.chunks_embedded = chunks
+        self._finish(job, SUCCEEDED)
+        logger.info(f"Ingested '{job.filename}': {chunks} chunks in {job.finished - job.started:.2f}s")
+
+    async def _worker(self, index: int):
+        while True:
+            job = await self._queue.get()
+            try:
+                if job.done:  # cancelled while queued
+                    continue
+                job._task = asyncio.create_task(self._run(job))
+                # wait() does not raise when the job task is cancelled, only when this worker is
+                await asyncio.wait({job._task})
+            finally:
+                self._queue.task_done()
+
+    def stats(self) -> Dict[str, Any]:
+        counts: Dict[str, int] = {}
+        for job in self._jobs.values():
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return {
+            "workers": len(self._workers),
+            "queued": self._queue.qsize() if self._queue else 0,
+            "max_queued": self.max_queued,
+            "jobs": counts,
+        }
+
+
+ingest_jobs = IngestJobQueue()
@@ -0,0 +1,95 @@
+"""
+Lazy imports for optional tool dependencies.
+
+lazy_import() returns a proxy that imports the real module (or attribute) on
+first use. Truth-testing a proxy reports whether the dependency is installed
+without importing it, so tools keep the familiar guard:
+
+    sympy = lazy_import("sympy", package="sympy")
+
+    def solve(...):
+        if not sympy:
+            return "Error: 'sympy' library not installed."
+        sympy.symbols(...)  # imported here, on first call
+"""
+import importlib
+import importlib.util
+import threading
+from typing import Any, Dict, Optional
+
+
+class LazyModule:
+    """Proxy for a module, or an attribute of one, imported on first use."""
+
+    def __init__(self, module: str, attr: Optional[str] = None, package: Optional[str] = None):
+        self._module = module
+        self._attr = attr
+        self._package = package or module.split(".")[0]
+        self._target: Any = None
+        self._loaded = False
+        self._failed = False
+        self._lock = threading.Lock()
+
+    @property
+    def package(self) -> str:
+        """pip package name, for error messages and availability reports."""
+        return self._package
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def available(self) -> bool:
+        """Whether the dependency can be imported, checked without importing it."""
+        if self._loaded:
+            return True
+        if self._failed:
+            return False
+        # Only the top-level package is probed: find_spec on a submodule imports its parents
+        try:
+            return importlib.util.find_spec(self._module.split(".")[0]) is not None
+        except (ImportError, ValueError):
+            return False
+
+    def load(self) -> Any:
+        if self._loaded:
+            return self._target
+        with self._lock:
+            if not self._loaded:
+                try:
+                    module = importlib.import_module(self._module)
+                    self._target = getattr(module, self._attr) if self._attr else module
+                except Exception:
+                    self._failed = True
+                    raise
+                self._loaded = True
+        return self._target
+
+    def __bool__(self) -> bool:
+        return self.available()
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.load(), name)
+
+    def __call__(self, *args: Any, **kwargs: Any) -> Any:
+        return self.load()(*args, **kwargs)
+
+    def __repr__(self) -> str:
+        target = f"{self._module}.{self._attr}" if self._attr else self._module
+        state = "loaded" if self._loaded else "not loaded"
+        return f"<LazyModule {target} ({state})>"
+
+
+def lazy_import(module: str, attr: Optional[str] = None, package: Optional[str] = None) -> LazyModule:
+    """Return a lazy proxy for `module` (or `module.attr`)."""
+    return LazyModule(module, attr=attr, package=package)
+
+
+def availability(deps: Dict[str, LazyModule]) -> Dict[str, Dict[str, Any]]:
+    """Report installed/loaded state for named lazy dependencies without importing them."""
+    return {
+        name: {"package": dep.package, "available": dep.available(), "loaded": dep.loaded}
+        for name, dep in deps.items()
+    }
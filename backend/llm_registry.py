@@ -0,0 +1,172 @@
+"""
+Registry of ready-to-use, tool-bound chat clients.
+
+Building a ChatOpenAI client and re-serializing every tool schema with
+bind_tools() is comparatively expensive, and each client would otherwise open
+its own HTTP connection pool. The agent node asks this registry for a client
+instead; entries are kept in a bounded LRU keyed by the request settings and
+all of them share one keep-alive HTTP pool. Tool schemas are converted once,
+so binding a different subset of tools (see backend/tool_router.py) only costs
+a dictionary lookup per tool.
+"""
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Sequence, Tuple
+
+import httpx
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from langchain_openai import ChatOpenAI
+
+from backend.config import API_KEY, BASE_URL, LLM_CACHE_SIZE, LLM_HTTP_MAX_CONNECTIONS, LLM_HTTP_TIMEOUT
+
+CacheKey = Tuple[str, float, bool, Optional[Tuple[str, ...]], bool]
+
+
+class LLMRegistry:
+    """Bounded LRU of tool-bound chat clients sharing one HTTP pool."""
+
+    def __init__(self, tools: Sequence[Any], maxsize: int = LLM_CACHE_SIZE):
+        self.tools = list(tools)
+        self.maxsize = max(1, maxsize)
+        self._entries: "OrderedDict[CacheKey, Any]" = OrderedDict()
+        self._llms: "OrderedDict[Tuple[str, float], ChatOpenAI]" = OrderedDict()
+        self._schemas: Optional[Dict[str, Dict[str, Any]]] = None
+        self._lock = threading.Lock()
+        self._http_client: Optional[httpx.Client] = None
+        self._http_async_client: Optional[httpx.AsyncClient] = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # ------------------------------------------------------------------
+    # Shared HTTP pool
+    # ------------------------------------------------------------------
+
+    def _limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=LLM_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_HTTP_MAX_CONNECTIONS,
+        )
+
+    def _http_clients(self) -> Tuple[httpx.Client, httpx.AsyncClient]:
+        # Created lazily so importing the module does not open any sockets
+        if self._http_client is None:
+            self._http_client = httpx.Client(limits=self._limits(), timeout=LLM_HTTP_TIMEOUT)
+        if self._http_async_client is None:
+            self._http_async_client = httpx.AsyncClient(limits=self._limits(), timeout=LLM_HTTP_TIMEOUT)
+        return self._http_client, self._http_async_client
+
+    # ------------------------------------------------------------------
+    # Client construction and lookup
+    # ------------------------------------------------------------------
+
+    def tool_schemas(self) -> Dict[str, Dict[str, Any]]:
+        """OpenAI tool schemas by tool name, converted once."""
+        if self._schemas is None:
+            self._schemas = {t.name: convert_to_openai_tool(t) for t in self.tools}
+        return self._schemas
+
+    def _llm(self, model_name: str, temperature: float) -> ChatOpenAI:
+        # Unbound clients are shared by every tool subset of the same settings
+        key = (model_name, temperature)
+        with self._lock:
+            llm = self._llms.get(key)
+            if llm is not None:
+                self._llms.move_to_end(key)
+                return llm
+        http_client, http_async_client = self._http_clients()
+        llm = ChatOpenAI(
+            api_key=API_KEY,
+            base_url=BASE_URL,
+            model=model_name,
+            temperature=temperature,
+            http_client=http_client,
+            http_async_client=http_async_client,
+        )
+        with self._lock:
+            llm = self._llms.setdefault(key, llm)
+            while len(self._llms) > self.maxsize:
+                self._llms.popitem(last=False)
+        return llm
+
+    def _build(
+        self,
+        model_name: str,
+        temperature: float,
+        tool_names: Optional[Tuple[str, ...]] = None,
+        parallel_tool_calls: bool = False,
+        json_mode: bool = False,
+    ) -> Any:
+        schemas = self.tool_schemas()
+        names = tool_names if tool_names is not None else list(schemas)
+        kwargs = {"parallel_tool_calls": True} if parallel_tool_calls else {}
+        client = self._llm(model_name, temperature).bind_tools([schemas[n] for n in names if n in schemas], **kwargs)
+        # bind_tools() would read a response_format as a structured-output schema; bind it as a plain request field
+        return client.bind(response_format={"type": "json_object"}) if json_mode else client
+
+    def get(
+        self,
+        model_name: str,
+        temperature: float,
+        json_mode: bool = False,
+        tool_names: Optional[Iterable[str]] = None,
+        parallel_tool_calls: bool = False,
+    ) -> Any:
+        """
+        Return a tool-bound client for the given settings, building it on a miss.
+
+        `tool_names` restricts the bound tools to a subset; None binds all tools.
+        `parallel_tool_calls` asks the API to allow several tool calls per response.
+        `json_mode` requests a JSON-object response format.
+        """
+        names = tuple(sorted(tool_names)) if tool_names is not None else None
+        key: CacheKey = (model_name, float(temperature), bool(json_mode), names, bool(parallel_tool_calls))
+        with self._lock:
+            client = self._entries.get(key)
+            if client is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return client
+            self.misses += 1
+
+        # Build outside the lock; a concurrent miss for the same key just wastes one build
+        client = self._build(model_name, float(temperature), names, bool(parallel_tool_calls), bool(json_mode))
+
+        with self._lock:
+            existing = self._entries.get(key)
+            if existing is not None:
+                self._entries.move_to_end(key)
+                return existing
+            self._entries[key] = client
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return client
+
+    def clear(self):
+        """Drop all cached clients (the HTTP pool is kept)."""
+        with self._lock:
+            self._entries.clear()
+            self._llms.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
+
+    async def aclose(self):
+        """Close the shared HTTP pool. Called from the server lifespan on shutdown."""
+        self.clear()
+        if self._http_async_client is not None:
+            await self._http_async_client.aclose()
+            self._http_async_client = None
+        if self._http_client is not None:
+            self._http_client.close()
+            self._http_client = None
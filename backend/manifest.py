@@ -0,0 +1,92 @@
+"""
+Manifest of the sources ingested into a knowledge base.
+
+For every source file it records the mtime, size and SHA-256 seen at
+ingestion time and the ids of the chunks that were written for it. Reindexing
+compares this against the files on disk: unchanged files (same mtime and
+size, or same hash) are skipped without being parsed, and chunks of deleted
+files are removed by id.
+
+Stored as JSON next to the vector database and rewritten atomically.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional
+
+
+@dataclass
+class SourceEntry:
+    mtime_ns: int
+    size: int
+    sha256: str
+    chunk_ids: List[str] = field(default_factory=list)
+    indexed_at: float = field(default_factory=time.time)
+    # Tags given at ingestion (e.g. workspace), reapplied when the source is reindexed
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+    def matches_stat(self, st: os.stat_result) -> bool:
+        return self.mtime_ns == st.st_mtime_ns and self.size == st.st_size
+
+
+class Manifest:
+    """Thread-safe map of source path -> SourceEntry persisted to a JSON file."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries: Optional[Dict[str, SourceEntry]] = None
+
+    def _load(self) -> Dict[str, SourceEntry]:
+        if self._entries is None:
+            entries = {}
+            if self.path and os.path.exists(self.path):
+                with open(self.path, "r", encoding="utf-8") as f:
+                    entries = {source: SourceEntry(**entry) for source, entry in json.load(f).items()}
+            self._entries = entries
+        return self._entries
+
+    def _save(self):
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({source: asdict(entry) for source, entry in self._entries.items()}, f)
+        os.replace(tmp, self.path)
+
+    def get(self, source: str) -> Optional[SourceEntry]:
+        with self._lock:
+            return self._load().get(source)
+
+    def sources(self) -> List[str]:
+        with self._lock:
+            return sorted(self._load())
+
+    def set(self, source: str, entry: SourceEntry):
+        with self._lock:
+            self._load()[source] = entry
+            self._save()
+
+    def remove(self, source: str) -> Optional[SourceEntry]:
+        with self._lock:
+            entry = self._load().pop(source, None)
+            if entry is not None:
+                self._save()
+            return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries = {}
+            self._save()
+
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
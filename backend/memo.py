@@ -0,0 +1,190 @@
+"""
+Content-addressed memoization for pure and file-derived tools.
+
+Decorate a tool with @memoize() and repeated calls with the same arguments
+are answered from cache. For arguments that name files (file_args), the key
+includes a SHA-256 of the file content, so editing the file invalidates the
+entry. Digests are remembered per (path, mtime, size) so unchanged files are
+not re-hashed on every call.
+
+Entries live in an in-memory LRU; when MEMO_CACHE_DB is set they are also
+written to a SQLite table that survives restarts.
+"""
+import functools
+import hashlib
+import inspect
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+from backend.config import MEMO_CACHE_DB, MEMO_CACHE_SIZE
+
+_MISSING = object()
+
+
+class MemoCache:
+    """Two-tier (memory LRU + optional SQLite) cache with per-tool stats."""
+
+    def __init__(self, maxsize: int = MEMO_CACHE_SIZE, db_path: Optional[str] = MEMO_CACHE_DB or None):
+        self.maxsize = max(1, maxsize)
+        self.db_path = db_path
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+        self._digests: Dict[str, Tuple[int, int, str]] = {}
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    # ------------------------------------------------------------------
+    # SQLite tier
+    # ------------------------------------------------------------------
+
+    def _conn(self) -> Optional[sqlite3.Connection]:
+        if not self.db_path:
+            return None
+        if self._db is None:
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS memo (key TEXT PRIMARY KEY, tool TEXT, value TEXT, created REAL)"
+            )
+            self._db.commit()
+        return self._db
+
+    # ------------------------------------------------------------------
+    # Keys
+    # ------------------------------------------------------------------
+
+    def file_digest(self, path: str) -> Optional[str]:
+        """SHA-256 of a file's content, or None if it cannot be read."""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        abspath = os.path.abspath(path)
+        with self._lock:
+            known = self._digests.get(abspath)
+        if known and known[0] == st.st_mtime_ns and known[1] == st.st_size:
+            return known[2]
+        h = hashlib.sha256()
+        try:
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    h.update(block)
+        except OSError:
+            return None
+        digest = h.hexdigest()
+        with self._lock:
+            self._digests[abspath] = (st.st_mtime_ns, st.st_size, digest)
+        return digest
+
+    def make_key(self, tool: str, arguments: Dict[str, Any], file_args: Sequence[str] = ()) -> Optional[str]:
+        """Cache key for a call, or None if a file argument cannot be hashed."""
+        parts = {}
+        for name, value in arguments.items():
+            if name in file_args:
+                digest = self.file_digest(str(value))
+                if digest is None:
+                    return None
+                value = {"file": digest}
+            parts[name] = value
+        payload = json.dumps({"tool": tool, "args": parts}, sort_keys=True, default=repr)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    # ------------------------------------------------------------------
+    # Lookup
+    # ------------------------------------------------------------------
+
+    def _tool_stats(self, tool: str) -> Dict[str, int]:
+        return self._stats.setdefault(tool, {"hits": 0, "disk_hits": 0, "misses": 0})
+
+    def get(self, tool: str, key: str) -> Any:
+        with self._lock:
+            stats = self._tool_stats(tool)
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                stats["hits"] += 1
+                return self._entries[key]
+            conn = self._conn()
+            if conn is not None:
+                row = conn.execute("SELECT value FROM memo WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    value = json.loads(row[0])
+                    self._store(key, value)
+                    stats["disk_hits"] += 1
+                    return value
+            stats["misses"] += 1
+            return _MISSING
+
+    def _store(self, key: str, value: Any):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def set(self, tool: str, key: str, value: Any):
+        with self._lock:
+            self._store(key, value)
+            conn = self._conn()
+            if conn is not None:
+                conn.execute(
+                    "INSERT OR REPLACE INTO memo (key, tool, value, created) VALUES (?, ?, ?, ?)",
+                    (key, tool, json.dumps(value), time.time()),
+                )
+                conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._digests.clear()
+            conn = self._conn()
+            if conn is not None:
+                conn.execute("DELETE FROM memo")
+                conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            tools = {}
+            for tool, s in self._stats.items():
+                total = s["hits"] + s["disk_hits"] + s["misses"]
+                tools[tool] = {**s, "hit_rate": round((s["hits"] + s["disk_hits"]) / total, 4) if total else 0.0}
+            return {"size": len(self._entries), "maxsize": self.maxsize, "disk": bool(self.db_path), "tools": tools}
+
+
+memo_cache = MemoCache()
+
+
+def memoize(file_args: Sequence[str] = (), cache: Optional[MemoCache] = None) -> Callable:
+    """
+    Cache a tool's results by its arguments (and the content of `file_args`).
+
+    Results starting with "Error" are not cached, so transient failures and
+    missing optional libraries are retried on the next call.
+    """
+    def decorator(func: Callable) -> Callable:
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            store = cache or memo_cache
+            try:
+                bound = signature.bind(*args, **kwargs)
+            except TypeError:
+                return func(*args, **kwargs)
+            bound.apply_defaults()
+            key = store.make_key(func.__name__, dict(bound.arguments), file_args)
+            if key is None:
+                return func(*args, **kwargs)
+            result = store.get(func.__name__, key)
+            if result is not _MISSING:
+                return result
+            result = func(*args, **kwargs)
+            if not (isinstance(result, str) and result.startswith("Error")):
+                store.set(func.__name__, key, result)
+            return result
+
+        return wrapper
+
+    return decorator
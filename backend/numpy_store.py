@@ -0,0 +1,405 @@
+"""
+Memory-mapped, int8-quantized vector store (VECTOR_STORE=numpy).
+
+An alternative to Chroma for mid-sized knowledge bases, where Chroma's
+resident footprint and startup time dominate the backend's memory. A
+collection is a directory holding:
+  - vectors.npy: int8 matrix with one row per chunk, quantized symmetrically
+    per row (row = round(v / scale), scale = max|v| / 127),
+  - floats.npy: the same vectors as float32, read only to re-score the best
+    candidates,
+  - rows.npy: float32 (scale, squared norm) per row; a deleted row's norm is
+    set to infinity so scans skip it until the row is reused,
+  - meta.sqlite: chunk id -> row, document text and JSON metadata, the free
+    rows and the dimension/row count.
+
+The .npy files are opened with mmap_mode, so opening a collection only reads
+the SQLite header, and the OS pages vectors in as searches touch them. A scan
+reads the int8 matrix (a quarter of the float32 size); re-scoring reads
+rescore * k float rows. The files grow by doubling.
+
+Search is brute force: squared L2 distance (Chroma's default space, so both
+backends rank alike) computed block by block in NumPy, then argpartition for
+the top k. Filters use the Chroma `where` syntax and are translated to SQL
+over the JSON metadata, so a filtered search only scores the matching rows.
+
+NumpyCollection implements the part of the Chroma collection API that
+rag.py uses (count/get/query/upsert/update/delete). NumpyVectorStore wraps
+it as a LangChain VectorStore with the same `_collection` attribute as the
+Chroma wrapper, so KnowledgeBase and get_vector_store() work with either.
+"""
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import uuid
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from backend.config import NUMPY_STORE_RESCORE
+
+# Rows scored per NumPy call; bounds the float32 temporary during a scan
+BLOCK_ROWS = 8192
+INITIAL_ROWS = 256
+# Stay under SQLite's bound-parameter limit
+_SQL_CHUNK = 500
+
+_COMPARISONS = {"$eq": "=", "$ne": "!=", "$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}
+_ARRAYS = {"vectors": np.int8, "floats": np.float32, "rows": np.float32}
+
+
+def where_sql(where: Dict[str, Any]) -> Tuple[str, List[Any]]:
+    """SQL condition over the `metadata` JSON column for a Chroma-style `where` filter."""
+    clauses: List[str] = []
+    params: List[Any] = []
+    for key, value in where.items():
+        if key in ("$and", "$or"):
+            parts = [where_sql(condition) for condition in value]
+            clauses.append("(" + (" AND " if key == "$and" else " OR ").join(sql for sql, _ in parts) + ")")
+            for _, part_params in parts:
+                params.extend(part_params)
+            continue
+        if '"' in key:
+            raise ValueError(f"Unsupported metadata key '{key}'")
+        path = f'$."{key}"'
+        for op, operand in (value.items() if isinstance(value, dict) else [("$eq", value)]):
+            if op in _COMPARISONS:
+                clauses.append(f"json_extract(metadata, ?) {_COMPARISONS[op]} ?")
+                params.extend([path, operand])
+            elif op in ("$in", "$nin"):
+                marks = ", ".join("?" * len(operand))
+                clauses.append(f"json_extract(metadata, ?) {'IN' if op == '$in' else 'NOT IN'} ({marks})")
+                params.extend([path, *operand])
+            else:
+                raise ValueError(f"Unsupported filter operator '{op}'")
+    return " AND ".join(clauses) or "1", params
+
+
+def quantize(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Symmetric per-row int8 quantization: (int8 rows, float32 scales)."""
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    return np.round(vectors / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+
+
+def _chunks(items: Sequence[Any], size: int = _SQL_CHUNK) -> Iterable[Sequence[Any]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class NumpyCollection:
+    """One collection: memory-mapped int8/float32 matrices plus a SQLite metadata table."""
+
+    def __init__(self, path: str, rescore: int = NUMPY_STORE_RESCORE, block_rows: int = BLOCK_ROWS):
+        self.path = path
+        self.rescore = rescore
+        self.block_rows = block_rows
+        self.dim: Optional[int] = None
+        self._size = 0  # rows in use, including freed ones
+        self._arrays: Dict[str, np.memmap] = {}
+        self._db: Optional[sqlite3.Connection] = None
+        self._lock = threading.RLock()
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._db is None:
+            os.makedirs(self.path, exist_ok=True)
+            db = sqlite3.connect(os.path.join(self.path, "meta.sqlite"), check_same_thread=False)
+            db.executescript(
+                "CREATE TABLE IF NOT EXISTS chunks ("
+                " id TEXT PRIMARY KEY, row INTEGER UNIQUE NOT NULL, document TEXT, metadata TEXT NOT NULL);"
+                "CREATE TABLE IF NOT EXISTS free (row INTEGER PRIMARY KEY);"
+                "CREATE TABLE IF NOT EXISTS info (key TEXT PRIMARY KEY, value INTEGER NOT NULL);"
+            )
+            info = dict(db.execute("SELECT key, value FROM info"))
+            self.dim, self._size = info.get("dim"), info.get("size", 0)
+            self._db = db
+            if self.dim is not None:
+                self._map()
+        return self._db
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, f"{name}.npy")
+
+    def _map(self):
+        self._arrays = {name: np.load(self._file(name), mmap_mode="r+") for name in _ARRAYS}
+
+    def _reserve(self, rows: int):
+        """Make room for `rows` rows, doubling the files when they are full."""
+        capacity = len(self._arrays["vectors"]) if self._arrays else 0
+        if rows <= capacity:
+            return
+        capacity = max(rows, capacity * 2, INITIAL_ROWS)
+        for name, dtype in _ARRAYS.items():
+            shape = (capacity, 2 if name == "rows" else self.dim)
+            tmp = self._file(name) + ".tmp"
+            grown = np.lib.format.open_memmap(tmp, mode="w+", dtype=dtype, shape=shape)
+            if name in self._arrays:
+                grown[:self._size] = self._arrays[name][:self._size]
+            grown.flush()
+            del grown
+            os.replace(tmp, self._file(name))
+        self._map()
+
+    def _flush(self):
+        for array in self._arrays.values():
+            array.flush()
+
+    def _rows_of(self, ids: Sequence[str]) -> Dict[str, int]:
+        found: Dict[str, int] = {}
+        for part in _chunks(list(ids)):
+            found.update(self._db.execute(
+                f"SELECT id, row FROM chunks WHERE id IN ({', '.join('?' * len(part))})", part))
+        return found
+
+    def _write_vectors(self, rows: List[int], embeddings: Any):
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        if vectors.ndim != 2 or vectors.shape[1] != self.dim:
+            raise ValueError(
+                f"Embedding dimension {vectors.shape[-1]} does not match collection dimensionality {self.dim}")
+        quantized, scales = quantize(vectors)
+        index = np.asarray(rows, dtype=np.intp)
+        self._arrays["vectors"][index] = quantized
+        self._arrays["floats"][index] = vectors
+        self._arrays["rows"][index] = np.column_stack([scales, np.einsum("ij,ij->i", vectors, vectors)])
+
+    # ------------------------------------------------------------------
+    # Chroma collection API
+    # ------------------------------------------------------------------
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn().execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def upsert(self, ids: List[str], embeddings: Any, documents: Optional[List[str]] = None,
+               metadatas: Optional[List[Optional[Dict[str, Any]]]] = None):
+        if not ids:
+            return
+        with self._lock:
+            db = self._conn()
+            if self.dim is None:
+                self.dim = len(embeddings[0])
+                db.execute("INSERT OR REPLACE INTO info VALUES ('dim', ?)", (self.dim,))
+            rows = self._rows_of(ids)
+            new = list(dict.fromkeys(cid for cid in ids if cid not in rows))
+            free = [row for (row,) in db.execute("SELECT row FROM free ORDER BY row LIMIT ?", (len(new),))]
+            appended = list(range(self._size, self._size + len(new) - len(free)))
+            rows.update(zip(new, free + appended))
+            self._reserve(self._size + len(appended))
+            self._write_vectors([rows[cid] for cid in ids], embeddings)
+            self._flush()
+            db.executemany("INSERT OR REPLACE INTO chunks VALUES (?, ?, ?, ?)", [
+                (cid, rows[cid], documents[i] if documents else None, json.dumps((metadatas[i] if metadatas else None) or {}))
+                for i, cid in enumerate(ids)
+            ])
+            for part in _chunks(free):
+                db.execute(f"DELETE FROM free WHERE row IN ({', '.join('?' * len(part))})", part)
+            self._size += len(appended)
+            db.execute("INSERT OR REPLACE INTO info VALUES ('size', ?)", (self._size,))
+            db.commit()
+
+    add = upsert
+
+    def update(self, ids: List[str], embeddings: Any = None, documents: Optional[List[str]] = None,
+               metadatas: Optional[List[Optional[Dict[str, Any]]]] = None):
+        """Change stored chunks; ids that do not exist are ignored."""
+        with self._lock:
+            db = self._conn()
+            rows = self._rows_of(ids)
+            present = [i for i, cid in enumerate(ids) if cid in rows]
+            if embeddings is not None and present:
+                self._write_vectors([rows[ids[i]] for i in present], [embeddings[i] for i in present])
+                self._flush()
+            if documents is not None:
+                db.executemany("UPDATE chunks SET document = ? WHERE id = ?",
+                               [(documents[i], ids[i]) for i in present])
+            if metadatas is not None:
+                db.executemany("UPDATE chunks SET metadata = ? WHERE id = ?",
+                               [(json.dumps(metadatas[i] or {}), ids[i]) for i in present])
+            db.commit()
+
+    def delete(self, ids: List[str]):
+        with self._lock:
+            db = self._conn()
+            rows = list(self._rows_of(ids).values())
+            if not rows:
+                return
+            self._arrays["rows"][np.asarray(rows, dtype=np.intp), 1] = np.inf
+            self._flush()
+            for part in _chunks(rows):
+                db.execute(f"DELETE FROM chunks WHERE row IN ({', '.join('?' * len(part))})", part)
+            db.executemany("INSERT OR IGNORE INTO free VALUES (?)", [(row,) for row in rows])
+            db.commit()
+
+    def _select(self, columns: str, ids: Optional[List[str]], where: Optional[Dict[str, Any]]) -> List[tuple]:
+        condition, params = where_sql(where) if where else ("1", [])
+        query = f"SELECT {columns} FROM chunks WHERE {condition}"
+        if ids is None:
+            return self._db.execute(query + " ORDER BY row", params).fetchall()
+        found: List[tuple] = []
+        for part in _chunks(list(ids)):
+            found.extend(self._db.execute(
+                f"{query} AND id IN ({', '.join('?' * len(part))}) ORDER BY row", [*params, *part]))
+        return found
+
+    @staticmethod
+    def _result(records: List[tuple], include: Sequence[str], vectors: Optional[np.ndarray] = None) -> Dict[str, Any]:
+        return {
+            "ids": [record[0] for record in records],
+            "documents": [record[1] for record in records] if "documents" in include else None,
+            "metadatas": [json.loads(record[2]) for record in records] if "metadatas" in include else None,
+            "embeddings": vectors.tolist() if vectors is not None else None,
+        }
+
+    def get(self, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None,
+            limit: Optional[int] = None, offset: Optional[int] = None,
+            include: Sequence[str] = ("documents", "metadatas")) -> Dict[str, Any]:
+        with self._lock:
+            self._conn()
+            records = self._select("id, document, metadata, row", ids, where)
+            start = offset or 0
+            records = records[start:] if limit is None else records[start:start + limit]
+            vectors = None
+            if "embeddings" in include:
+                rows = np.asarray([record[3] for record in records], dtype=np.intp)
+                vectors = np.array(self._arrays["floats"][rows]) if len(rows) else np.empty((0, self.dim or 0))
+            return self._result(records, include, vectors)
+
+    def _scan(self, query: np.ndarray, rows: Optional[np.ndarray]) -> np.ndarray:
+        """Approximate squared L2 distance minus |q|^2 from the int8 rows (all rows when `rows` is None)."""
+        total = self._size if rows is None else len(rows)
+        out = np.empty(total, dtype=np.float32)
+        vectors, stats = self._arrays["vectors"], self._arrays["rows"]
+        for start in range(0, total, self.block_rows):
+            end = min(start + self.block_rows, total)
+            select = slice(start, end) if rows is None else rows[start:end]
+            block, scale_norm = vectors[select], stats[select]
+            out[start:end] = scale_norm[:, 1] - 2 * scale_norm[:, 0] * (block.astype(np.float32) @ query)
+        return out
+
+    def _nearest(self, query: np.ndarray, n: int, where: Optional[Dict[str, Any]]) -> Tuple[np.ndarray, np.ndarray]:
+        rows = None
+        if where:
+            rows = np.fromiter((row for (row,) in self._select("row", None, where)), dtype=np.intp)
+        approx = self._scan(query, rows)
+        if rows is None:
+            rows = np.arange(self._size, dtype=np.intp)
+        live = np.flatnonzero(np.isfinite(approx))
+        if not len(live) or n <= 0:
+            return rows[:0], approx[:0]
+        m = min(len(live), n * self.rescore if self.rescore > 0 else n)
+        best = live[np.argpartition(approx[live], m - 1)[:m]]
+        candidates, distances = rows[best], approx[best] + float(query @ query)
+        if self.rescore > 0:
+            # Exact distances for the candidates; sorted rows read the float file front to back
+            ordered = np.sort(candidates)
+            diff = self._arrays["floats"][ordered] - query
+            distances = np.einsum("ij,ij->i", diff, diff)[np.searchsorted(ordered, candidates)]
+        order = np.argsort(distances, kind="stable")[:n]
+        return candidates[order], distances[order]
+
+    def query(self, query_embeddings: List[List[float]], n_results: int = 10,
+              where: Optional[Dict[str, Any]] = None,
+              include: Sequence[str] = ("documents", "metadatas", "distances")) -> Dict[str, Any]:
+        result: Dict[str, List[Any]] = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        with self._lock:
+            self._conn()
+            for vector in query_embeddings:
+                if self.dim is None:
+                    rows, distances = [], []
+                else:
+                    rows, distances = self._nearest(np.asarray(vector, dtype=np.float32), n_results, where)
+                    rows, distances = rows.tolist(), distances.tolist()
+                records: Dict[int, tuple] = {}
+                for part in _chunks(rows):
+                    records.update((record[3], record) for record in self._db.execute(
+                        f"SELECT id, document, metadata, row FROM chunks WHERE row IN ({', '.join('?' * len(part))})",
+                        part))
+                found = self._result([records[row] for row in rows], include)
+                for key in ("ids", "documents", "metadatas"):
+                    result[key].append(found[key])
+                result["distances"].append(distances)
+        return result
+
+    def close(self):
+        with self._lock:
+            self._arrays = {}
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def drop(self):
+        """Delete the collection's files."""
+        with self._lock:
+            self.close()
+            shutil.rmtree(self.path, ignore_errors=True)
+            self.dim, self._size = None, 0
+
+
+class NumpyVectorStore(VectorStore):
+    """LangChain VectorStore over a NumpyCollection, opened like the Chroma wrapper."""
+
+    def __init__(self, persist_directory: str, embedding_function: Embeddings,
+                 collection_name: str = "langchain", rescore: int = NUMPY_STORE_RESCORE):
+        self._embedding_function = embedding_function
+        self._persist_directory = persist_directory
+        self._collection_name = collection_name
+        self._collection = NumpyCollection(os.path.join(persist_directory, collection_name), rescore=rescore)
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding_function
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None,
+                  ids: Optional[List[str]] = None, **kwargs: Any) -> List[str]:
+        texts = list(texts)
+        ids = list(ids) if ids else [str(uuid.uuid4()) for _ in texts]
+        self._collection.upsert(ids=ids, embeddings=self._embedding_function.embed_documents(texts),
+                                documents=texts, metadatas=metadatas)
+        return ids
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        self._collection.delete(ids or [])
+        return True
+
+    def similarity_search_by_vector_with_score(self, embedding: List[float], k: int = 4,
+                                               filter: Optional[Dict[str, Any]] = None) -> List[Tuple[Document, float]]:
+        result = self._collection.query(query_embeddings=[embedding], n_results=k, where=filter)
+        return [
+            (Document(page_content=text or "", metadata=metadata, id=cid), distance)
+            for cid, text, metadata, distance in zip(
+                result["ids"][0], result["documents"][0], result["metadatas"][0], result["distances"][0])
+        ]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, filter: Optional[Dict[str, Any]] = None,
+                                     **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_score(self._embedding_function.embed_query(query), k, filter)
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4,
+                                    filter: Optional[Dict[str, Any]] = None, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k, filter)]
+
+    def similarity_search(self, query: str, k: int = 4, filter: Optional[Dict[str, Any]] = None,
+                          **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, filter)]
+
+    def _select_relevance_score_fn(self):
+        return self._euclidean_relevance_score_fn
+
+    def delete_collection(self):
+        self._collection.drop()
+
+    def close(self):
+        self._collection.close()
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings, metadatas: Optional[List[dict]] = None,
+                   ids: Optional[List[str]] = None, persist_directory: str = "numpy_db",
+                   collection_name: str = "langchain", **kwargs: Any) -> "NumpyVectorStore":
+        store = cls(persist_directory=persist_directory, embedding_function=embedding, collection_name=collection_name)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        return store
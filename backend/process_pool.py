@@ -0,0 +1,258 @@
+"""
+Process-pool execution for CPU-bound tools.
+
+Tools decorated with @cpu_bound run in a pool of worker processes instead of
+the server process, so sympy solves, transformers inference, black and flake8
+no longer hold the GIL while /chat streams and the terminal websocket are
+being served.
+
+- Workers are started with the "spawn" method and import the libraries the
+  CPU-bound tools need up front (warm workers). A preload entry
+  "module:function" also calls a warm-up hook, e.g. to load a model. The
+  preload does not count against a call's timeout: the first call to a
+  worker waits up to CPU_WORKER_START_TIMEOUT for it to finish.
+- Every call has a hard timeout. A worker that overruns it is killed and
+  replaced, which is the only reliable way to stop a runaway sympy solve.
+- queue_depth counts callers waiting for a free worker. shutdown() makes
+  them fail with RuntimeError rather than wait for a worker that never comes.
+
+Calls are dispatched from worker threads (the tool executor runs sync tools in
+threads), so waiting on a worker never blocks the event loop.
+"""
+import functools
+import importlib
+import inspect
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+from backend.config import CPU_POOL_SIZE, CPU_TOOL_TIMEOUT, CPU_WORKER_START_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+# Set in worker processes so @cpu_bound functions run inline there
+_IN_WORKER = False
+
+# Put on the idle queue by shutdown() so callers waiting for a worker fail instead of hanging
+_CLOSED = object()
+
+
+def _worker_main(conn, preload: List[str]):
+    global _IN_WORKER
+    _IN_WORKER = True
+    for entry in preload:
+        module, _, hook = entry.partition(":")
+        try:
+            loaded = importlib.import_module(module)
+            if hook:
+                getattr(loaded, hook)()
+        except Exception:
+            pass  # the tool reports the missing library itself
+    conn.send(("ready", None))
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            break
+        if task is None:
+            break
+        module, name, cwd, args, kwargs = task
+        try:
+            if cwd and os.path.isdir(cwd):
+                os.chdir(cwd)
+            func = inspect.unwrap(getattr(importlib.import_module(module), name))
+            conn.send(("ok", func(*args, **kwargs)))
+        except Exception as e:
+            conn.send(("error", repr(e)))
+
+
+class _Worker:
+    def __init__(self, ctx, preload: List[str]):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child_conn, preload), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.ready = False
+
+    def wait_ready(self, timeout: float) -> bool:
+        """Whether the worker finished its preload, waiting up to `timeout` seconds for it."""
+        if not self.ready and self.conn.poll(timeout):
+            self.conn.recv()
+            self.ready = True
+        return self.ready
+
+    def kill(self):
+        self.process.kill()
+        self.process.join(timeout=5)
+        self.conn.close()
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.kill()
+        self.conn.close()
+
+
+class ProcessPool:
+    """Fixed-size pool of warm worker processes with hard per-call timeouts."""
+
+    def __init__(self, size: int = CPU_POOL_SIZE, timeout: float = CPU_TOOL_TIMEOUT,
+                 start_timeout: float = CPU_WORKER_START_TIMEOUT):
+        self.size = size
+        self.timeout = timeout
+        self.start_timeout = start_timeout
+        self.preload: Set[str] = set()
+        self._ctx = multiprocessing.get_context("spawn")
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+        self._workers: List[_Worker] = []
+        self._lock = threading.Lock()
+        self._started = False
+        self.queue_depth = 0
+        self.max_queue_depth = 0
+        self.tasks = 0
+        self.timeouts = 0
+        self.errors = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.size > 0
+
+    def start(self):
+        """Spawn the workers. Idempotent; also called lazily on first use."""
+        with self._lock:
+            if self._started or not self.enabled:
+                return
+            for _ in range(self.size):
+                worker = _Worker(self._ctx, sorted(self.preload))
+                self._workers.append(worker)
+                self._idle.put(worker)
+            self._started = True
+        logger.info(f"CPU pool started with {self.size} workers (preload: {', '.join(sorted(self.preload))})")
+
+    def _replace(self, worker: _Worker):
+        worker.kill()
+        with self._lock:
+            if worker not in self._workers:  # the pool was shut down meanwhile
+                return
+        fresh = _Worker(self._ctx, sorted(self.preload))
+        with self._lock:
+            self._workers = [w for w in self._workers if w is not worker] + [fresh]
+            self._idle.put(fresh)
+
+    def _release(self, worker: _Worker):
+        with self._lock:
+            if worker in self._workers:
+                self._idle.put(worker)
+
+    def run(self, func: Callable, args: Iterable[Any] = (), kwargs: Optional[Dict[str, Any]] = None,
+            timeout: Optional[float] = None) -> Any:
+        """Run a module-level function in a worker. Raises TimeoutError if it overruns."""
+        self.start()
+        timeout = timeout or self.timeout
+        with self._lock:
+            self.queue_depth += 1
+            self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+        with self._lock:
+            idle = self._idle
+        try:
+            worker = idle.get()
+        finally:
+            with self._lock:
+                self.queue_depth -= 1
+                self.tasks += 1
+        if worker is _CLOSED:
+            idle.put(_CLOSED)  # wake the next waiter as well
+            raise RuntimeError("CPU pool was shut down")
+
+        try:
+            # Preloading (imports, warm-up hooks) is not part of the call, so it does not count against `timeout`
+            if not worker.wait_ready(self.start_timeout):
+                with self._lock:
+                    self.errors += 1
+                self._replace(worker)
+                raise RuntimeError(f"worker for '{func.__name__}' did not start within {self.start_timeout:g}s")
+            worker.conn.send((func.__module__, func.__name__, os.getcwd(), tuple(args), kwargs or {}))
+            finished = worker.conn.poll(timeout)
+            if finished:
+                status, value = worker.conn.recv()
+        except (EOFError, OSError) as e:
+            # The worker died (e.g. out of memory); replace it
+            with self._lock:
+                self.errors += 1
+            self._replace(worker)
+            raise RuntimeError(f"worker for '{func.__name__}' crashed: {e}")
+
+        if not finished:
+            with self._lock:
+                self.timeouts += 1
+            logger.warning(f"CPU tool '{func.__name__}' exceeded {timeout}s; killing worker {worker.process.pid}")
+            self._replace(worker)
+            raise TimeoutError(f"'{func.__name__}' timed out after {timeout:g}s")
+
+        self._release(worker)
+        if status == "error":
+            with self._lock:
+                self.errors += 1
+            raise RuntimeError(value)
+        return value
+
+    def shutdown(self):
+        with self._lock:
+            workers, self._workers = self._workers, []
+            self._idle.put(_CLOSED)
+            self._idle = queue.Queue()
+            self._started = False
+        for worker in workers:
+            worker.stop()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "workers": len(self._workers),
+                "idle": self._idle.qsize(),
+                "queue_depth": self.queue_depth,
+                "max_queue_depth": self.max_queue_depth,
+                "tasks": self.tasks,
+                "timeouts": self.timeouts,
+                "errors": self.errors,
+            }
+
+
+cpu_pool = ProcessPool()
+
+
+def cpu_bound(preload: Iterable[str] = (), timeout: Optional[float] = None, pool: Optional[ProcessPool] = None) -> Callable:
+    """
+    Run a tool in the CPU pool. `preload` names modules the warm workers import
+    at startup, or "module:function" warm-up hooks they call. Errors and timeouts are returned as "Error: ..." strings, like
+    every other tool.
+    """
+    def decorator(func: Callable) -> Callable:
+        target_pool = pool or cpu_pool
+        target_pool.preload.update(preload)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _IN_WORKER or not target_pool.enabled:
+                return func(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return target_pool.run(func, args, kwargs, timeout=timeout)
+            except TimeoutError as e:
+                return f"Error: {e} and was terminated."
+            except Exception as e:
+                return f"Error in {func.__name__}: {e}"
+            finally:
+                logger.debug(f"CPU tool '{func.__name__}' took {time.perf_counter() - started:.3f}s")
+
+        return wrapper
+
+    return decorator
@@ -1,77 +1,1332 @@
+"""
+Knowledge base (RAG) over uploaded documents.
+
+One KnowledgeBase holds the embedding client and the vector store for the
+process: Chroma, or with VECTOR_STORE=numpy the memory-mapped int8 store in
+backend/numpy_store.py, which offers the same collection API. It is created
+in the FastAPI lifespan (startup()/shutdown()) and otherwise built lazily on
+first use, so importing this module does not load Chroma or open the vector
+database. The embedding client comes from the
+configured provider in backend/embeddings.py.
+
+Ingestion is streamed: the loader yields chunks page by page and they are
+embedded and written INGEST_EMBED_BATCH at a time, so a 2,000-page manual
+never sits in memory as a whole. Embedding goes through one shared
+EmbeddingPipeline (backend/embed_pipeline.py): bounded concurrent batches,
+AIMD back-off on rate limits and retries of only the batches that failed.
+
+Sync (ingest/query) and async (aingest/aquery) paths share the same store.
+The async paths await the embedding API natively and run the Chroma calls,
+which are local and blocking, in a worker thread.
+
+Chunk ids are derived from the source path and a hash of the chunk text, so
+ingesting the same file again overwrites its chunks instead of duplicating
+them, and chunks that disappeared from the file are deleted. Embeddings go
+through an EmbeddingCache first; only chunks never seen before reach the
+embedding API.
+
+Retrieval is hybrid: a BM25 index (backend/bm25.py) is written alongside
+Chroma, and the lexical and vector rankings are merged by reciprocal-rank
+fusion. Queries that are a single identifier or error code are answered from
+BM25 alone when it has matches, skipping the embedding call. Repeated queries
+are served from a QueryCache of query embeddings and result ids; every write
+to the collection invalidates the results. Query embeddings that miss it are
+coalesced: concurrent searches, sync or async, queue their query on
+query_batcher (backend/batching.py), which embeds everything that arrived
+within RAG_QUERY_BATCH_WINDOW_MS in one request through the provider's query
+path, with up to RAG_QUERY_BATCH_CONCURRENCY requests outstanding; each
+caller then runs its own vector and BM25 search.
+
+Chunks are tagged with their file name, page, upload time and (when uploaded
+through the server) workspace; build_filter() turns those into a Chroma
+`where` filter so a scoped search only ranks the matching subset.
+
+Collections are namespaced by tenant and workspace (collection_name()):
+KnowledgeBases keeps each in its own directory under DATA_ROOT, holds a
+bounded LRU of open handles and caps how many exist on disk. Searches that
+do not name a collection cover the active one and the default collection,
+so documents uploaded before a workspace was selected are still found.
+
+A manifest (backend/manifest.py) records the mtime, size, hash and chunk ids
+of every ingested source, so reindex() only touches files that changed.
+"""
+import asyncio
+import hashlib
+import json
+import logging
 import os
+import re
 import shutil
-from typing import List, Optional
-from langchain_openai import OpenAIEmbeddings
-from langchain_community.vectorstores import Chroma
-from langchain_community.document_loaders import PyPDFLoader, TextLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from backend.config import API_KEY, BASE_URL
+import sys
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass, field, replace
+from datetime import datetime
+from itertools import islice
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+from backend.batching import MicroBatcher
+from backend.bm25 import BM25Index, is_identifier, reciprocal_rank_fusion
+from backend.config import (
+    DATA_DIR, EMBEDDING_CACHE_DB, INGEST_EMBED_BATCH, INGEST_PAGE_WINDOW, KB_MAX_COLLECTIONS, KB_MAX_OPEN_COLLECTIONS,
+    RAG_FUSION_CANDIDATES, RAG_HYBRID, RAG_QUERY_BATCH_CONCURRENCY, RAG_QUERY_BATCH_SIZE, RAG_QUERY_BATCH_WINDOW_MS,
+    RAG_QUERY_BATCHING, RAG_QUERY_CACHE_SIZE, RAG_QUERY_EMBEDDING_CACHE_SIZE, RAG_RRF_K, TEXT_SEGMENT_CHARS, VECTOR_STORE,
+)
+from backend.embed_pipeline import EmbeddingPipeline
+from backend.embedding_cache import EmbeddingCache, content_hash, model_name
+from backend.embeddings import create_embeddings, embed_queries, store_suffix
+from backend.manifest import Manifest, SourceEntry, file_sha256
+
+logger = logging.getLogger(__name__)
 
 # Configuration
-VECTOR_DB_DIR = os.path.join(os.getcwd(), "chroma_db")
-UPLOAD_DIR = os.path.join(os.getcwd(), "uploads")
+VECTOR_STORES = ("chroma", "numpy")
+# Resolved once: the server later changes directory into the selected workspace
+DATA_ROOT = os.path.abspath(DATA_DIR or os.getcwd())
+
+
+def index_dir(name: str, backend: str = VECTOR_STORE) -> str:
+    """
+    Directory for an index under DATA_ROOT. Each vector store backend and
+    embedding provider gets its own: neither can read the other's data
+    (vector sizes differ), and the manifest must match the store.
+    """
+    return os.path.join(DATA_ROOT, name + ("" if backend == "chroma" else "_" + backend) + store_suffix())
+
+
+VECTOR_DB_DIR = index_dir("chroma_db")
+UPLOAD_DIR = os.path.join(DATA_ROOT, "uploads")
+EMBEDDING_CACHE_PATH = os.path.join(DATA_ROOT, EMBEDDING_CACHE_DB) if EMBEDDING_CACHE_DB else None
+COLLECTION_NAME = "knowledge_base"
+DEFAULT_COLLECTION = "default"
+_COLLECTION_RE = re.compile(r"[a-z0-9][a-z0-9_.-]{0,95}")
 
 # Ensure directories exist
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
-# Initialize Embeddings
-# Using the same Gemini/OpenAI adapter configuration
-# Note: Google's OpenAI adapter might not support embeddings strictly compatible with this class
-# If this fails, we might switch to a local embedding model like 'all-MiniLM-L6-v2' via HuggingFace
-embedding_function = OpenAIEmbeddings(
-    api_key=API_KEY,
-    base_url=BASE_URL,
-    model="text-embedding-004", # Google's embedding model
-    check_embedding_ctx_length=False
-)
 
-def get_vector_store():
-    """Get or create the Chroma vector store."""
-    return Chroma(
-        persist_directory=VECTOR_DB_DIR,
-        embedding_function=embedding_function,
-        collection_name="knowledge_base"
-    )
+def _pdf_pages(file_path: str, window: int) -> Iterator[Any]:
+    from langchain_core.documents import Document
+    from pypdf import PdfReader
+
+    with open(file_path, "rb") as f:
+        total = len(PdfReader(f).pages)
+        for first in range(0, total, window):
+            # A fresh reader per window: pypdf keeps every object it has parsed until the reader goes away,
+            # so replacing it lets the previous window's pages be collected. Reading from the open file
+            # (not the path) also keeps it from loading the whole file into memory.
+            reader = PdfReader(f)
+            for number in range(first, min(first + window, total)):
+                yield Document(
+                    page_content=reader.pages[number].extract_text(),
+                    metadata={"source": file_path, "page": number, "total_pages": total},
+                )
 
-def ingest_file(file_path: str):
+
+def _text_segments(file_path: str, size: int) -> Iterator[Any]:
+    """A text file in segments of about `size` characters, cut at paragraph breaks where possible."""
+    from langchain_core.documents import Document
+
+    offset, buffer = 0, ""
+    with open(file_path, "r", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            buffer += line
+            if len(buffer) < size:
+                continue
+            cut = buffer.rfind("\n\n", 0, size)
+            cut = cut + 2 if cut > 0 else len(buffer)
+            yield Document(page_content=buffer[:cut], metadata={"source": file_path, "offset": offset})
+            offset += cut
+            buffer = buffer[cut:]
+    if buffer or not offset:
+        yield Document(page_content=buffer, metadata={"source": file_path, "offset": offset})
+
+
+def load_and_split(file_path: str, on_page: Optional[Callable[[int], None]] = None) -> Iterator[Any]:
     """
-    Ingest a file (PDF or Text) into the vector store.
+    Load a PDF or text file and yield its overlapping chunks as it is read.
+
+    PDFs are read INGEST_PAGE_WINDOW pages at a time and text files in
+    segments, and each page/segment is split on its own, so memory stays flat
+    however long the document is. `on_page(pages_parsed)` is called as each
+    page is read.
     """
-    # 1. Load Document
-    if file_path.lower().endswith(".pdf"):
-        loader = PyPDFLoader(file_path)
-    else:
-        loader = TextLoader(file_path)
-    
-    docs = loader.load()
-    
-    # 2. Split Text
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
     text_splitter = RecursiveCharacterTextSplitter(
         chunk_size=1000,
         chunk_overlap=200,
-        add_start_index=True
+        add_start_index=True,
     )
-    splits = text_splitter.split_documents(docs)
-    
-    # 3. Add to Vector Store
-    vectorstore = get_vector_store()
-    vectorstore.add_documents(documents=splits)
-    # Chroma validates/persists automatically in newer versions, but explicit persist calls are sometimes needed depending on version
-    # vectorstore.persist() # Deprecated in newer Chroma, auto-persists
-    
-    return len(splits)
+    if file_path.lower().endswith(".pdf"):
+        pages = _pdf_pages(file_path, max(1, INGEST_PAGE_WINDOW))
+    else:
+        pages = _text_segments(file_path, TEXT_SEGMENT_CHARS)
+    for parsed, page in enumerate(pages, start=1):
+        if on_page:
+            on_page(parsed)
+        offset = page.metadata.pop("offset", 0)
+        for chunk in text_splitter.split_documents([page]):
+            # start_index is relative to the file, not the segment
+            chunk.metadata["start_index"] += offset
+            yield chunk
+
+
+def chunk_id(source: str, digest: str) -> str:
+    """Stable id of a chunk: the same text from the same source always gets the same id."""
+    return hashlib.sha256(f"{source}\0{digest}".encode()).hexdigest()
+
+
+def _batches(items: Iterable, size: int) -> Iterator[list]:
+    """Consecutive lists of up to `size` items, drawn lazily from any iterable."""
+    items = iter(items)
+    while True:
+        batch = list(islice(items, max(1, size)))
+        if not batch:
+            return
+        yield batch
+
+
+class Hit(NamedTuple):
+    id: str
+    text: str
+    metadata: Dict[str, Any]
+
+
+@dataclass
+class IngestResult:
+    source: str
+    chunks: int = 0
+    embedded: int = 0    # sent to the embedding API
+    cache_hits: int = 0  # vectors taken from the embedding cache
+    reused: int = 0      # already stored; only metadata refreshed
+    removed: int = 0     # no longer in the source, deleted
+    started: float = field(default_factory=time.perf_counter, repr=False)
+
 
-def query_knowledge_base(query: str, k: int = 4) -> List[str]:
+def _timestamp(value: Any) -> float:
+    """Epoch seconds from a number or an ISO 8601 date/time (naive values are local time)."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(str(value)).timestamp()
+    except ValueError:
+        raise ValueError(f"Invalid time '{value}': use an ISO date such as 2024-05-01 or epoch seconds")
+
+
+def build_filter(
+    sources: Optional[Iterable[str]] = None,
+    workspace: Optional[str] = None,
+    page_from: Optional[int] = None,
+    page_to: Optional[int] = None,
+    uploaded_after: Any = None,
+    uploaded_before: Any = None,
+) -> Optional[Dict[str, Any]]:
+    """
+    Chroma `where` filter over the metadata every chunk is tagged with at
+    ingestion. Sources are file names or absolute paths; pages are 1-based and
+    inclusive; times are ISO dates or epoch seconds. None when nothing is set.
+    """
+    conditions: List[Dict[str, Any]] = []
+    sources = [s for s in (sources or []) if s]
+    if sources:
+        paths = [os.path.abspath(s) for s in sources if os.path.isabs(s)]
+        names = [s for s in sources if not os.path.isabs(s)]
+        clauses = ([{"source": {"$in": paths}}] if paths else []) + ([{"filename": {"$in": names}}] if names else [])
+        conditions.append(clauses[0] if len(clauses) == 1 else {"$or": clauses})
+    if workspace:
+        conditions.append({"workspace": os.path.abspath(workspace)})
+    # PDF loaders number pages from 0
+    if page_from:
+        conditions.append({"page": {"$gte": int(page_from) - 1}})
+    if page_to:
+        conditions.append({"page": {"$lte": int(page_to) - 1}})
+    if uploaded_after:
+        conditions.append({"uploaded_at": {"$gte": _timestamp(uploaded_after)}})
+    if uploaded_before:
+        conditions.append({"uploaded_at": {"$lte": _timestamp(uploaded_before)}})
+    if not conditions:
+        return None
+    return conditions[0] if len(conditions) == 1 else {"$and": conditions}
+
+
+class QueryCache:
     """
-    Search the knowledge base for relevant context.
+    Two LRUs in front of retrieval, keyed by the normalized query text
+    (case and whitespace folded):
+      - query -> embedding, so a repeated query is not sent to the embedding
+        API again. Query vectors do not depend on the collection, so these
+        survive ingestion.
+      - (query, k, filter) -> ids of the result chunks, tagged with the collection
+        version. Every write or delete bumps the version, which drops all
+        results; a search that started before the bump cannot store its
+        now-stale answer.
+    A size of 0 disables a level.
     """
-    vectorstore = get_vector_store()
-    results = vectorstore.similarity_search(query, k=k)
-    return [doc.page_content for doc in results]
 
-def clear_knowledge_base():
+    def __init__(self, maxsize: int = RAG_QUERY_CACHE_SIZE, vectors_maxsize: int = RAG_QUERY_EMBEDDING_CACHE_SIZE):
+        self.maxsize = max(0, maxsize)
+        self.vectors_maxsize = max(0, vectors_maxsize)
+        self.version = 0
+        self._results: "OrderedDict[Tuple[str, int, str], List[str]]" = OrderedDict()
+        self._vectors: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counts = {"result_hits": 0, "result_misses": 0, "vector_hits": 0, "vector_misses": 0}
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        return " ".join(query.split()).lower()
+
+    def _key(self, query: str, k: int, where: Optional[Dict[str, Any]]) -> Tuple[str, int, str]:
+        return self.normalize(query), k, json.dumps(where, sort_keys=True) if where else ""
+
+    @staticmethod
+    def _remember(entries: OrderedDict, key: Any, value: Any, maxsize: int):
+        entries[key] = value
+        entries.move_to_end(key)
+        while len(entries) > maxsize:
+            entries.popitem(last=False)
+
+    def bump(self):
+        """The collection changed: every cached result may be stale."""
+        with self._lock:
+            self.version += 1
+            self._results.clear()
+
+    def results(self, query: str, k: int, where: Optional[Dict[str, Any]] = None) -> Tuple[int, Optional[List[str]]]:
+        """(current version, cached result ids or None)."""
+        key = self._key(query, k, where)
+        with self._lock:
+            ids = self._results.get(key)
+            if ids is not None:
+                self._results.move_to_end(key)
+            self._counts["result_hits" if ids is not None else "result_misses"] += 1
+            return self.version, ids
+
+    def store_results(self, version: int, query: str, k: int, ids: List[str], where: Optional[Dict[str, Any]] = None):
+        with self._lock:
+            if self.maxsize and version == self.version:
+                self._remember(self._results, self._key(query, k, where), list(ids), self.maxsize)
+
+    def vector(self, query: str) -> Optional[List[float]]:
+        key = self.normalize(query)
+        with self._lock:
+            vector = self._vectors.get(key)
+            if vector is not None:
+                self._vectors.move_to_end(key)
+            self._counts["vector_hits" if vector is not None else "vector_misses"] += 1
+            return vector
+
+    def store_vector(self, query: str, vector: List[float]):
+        with self._lock:
+            if self.vectors_maxsize:
+                self._remember(self._vectors, self.normalize(query), vector, self.vectors_maxsize)
+
+    def clear(self):
+        with self._lock:
+            self.version += 1
+            self._results.clear()
+            self._vectors.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        def level(size: int, maxsize: int, hits: int, misses: int) -> Dict[str, Any]:
+            total = hits + misses
+            return {
+                "size": size, "maxsize": maxsize, "hits": hits, "misses": misses,
+                "hit_rate": round(hits / total, 4) if total else 0.0,
+            }
+
+        with self._lock:
+            c = self._counts
+            return {
+                "version": self.version,
+                "results": level(len(self._results), self.maxsize, c["result_hits"], c["result_misses"]),
+                "embeddings": level(len(self._vectors), self.vectors_maxsize, c["vector_hits"], c["vector_misses"]),
+            }
+
+
+def _embed_queries(_, requests: List[Tuple[Any, str]]) -> List[List[float]]:
+    """Batch function for query_batcher: the distinct queries of a batch, through the provider's query path."""
+    embedding = requests[0][0]
+    texts = list(dict.fromkeys(query for _, query in requests))
+    # Always the query path, so a query's vector does not depend on what it was batched with
+    by_text = dict(zip(texts, embed_queries(embedding, texts)))
+    return [by_text[query] for _, query in requests]
+
+
+# Query embeddings that miss the QueryCache, from every thread and event loop, are queued here and
+# sent RAG_QUERY_BATCH_SIZE at a time, with up to RAG_QUERY_BATCH_CONCURRENCY requests outstanding.
+# Batches are keyed by the embedding model so they never mix models.
+query_batcher = MicroBatcher("rag-query", _embed_queries, RAG_QUERY_BATCH_SIZE, RAG_QUERY_BATCH_WINDOW_MS,
+                             max_in_flight=RAG_QUERY_BATCH_CONCURRENCY)
+
+
+class KnowledgeBase:
+    """Embedding client plus Chroma collection, created once and reused."""
+
+    def __init__(
+        self,
+        persist_directory: str = VECTOR_DB_DIR,
+        collection_name: str = COLLECTION_NAME,
+        embedding: Any = None,
+        cache: Optional[EmbeddingCache] = None,
+        hybrid: bool = RAG_HYBRID,
+        loader: Callable[[str, Optional[Callable[[int], None]]], Iterable[Any]] = load_and_split,
+        backend: str = VECTOR_STORE,
+        pipeline: Optional[EmbeddingPipeline] = None,
+        batch_queries: bool = RAG_QUERY_BATCHING,
+    ):
+        if backend not in VECTOR_STORES:
+            raise ValueError(f"Unknown VECTOR_STORE '{backend}'; expected one of {', '.join(VECTOR_STORES)}")
+        self.persist_directory = persist_directory
+        self.collection_name = collection_name
+        self.backend = backend
+        self._embedding = embedding
+        # A cache passed in is shared with other collections; its owner closes it
+        self._owns_cache = cache is None
+        self.cache = cache or EmbeddingCache()
+        self.pipeline = pipeline or EmbeddingPipeline()
+        self.manifest = Manifest(os.path.join(persist_directory, "manifest.json"))
+        self.hybrid = hybrid
+        self.batch_queries = batch_queries
+        self.loader = loader
+        # Kept up to date even when hybrid retrieval is off, so it can be switched on without a rebuild
+        self.lexical = BM25Index(os.path.join(persist_directory, "bm25.sqlite"))
+        self._lexical_checked = False
+        self.query_paths = {"lexical_only": 0, "hybrid": 0, "vector_only": 0}
+        self.query_cache = QueryCache()
+        self._store = None
+        self._lock = threading.Lock()
+        self._reindex_lock = threading.Lock()
+
+    @property
+    def embedding(self):
+        if self._embedding is None:
+            with self._lock:
+                if self._embedding is None:
+                    self._embedding = create_embeddings()
+        return self._embedding
+
+    @property
+    def store(self):
+        """The vector store (Chroma or NumpyVectorStore), opened on first access."""
+        if self._store is None:
+            embedding = self.embedding
+            with self._lock:
+                if self._store is None:
+                    if self.backend == "numpy":
+                        from backend.numpy_store import NumpyVectorStore as Store
+                    else:
+                        from langchain_community.vectorstores import Chroma as Store
+
+                    self._store = Store(
+                        persist_directory=self.persist_directory,
+                        embedding_function=embedding,
+                        collection_name=self.collection_name,
+                    )
+                    logger.info(f"Opened vector store '{self.collection_name}' at {self.persist_directory}")
+        return self._store
+
+    @property
+    def is_open(self) -> bool:
+        return self._store is not None
+
+    # ------------------------------------------------------------------
+    # Ingestion
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _prepare(splits: Iterable[Any], seen: Dict[str, None], metadata: Dict[str, Any]) -> Iterator[Tuple[str, Any]]:
+        """(chunk id, document) pairs as the loader yields them; repeated chunks within the file are kept once."""
+        for doc in splits:
+            digest = content_hash(doc.page_content)
+            doc.metadata.update(metadata)
+            doc.metadata["content_hash"] = digest
+            cid = chunk_id(doc.metadata.get("source", ""), digest)
+            if cid not in seen:
+                seen[cid] = None
+                yield cid, doc
+
+    def _tags(self, source: str, tags: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Caller-supplied tags (e.g. workspace) for a source; a re-ingest without
+        tags (reindex) keeps the ones recorded in the manifest.
+        """
+        if tags is None:
+            entry = self.manifest.get(source)
+            tags = entry.metadata if entry is not None else {}
+        # Chroma metadata values must be str, int, float or bool
+        return {key: value for key, value in tags.items() if isinstance(value, (str, int, float, bool))}
+
+    @staticmethod
+    def _chunk_metadata(source: str, st: os.stat_result, tags: Dict[str, Any]) -> Dict[str, Any]:
+        # Filterable fields (see build_filter); "source" and "page" come from the loader
+        return {**tags, "filename": os.path.basename(source), "uploaded_at": st.st_mtime}
+
+    def _source_ids(self, source: str) -> Set[str]:
+        return set(self.store._collection.get(where={"source": source}, include=[])["ids"])
+
+    def _reuse(self, batch: List[Tuple[str, Any]], existing: Set[str], result: "IngestResult") -> List[Tuple[str, Any]]:
+        """Refresh metadata of chunks that are already stored; return the ones that need embedding."""
+        stored = [(cid, doc) for cid, doc in batch if cid in existing]
+        if stored:
+            self.store._collection.update(ids=[cid for cid, _ in stored], metadatas=[doc.metadata for _, doc in stored])
+            self.query_cache.bump()  # tags may have changed
+        result.reused += len(stored)
+        return [(cid, doc) for cid, doc in batch if cid not in existing]
+
+    def _lookup(self, batch: List[Tuple[str, Any]]) -> Tuple[List[str], List[Optional[List[float]]]]:
+        texts = [doc.page_content for _, doc in batch]
+        return texts, self.cache.get_many(model_name(self.embedding), texts)
+
+    def _write(self, batch: List[Tuple[str, Any]], texts: List[str], vectors: List[Optional[List[float]]],
+               missing: List[int], fresh: List[List[float]]):
+        for i, vector in zip(missing, fresh):
+            vectors[i] = vector
+        self.cache.put_many(model_name(self.embedding), [texts[i] for i in missing], fresh)
+        self.store._collection.upsert(
+            ids=[cid for cid, _ in batch],
+            embeddings=vectors,
+            documents=texts,
+            metadatas=[doc.metadata for _, doc in batch],
+        )
+        self.lexical.add([cid for cid, _ in batch], texts)
+        self.query_cache.bump()
+
+    def _commit(self, fingerprint: Tuple[os.stat_result, str], ids: List[str], existing: Set[str],
+                result: "IngestResult", tags: Dict[str, Any]):
+        """Delete chunks that are no longer in the source and record it in the manifest."""
+        stale = sorted(existing.difference(ids))
+        self.delete(stale)
+        result.removed = len(stale)
+        st, digest = fingerprint
+        self.manifest.set(result.source, SourceEntry(st.st_mtime_ns, st.st_size, digest, ids, metadata=tags))
+        elapsed = time.perf_counter() - result.started
+        logger.info(
+            f"Ingested '{result.source}': {result.chunks} chunks ({result.embedded} embedded, "
+            f"{result.cache_hits} from cache, {result.reused} unchanged, {result.removed} removed) "
+            f"in {elapsed:.2f}s, {result.chunks / elapsed if elapsed else 0:.1f} chunks/s"
+        )
+
+    def delete(self, ids: List[str]):
+        if ids:
+            self.store._collection.delete(ids=ids)
+            self.lexical.delete(ids)
+            self.query_cache.bump()
+
+    def ingest_source(self, file_path: str, tags: Optional[Dict[str, Any]] = None) -> "IngestResult":
+        """
+        Ingest or re-ingest a file; only chunks that are not stored yet are embedded.
+
+        The loader's chunks are consumed INGEST_EMBED_BATCH at a time: each
+        batch is embedded and written before the next one is read, so only
+        chunk ids are kept for the whole file. Every chunk is tagged with the
+        file name, upload (modification) time and `tags`, such as the
+        workspace, so searches can be scoped with build_filter().
+        """
+        source = os.path.abspath(file_path)
+        fingerprint = (os.stat(source), file_sha256(source))
+        tags = self._tags(source, tags)
+        metadata = self._chunk_metadata(source, fingerprint[0], tags)
+        existing = self._source_ids(source)
+        result = IngestResult(source)
+        seen: Dict[str, None] = {}
+        for batch in _batches(self._prepare(self.loader(source, None), seen, metadata), INGEST_EMBED_BATCH):
+            result.chunks += len(batch)
+            pending = self._reuse(batch, existing, result)
+            if not pending:
+                continue
+            texts, vectors = self._lookup(pending)
+            missing = [i for i, vector in enumerate(vectors) if vector is None]
+            fresh = self.pipeline.embed_sync(self.embedding, [texts[i] for i in missing]) if missing else []
+            self._write(pending, texts, vectors, missing, fresh)
+            result.embedded += len(missing)
+            result.cache_hits += len(pending) - len(missing)
+        self._commit(fingerprint, list(seen), existing, result, tags)
+        return result
+
+    async def aingest_source(self, file_path: str, progress: Optional[Callable[[Dict[str, int]], None]] = None,
+                             tags: Optional[Dict[str, Any]] = None) -> "IngestResult":
+        """
+        Async ingest, streamed like ingest_source(): the loader runs in a
+        worker thread one batch at a time, and up to EMBED_MAX_CONCURRENCY
+        batches are embedded (through the rate-adaptive EmbeddingPipeline)
+        and written at once while the next ones are read.
+        `progress` receives counters (pages_parsed, chunks_total,
+        chunks_embedded, cache_hits, chunks_reused) as they change and may be
+        called from a worker thread; chunks_total grows as the file is read.
+        If the task is cancelled, chunks this call added are removed again.
+        """
+        report = progress or (lambda counters: None)
+        source = os.path.abspath(file_path)
+        fingerprint = await asyncio.to_thread(lambda: (os.stat(source), file_sha256(source)))
+        tags = self._tags(source, tags)
+        metadata = self._chunk_metadata(source, fingerprint[0], tags)
+        existing = await asyncio.to_thread(self._source_ids, source)
+        result = IngestResult(source)
+        seen: Dict[str, None] = {}
+        splits = await asyncio.to_thread(self.loader, source, lambda pages: report({"pages_parsed": pages}))
+        batches = _batches(self._prepare(splits, seen, metadata), INGEST_EMBED_BATCH)
+        written: List[str] = []
+        writes: List[asyncio.Future] = []
+        in_flight: Set[asyncio.Task] = set()
+        stored = 0
+
+        async def embed_and_write(pending, texts, vectors, missing):
+            nonlocal stored
+            fresh = await self.pipeline.embed(self.embedding, [texts[i] for i in missing]) if missing else []
+            # Recorded before the write starts, so a cancelled ingest also removes a write still in progress
+            written.extend(cid for cid, _ in pending)
+            write = asyncio.ensure_future(asyncio.to_thread(self._write, pending, texts, vectors, missing, fresh))
+            writes.append(write)
+            await asyncio.shield(write)
+            stored += len(pending)
+            result.embedded += len(missing)
+            result.cache_hits += len(pending) - len(missing)
+            report({"chunks_embedded": result.reused + stored, "cache_hits": result.cache_hits})
+
+        async def settle(everything: bool = False):
+            done, _ = await asyncio.wait(
+                in_flight, return_when=asyncio.ALL_COMPLETED if everything else asyncio.FIRST_COMPLETED)
+            in_flight.difference_update(done)
+            for task in done:
+                task.result()  # a batch that failed for good fails the ingest
+
+        try:
+            while True:
+                # Read ahead only as far as the pipeline lets batches run at once
+                if len(in_flight) >= self.pipeline.max_concurrency:
+                    await settle()
+                batch = await asyncio.to_thread(next, batches, None)
+                if batch is None:
+                    break
+                result.chunks += len(batch)
+                pending = await asyncio.to_thread(self._reuse, batch, existing, result)
+                report({"chunks_total": result.chunks, "chunks_reused": result.reused,
+                        "chunks_embedded": result.reused + stored})
+                if pending:
+                    texts, vectors = await asyncio.to_thread(self._lookup, pending)
+                    missing = [i for i, vector in enumerate(vectors) if vector is None]
+                    in_flight.add(asyncio.ensure_future(embed_and_write(pending, texts, vectors, missing)))
+            if in_flight:
+                await settle(everything=True)
+        except BaseException:
+            for task in in_flight:
+                task.cancel()
+            await asyncio.gather(*in_flight, return_exceptions=True)
+            if sys.exc_info()[0] is asyncio.CancelledError:
+                await asyncio.shield(self._discard(written, writes))
+            raise
+        await asyncio.to_thread(self._commit, fingerprint, list(seen), existing, result, tags)
+        return result
+
+    async def _discard(self, ids: List[str], writes: List[asyncio.Future]):
+        # Writes run to completion in their threads even when cancelled; wait for them before deleting
+        await asyncio.gather(*writes, return_exceptions=True)
+        await asyncio.to_thread(self.delete, ids)
+
+    def ingest(self, file_path: str, tags: Optional[Dict[str, Any]] = None) -> int:
+        """Ingest a file (PDF or Text) into the vector store. Returns the chunk count."""
+        return self.ingest_source(file_path, tags).chunks
+
+    async def aingest(self, file_path: str, progress: Optional[Callable[[Dict[str, int]], None]] = None,
+                      tags: Optional[Dict[str, Any]] = None) -> int:
+        return (await self.aingest_source(file_path, progress=progress, tags=tags)).chunks
+
+    def remove_source(self, source: str) -> int:
+        """Delete every chunk of a source and forget it. Returns the number of chunks removed."""
+        source = os.path.abspath(source)
+        ids = sorted(self._source_ids(source))
+        self.delete(ids)
+        self.manifest.remove(source)
+        return len(ids)
+
+    def reindex(
+        self,
+        directory: str = UPLOAD_DIR,
+        dry_run: bool = False,
+        files: Optional[Iterable[str]] = None,
+        stop: Optional[Callable[[], bool]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Bring the knowledge base in line with the files in `directory`.
+
+        Files whose mtime and size (or, failing that, content hash) match the
+        manifest are skipped without being parsed; new and changed files are
+        re-ingested, which embeds only their new chunks; sources that were
+        deleted from the directory lose their chunks. With dry_run the plan
+        is reported and nothing is changed.
+
+        `files` overrides the default listing (the directory's top-level
+        files); `stop()` is checked between files to abandon a long run.
+        """
+        directory = os.path.abspath(directory)
+        report: Dict[str, Any] = {
+            "directory": directory, "dry_run": dry_run, "added": [], "updated": [], "removed": [],
+            "failed": {}, "unchanged": 0, "chunks_embedded": 0, "chunks_removed": 0, "stopped": False,
+        }
+        with self._reindex_lock:
+            if files is None:
+                names = sorted(os.listdir(directory)) if os.path.isdir(directory) else []
+                files = [os.path.join(directory, name) for name in names if not name.startswith(".")]
+            on_disk = {}
+            for path in files:
+                path = os.path.abspath(path)
+                if os.path.isfile(path):
+                    on_disk[path] = os.stat(path)
+
+            for path, st in on_disk.items():
+                if stop and stop():
+                    report["stopped"] = True
+                    return report
+                name = os.path.relpath(path, directory)
+                entry = self.manifest.get(path)
+                if entry is not None and entry.matches_stat(st):
+                    report["unchanged"] += 1
+                    continue
+                digest = file_sha256(path)
+                if entry is not None and entry.sha256 == digest:
+                    # Touched but not modified: remember the new mtime so the next run skips the hash
+                    if not dry_run:
+                        self.manifest.set(path, replace(entry, mtime_ns=st.st_mtime_ns, size=st.st_size))
+                    report["unchanged"] += 1
+                    continue
+                report["updated" if entry is not None else "added"].append(name)
+                if dry_run:
+                    continue
+                try:
+                    result = self.ingest_source(path)
+                except Exception as e:
+                    logger.error(f"Reindexing '{path}' failed: {e}")
+                    report["failed"][name] = str(e)
+                    continue
+                report["chunks_embedded"] += result.embedded
+                report["chunks_removed"] += result.removed
+
+            for source in self.manifest.sources():
+                if source.startswith(directory + os.sep) and source not in on_disk:
+                    report["removed"].append(os.path.relpath(source, directory))
+                    if not dry_run:
+                        report["chunks_removed"] += self.remove_source(source)
+        return report
+
+    # ------------------------------------------------------------------
+    # Retrieval
+    # ------------------------------------------------------------------
+
+    def _ensure_lexical(self):
+        # Collections built before the BM25 index existed are backfilled once
+        if self._lexical_checked:
+            return
+        collection = self.store._collection
+        if self.lexical.count() == 0 and collection.count() > 0:
+            offset = 0
+            while True:
+                page = collection.get(include=["documents"], limit=1000, offset=offset)
+                if not page["ids"]:
+                    break
+                self.lexical.add(page["ids"], page["documents"])
+                offset += len(page["ids"])
+            logger.info(f"Built BM25 index for '{self.collection_name}' ({offset} chunks)")
+        self._lexical_checked = True
+
+    def _vector_search(self, vector: List[float], n: int, where: Optional[Dict[str, Any]] = None) -> List[Hit]:
+        collection = self.store._collection
+        n = min(n, collection.count())
+        if n == 0:
+            return []
+        # The filter is applied inside Chroma, before the nearest-neighbour search
+        result = collection.query(query_embeddings=[vector], n_results=n, where=where or None,
+                                  include=["documents", "metadatas"])
+        return [Hit(*row) for row in zip(result["ids"][0], result["documents"][0], result["metadatas"][0])]
+
+    def _lexical_search(self, query: str, n: int, where: Optional[Dict[str, Any]] = None) -> List[Hit]:
+        self._ensure_lexical()
+        allowed = None
+        if where:
+            allowed = set(self.store._collection.get(where=where, include=[])["ids"])
+            if not allowed:
+                return []
+        return self._get_hits([chunk_id for chunk_id, _ in self.lexical.search(query, n, allowed=allowed)])
+
+    def _get_hits(self, ids: List[str]) -> List[Hit]:
+        """Stored chunks by id, in the given order; ids that no longer exist are skipped."""
+        if not ids:
+            return []
+        found = self.store._collection.get(ids=ids, include=["documents", "metadatas"])
+        hits = {row[0]: Hit(*row) for row in zip(found["ids"], found["documents"], found["metadatas"])}
+        return [hits[chunk_id] for chunk_id in ids if chunk_id in hits]
+
+    def _fast_path(self, query: str, k: int, where: Optional[Dict[str, Any]] = None) -> Optional[List[Hit]]:
+        """Lexical-only answer for identifier queries, or None to run the full search."""
+        if not (self.hybrid and is_identifier(query)):
+            return None
+        hits = self._lexical_search(query, k, where)
+        if not hits:
+            return None
+        self._count("lexical_only")
+        return hits
+
+    def _fuse(self, vector_hits: List[Hit], lexical_hits: List[Hit], k: int) -> List[Hit]:
+        if not self.hybrid:
+            self._count("vector_only")
+            return vector_hits[:k]
+        self._count("hybrid")
+        hits = {hit.id: hit for hit in vector_hits + lexical_hits}
+        ranking = reciprocal_rank_fusion([[h.id for h in vector_hits], [h.id for h in lexical_hits]], k=RAG_RRF_K)
+        return [hits[chunk_id] for chunk_id in ranking[:k]]
+
+    def _count(self, path: str):
+        with self._lock:
+            self.query_paths[path] += 1
+
+    def _cached(self, query: str, k: int, where: Optional[Dict[str, Any]]) -> Tuple[int, Optional[List[Hit]]]:
+        version, ids = self.query_cache.results(query, k, where)
+        if ids is None:
+            return version, None
+        hits = self._get_hits(ids)
+        return version, hits if len(hits) == len(ids) else None
+
+    def _submit_query(self, query: str):
+        embedding = self.embedding
+        return query_batcher.submit((embedding, query), key=model_name(embedding))
+
+    def _embed_query(self, query: str) -> List[float]:
+        vector = self.query_cache.vector(query)
+        if vector is None:
+            vector = self._submit_query(query).result() if self.batch_queries else self.embedding.embed_query(query)
+            self.query_cache.store_vector(query, vector)
+        return vector
+
+    async def _aembed_query(self, query: str) -> List[float]:
+        vector = self.query_cache.vector(query)
+        if vector is None:
+            if self.batch_queries:
+                # Shares batches with the sync callers; the request runs on the batcher's thread
+                vector = await asyncio.wrap_future(self._submit_query(query))
+            else:
+                vector = await self.embedding.aembed_query(query)
+            self.query_cache.store_vector(query, vector)
+        return vector
+
+    def search(self, query: str, k: int = 4, where: Optional[Dict[str, Any]] = None) -> List[Hit]:
+        """Best-matching chunks with their ids and metadata, optionally limited by a metadata filter (build_filter)."""
+        version, hits = self._cached(query, k, where)
+        if hits is None:
+            hits = self._fast_path(query, k, where)
+        if hits is None:
+            n = max(k, RAG_FUSION_CANDIDATES)
+            vector_hits = self._vector_search(self._embed_query(query), n, where)
+            lexical_hits = self._lexical_search(query, n, where) if self.hybrid else []
+            hits = self._fuse(vector_hits, lexical_hits, k)
+        self.query_cache.store_results(version, query, k, [hit.id for hit in hits], where)
+        return hits
+
+    async def asearch(self, query: str, k: int = 4, where: Optional[Dict[str, Any]] = None) -> List[Hit]:
+        version, hits = await asyncio.to_thread(self._cached, query, k, where)
+        if hits is None:
+            hits = await asyncio.to_thread(self._fast_path, query, k, where)
+        if hits is None:
+            n = max(k, RAG_FUSION_CANDIDATES)
+            # BM25 runs while the query is being embedded
+            lexical = (
+                asyncio.create_task(asyncio.to_thread(self._lexical_search, query, n, where)) if self.hybrid else None
+            )
+            vector = await self._aembed_query(query)
+            vector_hits = await asyncio.to_thread(self._vector_search, vector, n, where)
+            lexical_hits = await lexical if lexical else []
+            hits = self._fuse(vector_hits, lexical_hits, k)
+        self.query_cache.store_results(version, query, k, [hit.id for hit in hits], where)
+        return hits
+
+    def query(self, query: str, k: int = 4, where: Optional[Dict[str, Any]] = None) -> List[str]:
+        """Search the knowledge base for relevant context."""
+        return [hit.text for hit in self.search(query, k, where)]
+
+    async def aquery(self, query: str, k: int = 4, where: Optional[Dict[str, Any]] = None) -> List[str]:
+        return [hit.text for hit in await self.asearch(query, k, where)]
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    def clear(self):
+        """Drop every document. The collection is recreated on next use."""
+        store = self.store
+        with self._lock:
+            store.delete_collection()
+            self._store = None
+        self.manifest.clear()
+        self.lexical.clear()
+        self.query_cache.clear()
+
+    def close(self):
+        with self._lock:
+            store, self._store = self._store, None
+        if hasattr(store, "close"):  # the numpy store holds a SQLite connection
+            store.close()
+        else:
+            _release_chroma(store)
+        if self._owns_cache:
+            self.cache.close()
+        self.lexical.close()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            queries = dict(self.query_paths)
+        return {
+            "open": self.is_open,
+            "backend": self.backend,
+            "hybrid": self.hybrid,
+            "queries": queries,
+            "query_cache": self.query_cache.stats(),
+            "embedding_cache": self.cache.stats(),
+        }
+
+
+def _slug(label: str, key: Optional[str] = None) -> str:
+    """Name-safe form of `label`; a hash of `key` (or of the label, if it had to change) keeps it unique."""
+    slug = re.sub(r"[^a-z0-9]+", "-", label.lower()).strip("-")[:40]
+    if key is None and slug == label:
+        return slug
+    return f"{slug or 'x'}-{hashlib.sha256((key or label).encode('utf-8')).hexdigest()[:10]}"
+
+
+def collection_name(tenant: Optional[str] = None, workspace: Optional[str] = None) -> str:
+    """
+    Collection for a tenant and/or workspace: "t-<tenant>" and "w-<folder>-<hash
+    of its absolute path>", joined by "__" when both are given. Without either,
+    DEFAULT_COLLECTION.
+    """
+    parts = []
+    if tenant:
+        parts.append("t-" + _slug(tenant))
+    if workspace:
+        workspace = os.path.abspath(workspace)
+        parts.append("w-" + _slug(os.path.basename(workspace), key=workspace))
+    return "__".join(parts) or DEFAULT_COLLECTION
+
+
+def _release_chroma(store: Any):
+    """
+    Let go of a Chroma store's client. Chroma shares one system (SQLite
+    connections, HNSW segments) per directory between its clients; it is
+    stopped when the last client closes.
+    """
+    client = getattr(store, "_client", None)
+    if client is not None and hasattr(client, "close"):
+        client.close()
+
+
+class CollectionLimitError(Exception):
+    pass
+
+
+class CollectionBusyError(Exception):
+    """The collection is being deleted, or is still in use by a search or ingestion that did not finish."""
+
+
+class UnknownCollectionError(LookupError):
+    pass
+
+
+class KnowledgeBases:
+    """
+    Knowledge-base collections, each a KnowledgeBase with its own directory
+    (store, manifest and BM25 index) and uploads folder.
+
+    The default collection keeps the original layout (VECTOR_DB_DIR and
+    UPLOAD_DIR); the others live under "collections/<name>" in both. All of
+    them share one embedding client and embedding cache. At most `max_open`
+    are held open: the least recently used is closed when another one is
+    opened, and reopens on its next use. A collection in use is leased
+    (lease()/alease(), which every search and ingestion takes) and is not
+    closed until its lease is returned, so there is never a second
+    KnowledgeBase on the same directory; the limit can be exceeded while
+    more collections than that are in use. At most `max_collections` exist
+    on disk; creating one more raises CollectionLimitError until one is deleted.
+
+    `active` is the collection searched by the agent's tools. The server
+    points it at the selected workspace.
+    """
+
+    def __init__(
+        self,
+        root: str = VECTOR_DB_DIR,
+        upload_root: str = UPLOAD_DIR,
+        embedding: Any = None,
+        cache: Optional[EmbeddingCache] = None,
+        max_open: int = KB_MAX_OPEN_COLLECTIONS,
+        max_collections: int = KB_MAX_COLLECTIONS,
+        **options: Any,
+    ):
+        self.root = root
+        self.upload_root = upload_root
+        self._embedding = embedding
+        self.cache = cache or EmbeddingCache()
+        # One pipeline for every collection, so concurrency and back-off apply to the provider as a whole
+        self.pipeline = EmbeddingPipeline()
+        self.max_open = max(1, max_open)
+        self.max_collections = max_collections
+        self.options = options  # further KnowledgeBase arguments (hybrid, backend, ...)
+        self.active = DEFAULT_COLLECTION
+        self.evictions = 0
+        self._open: "OrderedDict[str, KnowledgeBase]" = OrderedDict()
+        self._leases: Dict[KnowledgeBase, int] = {}
+        self._deleting: Set[str] = set()
+        self._lock = threading.RLock()
+        self._released = threading.Condition(self._lock)
+
+    @property
+    def embedding(self):
+        if self._embedding is None:
+            with self._lock:
+                if self._embedding is None:
+                    self._embedding = create_embeddings()
+        return self._embedding
+
+    @staticmethod
+    def validate(name: str) -> str:
+        if name != DEFAULT_COLLECTION and not _COLLECTION_RE.fullmatch(name):
+            raise ValueError(f"Invalid collection name '{name}'")
+        return name
+
+    def path(self, name: str) -> str:
+        return self.root if name == DEFAULT_COLLECTION else os.path.join(self.root, "collections", name)
+
+    def upload_dir(self, name: str) -> str:
+        return self.upload_root if name == DEFAULT_COLLECTION else os.path.join(self.upload_root, "collections", name)
+
+    def names(self) -> List[str]:
+        """Collections on disk (the default one always counts)."""
+        directory = os.path.join(self.root, "collections")
+        names = sorted(os.listdir(directory)) if os.path.isdir(directory) else []
+        return [DEFAULT_COLLECTION] + [name for name in names if _COLLECTION_RE.fullmatch(name)]
+
+    def exists(self, name: str) -> bool:
+        return name == DEFAULT_COLLECTION or os.path.isdir(self.path(self.validate(name)))
+
+    def _info_path(self, name: str) -> str:
+        return os.path.join(self.path(name), "collection.json")
+
+    def _create(self, name: str, info: Optional[Dict[str, Any]]):
+        if self.max_collections and len(self.names()) >= self.max_collections:
+            raise CollectionLimitError(
+                f"Collection limit reached ({self.max_collections}); delete an unused collection first")
+        os.makedirs(self.path(name), exist_ok=True)
+        with open(self._info_path(name), "w", encoding="utf-8") as f:
+            json.dump({**(info or {}), "created_at": time.time()}, f)
+        logger.info(f"Created knowledge-base collection '{name}'")
+
+    def get(self, name: Optional[str] = None, create: bool = True,
+            info: Optional[Dict[str, Any]] = None) -> Optional[KnowledgeBase]:
+        """
+        The collection's KnowledgeBase, opening it (and with `create`, creating
+        it with `info` such as its tenant and workspace) if needed. None when it
+        does not exist and `create` is False. The handle is not leased: use
+        lease() for anything that searches or writes.
+        """
+        name = self.validate(name or self.active)
+        with self._lock:
+            kb = self._get(name, create, info)
+            self._shrink(keep=name)
+            return kb
+
+    def _get(self, name: str, create: bool, info: Optional[Dict[str, Any]]) -> Optional[KnowledgeBase]:
+        if name in self._deleting:
+            raise CollectionBusyError(f"Collection '{name}' is being deleted")
+        kb = self._open.get(name)
+        if kb is not None:
+            self._open.move_to_end(name)
+            return kb
+        if not self.exists(name):
+            if not create:
+                return None
+            self._create(name, info)
+        kb = KnowledgeBase(persist_directory=self.path(name), embedding=self.embedding, cache=self.cache,
+                           pipeline=self.pipeline, **self.options)
+        self._open[name] = kb
+        return kb
+
+    def _shrink(self, keep: Optional[str] = None):
+        # Close the least recently used collections nobody holds a lease on
+        idle = [name for name, kb in self._open.items() if name != keep and not self._leases.get(kb)]
+        while len(self._open) > self.max_open and idle:
+            evicted = idle.pop(0)
+            self._open.pop(evicted).close()
+            self.evictions += 1
+            logger.info(f"Closed knowledge-base collection '{evicted}' (least recently used)")
+
+    def acquire(self, name: Optional[str] = None, create: bool = True,
+                info: Optional[Dict[str, Any]] = None) -> Optional[KnowledgeBase]:
+        """Like get(), and keeps the collection open until release()."""
+        name = self.validate(name or self.active)
+        with self._lock:
+            kb = self._get(name, create, info)
+            if kb is not None:
+                self._leases[kb] = self._leases.get(kb, 0) + 1
+            self._shrink()
+            return kb
+
+    def release(self, kb: KnowledgeBase):
+        with self._lock:
+            held = self._leases.pop(kb, 0) - 1
+            if held > 0:
+                self._leases[kb] = held
+            self._shrink()
+            self._released.notify_all()
+
+    @contextmanager
+    def lease(self, name: Optional[str] = None, create: bool = True,
+              info: Optional[Dict[str, Any]] = None) -> Iterator[Optional[KnowledgeBase]]:
+        kb = self.acquire(name, create, info)
+        try:
+            yield kb
+        finally:
+            if kb is not None:
+                self.release(kb)
+
+    @asynccontextmanager
+    async def alease(self, name: Optional[str] = None, create: bool = True,
+                     info: Optional[Dict[str, Any]] = None) -> AsyncIterator[Optional[KnowledgeBase]]:
+        # Opening a collection touches the disk, and so may closing an evicted one
+        kb = await asyncio.to_thread(self.acquire, name, create, info)
+        try:
+            yield kb
+        finally:
+            if kb is not None:
+                await asyncio.to_thread(self.release, kb)
+
+    def _size(self, name: str) -> int:
+        total = 0
+        for directory, subdirs, files in os.walk(self.path(name)):
+            if name == DEFAULT_COLLECTION and directory == self.root:
+                subdirs[:] = [d for d in subdirs if d != "collections"]
+            total += sum(os.path.getsize(os.path.join(directory, f)) for f in files)
+        return total
+
+    def describe(self, name: str) -> Dict[str, Any]:
+        manifest = Manifest(os.path.join(self.path(name), "manifest.json"))
+        entries = [manifest.get(source) for source in manifest.sources()]
+        info: Dict[str, Any] = {}
+        if os.path.exists(self._info_path(name)):
+            with open(self._info_path(name), "r", encoding="utf-8") as f:
+                info = json.load(f)
+        with self._lock:
+            is_open = name in self._open
+        return {
+            **info,
+            "name": name,
+            "active": name == self.active,
+            "open": is_open,
+            "sources": len(entries),
+            "chunks": sum(len(entry.chunk_ids) for entry in entries),
+            "size_bytes": self._size(name),
+        }
+
+    def list(self) -> List[Dict[str, Any]]:
+        return [self.describe(name) for name in self.names()]
+
+    def delete(self, name: str, timeout: float = 30.0) -> bool:
+        """
+        Remove a collection with its index and uploads. The default collection is
+        emptied instead. False if it does not exist.
+
+        New leases are refused while it is being deleted. Searches and
+        ingestions already holding one get `timeout` seconds to finish, after
+        which CollectionBusyError is raised and nothing is removed. Background
+        ingestion jobs should be cancelled first (IngestJobQueue.cancel_collection).
+        """
+        if not self.exists(name):
+            return False
+        if name == DEFAULT_COLLECTION:
+            with self.lease(name) as kb:
+                kb.clear()
+            return True
+        with self._lock:
+            if name in self._deleting:
+                raise CollectionBusyError(f"Collection '{name}' is being deleted")
+            self._deleting.add(name)
+            try:
+                kb = self._open.get(name)
+                if kb is not None and not self._released.wait_for(lambda: not self._leases.get(kb), timeout):
+                    raise CollectionBusyError(f"Collection '{name}' is still in use")
+                if self._open.pop(name, None) is not None:
+                    kb.close()  # also lets go of Chroma's handles on the directory
+                shutil.rmtree(self.path(name), ignore_errors=True)
+                shutil.rmtree(self.upload_dir(name), ignore_errors=True)
+                if self.active == name:
+                    self.active = DEFAULT_COLLECTION
+            finally:
+                self._deleting.discard(name)
+        logger.info(f"Deleted knowledge-base collection '{name}'")
+        return True
+
+    def select(self, name: str):
+        """Make `name` the active collection; it is created on first ingestion."""
+        self.active = self.validate(name)
+
+    def close(self):
+        with self._lock:
+            while self._open:
+                self._open.popitem()[1].close()
+            self.cache.close()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            open_names = list(self._open)
+        return {
+            "active": self.active,
+            "open": open_names,
+            "max_open": self.max_open,
+            "evictions": self.evictions,
+            "collections": len(self.names()),
+            "max_collections": self.max_collections,
+            "embedding_pipeline": self.pipeline.stats(),
+        }
+
+
+_knowledge_bases: Optional[KnowledgeBases] = None
+_knowledge_bases_lock = threading.Lock()
+
+
+def get_knowledge_bases() -> KnowledgeBases:
+    """The process-wide collection registry, created on first use."""
+    global _knowledge_bases
+    if _knowledge_bases is None:
+        with _knowledge_bases_lock:
+            if _knowledge_bases is None:
+                _knowledge_bases = KnowledgeBases(cache=EmbeddingCache(EMBEDDING_CACHE_PATH))
+    return _knowledge_bases
+
+
+def get_knowledge_base(collection: Optional[str] = None) -> KnowledgeBase:
+    """A collection's KnowledgeBase (the active one by default), created on first use."""
+    return get_knowledge_bases().get(collection)
+
+
+def select_workspace(workspace: Optional[str]):
+    """
+    Point uploads and the agent's knowledge-base searches at the workspace's
+    collection. Searches keep covering the default collection as well.
+    """
+    get_knowledge_bases().select(collection_name(workspace=workspace))
+
+
+def startup():
+    """Open the active store ahead of the first request. Called from the server lifespan."""
+    get_knowledge_base().store
+
+
+def shutdown():
+    global _knowledge_bases
+    with _knowledge_bases_lock:
+        if _knowledge_bases is not None:
+            _knowledge_bases.close()
+        _knowledge_bases = None
+
+
+def stats() -> Dict[str, Any]:
+    kbs = get_knowledge_bases()
+    kb = kbs.get(create=False)
+    return {
+        **(kb.stats() if kb is not None else {"open": False}),
+        "collections": kbs.stats(),
+        "query_batching": query_batcher.stats(),
+    }
+
+
+def get_vector_store(collection: Optional[str] = None):
+    """Get the shared vector store (Chroma or NumpyVectorStore, see VECTOR_STORE) of a collection."""
+    return get_knowledge_base(collection).store
+
+
+def ingest_file(file_path: str, tags: Optional[Dict[str, Any]] = None, collection: Optional[str] = None) -> int:
+    """Ingest a file (PDF or Text) into the vector store."""
+    with get_knowledge_bases().lease(collection) as kb:
+        return kb.ingest(file_path, tags)
+
+
+async def aingest_file(file_path: str, progress: Optional[Callable[[Dict[str, int]], None]] = None,
+                       tags: Optional[Dict[str, Any]] = None, collection: Optional[str] = None) -> int:
+    async with get_knowledge_bases().alease(collection) as kb:
+        return await kb.aingest(file_path, progress=progress, tags=tags)
+
+
+def search_collections(collection: Optional[str] = None) -> List[str]:
+    """
+    Collections a search covers: the named one, or else the active one plus
+    the default collection, so documents uploaded before a workspace was
+    selected stay searchable.
+    """
+    if collection:
+        return [collection]
+    active = get_knowledge_bases().active
+    return [active] if active == DEFAULT_COLLECTION else [active, DEFAULT_COLLECTION]
+
+
+def _merge(rankings: List[List[Hit]], k: int) -> List[Hit]:
+    if len(rankings) == 1:
+        return rankings[0]
+    hits = {hit.id: hit for ranking in rankings for hit in ranking}
+    ranking = reciprocal_rank_fusion([[hit.id for hit in ranking] for ranking in rankings], k=RAG_RRF_K)
+    return [hits[chunk_id] for chunk_id in ranking[:k]]
+
+
+def search_knowledge_base(query: str, k: int = 4, where: Optional[Dict[str, Any]] = None,
+                          collection: Optional[str] = None) -> List[Hit]:
+    """Best-matching chunks with ids and metadata, from search_collections(collection)."""
+    rankings = []
+    for name in search_collections(collection):
+        # Searching a collection nothing was ingested into should not create it
+        with get_knowledge_bases().lease(name, create=False) as kb:
+            rankings.append(kb.search(query, k=k, where=where) if kb is not None else [])
+    return _merge(rankings, k)
+
+
+def query_knowledge_base(query: str, k: int = 4, where: Optional[Dict[str, Any]] = None,
+                         collection: Optional[str] = None) -> List[str]:
+    """Search the knowledge base for relevant context."""
+    return [hit.text for hit in search_knowledge_base(query, k=k, where=where, collection=collection)]
+
+
+async def aquery_knowledge_base(query: str, k: int = 4, where: Optional[Dict[str, Any]] = None,
+                                collection: Optional[str] = None) -> List[str]:
+    return [hit.text for hit in await asearch_knowledge_base(query, k=k, where=where, collection=collection)]
+
+
+async def asearch_knowledge_base(query: str, k: int = 4, where: Optional[Dict[str, Any]] = None,
+                                 collection: Optional[str] = None) -> List[Hit]:
+    """Like aquery_knowledge_base, with chunk ids and metadata."""
+    async def search(name: str) -> List[Hit]:
+        async with get_knowledge_bases().alease(name, create=False) as kb:
+            return await kb.asearch(query, k=k, where=where) if kb is not None else []
+
+    return _merge(list(await asyncio.gather(*map(search, search_collections(collection)))), k)
+
+
+def reindex_knowledge_base(directory: Optional[str] = None, dry_run: bool = False,
+                           collection: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Re-ingest new and changed uploads and drop deleted ones (see
+    KnowledgeBase.reindex). Raises UnknownCollectionError rather than create
+    a collection that does not exist.
+    """
+    kbs = get_knowledge_bases()
+    name = collection or kbs.active
+    with kbs.lease(name, create=False) as kb:
+        if kb is None:
+            raise UnknownCollectionError(f"Unknown collection '{name}'")
+        return kb.reindex(directory or kbs.upload_dir(name), dry_run=dry_run)
+
+
+def clear_knowledge_base(collection: Optional[str] = None):
     """Clear the vector database."""
-    if os.path.exists(VECTOR_DB_DIR):
-        shutil.rmtree(VECTOR_DB_DIR)
-    # Re-initialize empty
-    get_vector_store()
+    with get_knowledge_bases().lease(collection) as kb:
+        kb.clear()
@@ -0,0 +1,35 @@
+"""
+Incrementally reindex the knowledge base from the command line.
+
+Compares the uploads directory with the manifest of ingested sources,
+re-ingests new and changed files (embedding only their new chunks) and
+removes the chunks of deleted files. Same operation as POST /knowledge/reindex.
+
+Usage:
+    python -m backend.reindex [--collection default] [--dir uploads] [--dry-run]
+"""
+import argparse
+import json
+
+from backend import rag
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--collection", default=rag.DEFAULT_COLLECTION,
+                        help="Knowledge-base collection to reindex (default: %(default)s)")
+    parser.add_argument("--dir", help="Directory of source documents (default: the collection's uploads folder)")
+    parser.add_argument("--dry-run", action="store_true", help="Report what would change without changing it")
+    args = parser.parse_args()
+
+    try:
+        report = rag.reindex_knowledge_base(args.dir, dry_run=args.dry_run, collection=args.collection)
+    except rag.UnknownCollectionError as e:
+        parser.error(e.args[0])
+    print(json.dumps(report, indent=2))
+    rag.shutdown()
+    return 1 if report["failed"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
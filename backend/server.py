@@ -1,9 +1,18 @@
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
+from typing import Literal
 from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.exceptions import RequestValidationError
-from backend.graph import workflow
+from backend.graph import workflow, llm_registry, tool_router, tool_node
+from backend.config import PARALLEL_TOOL_CALLS
+from backend.http_client import http
+from backend.memo import memo_cache
+from backend.process_pool import cpu_pool
+from backend.core_tools import sentiment_batcher, summarize_batcher
+from backend.compaction import prompt_metrics
+from backend.ingest_jobs import ingest_jobs, QueueFullError
+from backend.code_index import code_indexer
 from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
 from contextlib import asynccontextmanager
 from langchain_core.messages import HumanMessage
@@ -13,6 +22,7 @@ import asyncio
 # Import error handling
 from backend.errors import (
     AppError,
+    AgentError,
     WorkspaceError,
     FileOperationError,
     PathSecurityError,
@@ -29,9 +39,21 @@ async def lifespan(app: FastAPI):
     # Startup: Initialize AsyncSqliteSaver and compile graph
     async with AsyncSqliteSaver.from_conn_string("checkpoints.sqlite") as checkpointer:
         app.state.graph = workflow.compile(checkpointer=checkpointer)
+        # Warm the CPU-bound tool workers so the first solve/format call does not pay for spawning
+        cpu_pool.start()
+        # Open the vector store once; queries and uploads reuse it
+        from backend import rag
+        await asyncio.to_thread(rag.startup)
+        ingest_jobs.start()
         logger.info("Application started successfully")
         yield
         logger.info("Application shutting down")
+        await llm_registry.aclose()
+        await http.aclose()
+        cpu_pool.shutdown()
+        await ingest_jobs.shutdown()
+        await asyncio.to_thread(code_indexer.stop)
+        rag.shutdown()
         # Shutdown logic if needed (checkpointer closes automatically via context manager)
 
 app = FastAPI(lifespan=lifespan)
@@ -58,6 +80,80 @@ class ChatRequest(BaseModel):
     temperature: float = 0.7
     system_prompt: str | None = None
     json_mode: bool = False
+    # Tell the model it may batch independent tool calls into one step
+    parallel_tool_calls: bool = PARALLEL_TOOL_CALLS
+    # "updates" emits one frame per finished message (legacy clients);
+    # "messages" emits token-level AIMessageChunk frames plus node markers
+    stream_mode: Literal["updates", "messages"] = "updates"
+
+def serialize_message(msg, node: str) -> dict:
+    """Convert a LangChain message into the NDJSON frame sent to clients."""
+    msg_data = {
+        "type": msg.type,
+        "content": msg.content,
+        "node": node,
+    }
+    # Add tool calls if present (for AI messages)
+    if hasattr(msg, "tool_calls") and msg.tool_calls:
+        msg_data["tool_calls"] = msg.tool_calls
+
+    # Add tool output if present (for Tool messages)
+    if hasattr(msg, "artifact"):
+        msg_data["artifact"] = str(msg.artifact)
+    return msg_data
+
+async def stream_updates(graph, inputs, config):
+    """Yield one frame per message once each node has finished."""
+    async for event in graph.astream(inputs, config, stream_mode="updates"):
+        for node, updates in event.items():
+            if updates and "messages" in updates:
+                for msg in updates["messages"]:
+                    # RemoveMessage entries come from history compaction, not the model
+                    if msg.type != "remove":
+                        yield serialize_message(msg, node)
+
+async def stream_tokens(graph, inputs, config):
+    """
+    Yield token-level frames using LangGraph "messages" streaming.
+
+    Frames:
+      {"type": "node_start", "node": ...}
+      {"type": "AIMessageChunk", "content": <delta>, "node": ..., "id": ...}
+      {"type": "tool_call_chunk", "node": ..., "index": ..., "id": ..., "name": ..., "args": <delta>}
+      {"type": "tool", ...}  (complete tool results, same shape as "updates" mode)
+      {"type": "node_end", "node": ..., "error": ...}
+    """
+    async for mode, payload in graph.astream(inputs, config, stream_mode=["messages", "tasks"]):
+        if mode == "tasks":
+            # Task events without a "result" key mark the start of a node
+            if "result" in payload:
+                frame = {"type": "node_end", "node": payload["name"]}
+                if payload.get("error"):
+                    frame["error"] = str(payload["error"])
+                yield frame
+            else:
+                yield {"type": "node_start", "node": payload["name"]}
+            continue
+
+        msg, metadata = payload
+        node = metadata.get("langgraph_node", "")
+        if msg.type == "remove":
+            continue
+        if msg.type != "AIMessageChunk":
+            yield serialize_message(msg, node)
+            continue
+
+        if msg.content:
+            yield {"type": "AIMessageChunk", "content": msg.content, "node": node, "id": msg.id}
+        for chunk in msg.tool_call_chunks or []:
+            yield {
+                "type": "tool_call_chunk",
+                "node": node,
+                "index": chunk.get("index"),
+                "id": chunk.get("id"),
+                "name": chunk.get("name"),
+                "args": chunk.get("args"),
+            }
 
 from langfuse.langchain import CallbackHandler
 
@@ -73,7 +169,8 @@ async def chat(request: ChatRequest):
                 "model_name": request.model_name,
                 "temperature": request.temperature,
                 "system_prompt": request.system_prompt,
-                "json_mode": request.json_mode
+                "json_mode": request.json_mode,
+                "parallel_tool_calls": request.parallel_tool_calls
             },
             "callbacks": [langfuse_handler]
         }
@@ -83,36 +180,18 @@ async def chat(request: ChatRequest):
             extra={
                 "thread_id": request.thread_id,
                 "model": request.model_name,
-                "message_length": len(request.message)
+                "message_length": len(request.message),
+                "stream_mode": request.stream_mode
             }
         )
         
+        inputs = {"messages": [HumanMessage(content=request.message)]}
+        stream = stream_tokens if request.stream_mode == "messages" else stream_updates
+
         async def event_generator():
             try:
-                # We use astream for async streaming of updates
-                async for event in app.state.graph.astream(
-                    {"messages": [HumanMessage(content=request.message)]},
-                    config,
-                    stream_mode="updates"
-                ):
-                    for node, updates in event.items():
-                        if "messages" in updates:
-                            for msg in updates["messages"]:
-                                # Prepare message dict
-                                msg_data = {
-                                    "type": msg.type,
-                                    "content": msg.content,
-                                    "node": node,
-                                }
-                                # Add tool calls if present (for AI messages)
-                                if hasattr(msg, "tool_calls") and msg.tool_calls:
-                                    msg_data["tool_calls"] = msg.tool_calls
-                                
-                                # Add tool output if present (for Tool messages)
-                                if hasattr(msg, "artifact"):
-                                    msg_data["artifact"] = str(msg.artifact)
-
-                                yield json.dumps(msg_data) + "\n"
+                async for frame in stream(app.state.graph, inputs, config):
+                    yield json.dumps(frame, default=str) + "\n"
             except Exception as e:
                 logger.error(f"Error in chat stream: {str(e)}", exc_info=True)
                 yield json.dumps({
@@ -141,30 +220,189 @@ def health():
         return {"status": "error", "message": "Graph not initialized"}
     return {"status": "ok"}
 
+@app.get("/metrics")
+def metrics():
+    # Runtime counters for caches and pools, for dashboards and benchmarks
+    from backend import rag
+    return {
+        "llm_cache": llm_registry.stats(),
+        "prompt": prompt_metrics.stats(),
+        "tool_router": tool_router.stats(),
+        "tools": tool_node.stats(),
+        "http": http.stats(),
+        "memo": memo_cache.stats(),
+        "cpu_pool": cpu_pool.stats(),
+        "nlp_batching": {
+            "sentiment": sentiment_batcher.stats(),
+            "summarize": summarize_batcher.stats(),
+        },
+        "ingest_jobs": ingest_jobs.stats(),
+        "rag": rag.stats(),
+        "code_index": code_indexer.status(),
+    }
+
+@app.get("/tools")
+def list_tools():
+    # Tool availability is derived from installed packages without importing them
+    from backend.core_tools import tool_availability
+    return tool_availability()
+
 # RAG Upload Endpoint
 from fastapi import UploadFile, File
 import shutil
 import os
-from backend.rag import ingest_file
+import uuid
 
-@app.post("/upload")
-async def upload_file(file: UploadFile = File(...)):
+@app.post("/upload", status_code=202)
+async def upload_file(file: UploadFile = File(...), tenant: str | None = None):
+    # Ingestion runs in the background; the response carries a job id to follow
+    from backend import rag
+    workspace = os.path.abspath(WORKSPACE_ROOT) if WORKSPACE_ROOT else None
+    # Each tenant/workspace has its own collection and uploads folder
+    collection = rag.collection_name(tenant, workspace)
+    kbs = rag.get_knowledge_bases()
+    try:
+        await asyncio.to_thread(kbs.get, collection, True, {"tenant": tenant, "workspace": workspace})
+    except rag.CollectionLimitError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    # Save file to the collection's uploads directory, under a hidden name (skipped by reindex)
+    # until the job is queued, so a rejected upload neither stays behind nor replaces an earlier one
+    uploads_dir = kbs.upload_dir(collection)
+    file_path = os.path.join(uploads_dir, file.filename)
+    partial = os.path.join(uploads_dir, f".{file.filename}.{uuid.uuid4().hex}.part")
     try:
-        # Save file to uploads directory
-        uploads_dir = os.path.join(os.getcwd(), "uploads")
         os.makedirs(uploads_dir, exist_ok=True)
-        file_path = os.path.join(uploads_dir, file.filename)
-        
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-            
-        # Ingest into Vector DB
-        num_chunks = ingest_file(file_path)
-        
-        return {"status": "success", "message": f"File '{file.filename}' processed and added {num_chunks} chunks to knowledge base."}
+        with open(partial, "wb") as buffer:
+            await asyncio.to_thread(shutil.copyfileobj, file.file, buffer)
+
+        # Chunks remember the workspace they were uploaded in, for scoped searches
+        tags = {"workspace": workspace} if workspace else None
+        job = ingest_jobs.submit(file_path, file.filename, tags, collection)
+        # No await since submit(), so the job cannot have started reading the file yet
+        os.replace(partial, file_path)
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+
+    return {
+        "status": "queued",
+        "job_id": job.id,
+        "collection": collection,
+        "message": f"File '{file.filename}' uploaded and queued for indexing.",
+    }
+
+@app.get("/upload/jobs")
+def list_ingest_jobs():
+    return ingest_jobs.list()
+
+@app.get("/upload/jobs/{job_id}")
+def get_ingest_job(job_id: str):
+    job = ingest_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown ingestion job '{job_id}'")
+    return job.snapshot()
+
+@app.get("/upload/jobs/{job_id}/events")
+async def ingest_job_events(job_id: str, format: Literal["ndjson", "sse"] = "ndjson"):
+    # One frame per progress change, ending with the job's final state
+    if ingest_jobs.get(job_id) is None:
+        raise HTTPException(status_code=404, detail=f"Unknown ingestion job '{job_id}'")
+
+    async def frames():
+        async for snapshot in ingest_jobs.events(job_id):
+            if format == "sse":
+                yield f"event: progress\ndata: {json.dumps(snapshot)}\n\n"
+            else:
+                yield json.dumps(snapshot) + "\n"
+
+    media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+    return StreamingResponse(frames(), media_type=media_type)
+
+@app.delete("/upload/jobs/{job_id}")
+def cancel_ingest_job(job_id: str):
+    job = ingest_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown ingestion job '{job_id}'")
+    if not ingest_jobs.cancel(job_id):
+        raise HTTPException(status_code=409, detail=f"Job '{job_id}' already {job.status}")
+    return {"status": "cancelling", "job_id": job_id}
+
+@app.post("/knowledge/reindex")
+async def reindex_knowledge(dry_run: bool = False, collection: str | None = None):
+    # Re-ingest new/changed uploads and drop deleted ones; unchanged files are not parsed
+    from backend.rag import UnknownCollectionError, reindex_knowledge_base
+    try:
+        return await asyncio.to_thread(reindex_knowledge_base, None, dry_run, collection)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except UnknownCollectionError as e:
+        raise HTTPException(status_code=404, detail=e.args[0])
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/knowledge/collections")
+async def list_knowledge_collections():
+    from backend import rag
+    kbs = rag.get_knowledge_bases()
+    return {**kbs.stats(), "collections": await asyncio.to_thread(kbs.list)}
+
+@app.delete("/knowledge/collections/{name}")
+async def delete_knowledge_collection(name: str):
+    # Drops the collection's index and uploads; the default collection is only emptied
+    from backend import rag
+    try:
+        rag.KnowledgeBases.validate(name)
+        # Queued and running uploads into it would otherwise write into a removed directory
+        cancelled = await ingest_jobs.cancel_collection(name)
+        deleted = await asyncio.to_thread(rag.get_knowledge_bases().delete, name)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except rag.CollectionBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if not deleted:
+        raise HTTPException(status_code=404, detail=f"Unknown collection '{name}'")
+    return {"status": "deleted", "collection": name, "cancelled_jobs": cancelled}
+
+class KnowledgeSearchRequest(BaseModel):
+    query: str
+    k: int = 4
+    sources: list[str] = []
+    workspace: str | None = None
+    page_from: int | None = None
+    page_to: int | None = None
+    uploaded_after: str | None = None
+    uploaded_before: str | None = None
+    # Searches the active collection unless one is named (or derived from a tenant)
+    collection: str | None = None
+    tenant: str | None = None
+
+@app.post("/knowledge/search")
+async def search_knowledge(request: KnowledgeSearchRequest):
+    # Filters are pushed down into Chroma, so only the matching chunks are ranked
+    from backend import rag
+    from backend.rag import asearch_knowledge_base, build_filter
+    collection = request.collection
+    if collection is None and request.tenant:
+        collection = rag.collection_name(request.tenant, WORKSPACE_ROOT)
+    try:
+        where = build_filter(
+            request.sources, request.workspace, request.page_from, request.page_to,
+            request.uploaded_after, request.uploaded_before,
+        )
+        hits = await asearch_knowledge_base(request.query, k=request.k, where=where, collection=collection)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {
+        "collection": collection or rag.get_knowledge_bases().active,
+        "searched": rag.search_collections(collection),
+        "filter": where,
+        "results": [{"id": hit.id, "text": hit.text, "metadata": hit.metadata} for hit in hits],
+    }
+
 # File Explorer Endpoints
 class FileRequest(BaseModel):
     path: str
@@ -227,6 +465,11 @@ async def set_workspace(request: WorkspaceRequest):
         # Change current working directory so that agent tools (which use os.getcwd) work correctly
         os.chdir(WORKSPACE_ROOT)
         logger.info(f"Workspace changed to: {WORKSPACE_ROOT}")
+        # Index the project's source in the background for search_codebase
+        code_indexer.select(WORKSPACE_ROOT)
+        # Knowledge-base searches now go to this workspace's collection
+        from backend import rag
+        rag.select_workspace(WORKSPACE_ROOT)
         
         return {"status": "success", "message": f"Workspace changed to {WORKSPACE_ROOT}"}
     except OSError as e:
@@ -262,6 +505,10 @@ async def select_workspace_native():
         # Change current working directory so that agent tools (which use os.getcwd) work correctly
         os.chdir(WORKSPACE_ROOT)
         logger.info(f"Workspace selected via native dialog: {WORKSPACE_ROOT}")
+        code_indexer.select(WORKSPACE_ROOT)
+        # Knowledge-base searches now go to this workspace's collection
+        from backend import rag
+        rag.select_workspace(WORKSPACE_ROOT)
             
         return {"status": "success", "path": WORKSPACE_ROOT, "message": f"Workspace changed to {WORKSPACE_ROOT}"}
         
@@ -278,6 +525,17 @@ async def select_workspace_native():
             details={"error": str(e)}
         )
 
+@app.get("/workspace/index")
+async def get_workspace_index():
+    return code_indexer.status()
+
+@app.post("/workspace/index")
+async def refresh_workspace_index():
+    # Rescan now instead of waiting for the next CODE_INDEX_INTERVAL tick
+    check_workspace()
+    code_indexer.refresh()
+    return code_indexer.status()
+
 @app.get("/files")
 async def list_files():
     # List files from the current workspace root
@@ -0,0 +1,93 @@
+import threading
+import time
+from unittest.mock import patch
+from backend.batching import Histogram, MicroBatcher
+
+def test_concurrent_submits_share_one_batch():
+    batches = []
+
+    def batch_fn(key, items):
+        batches.append(list(items))
+        return [item * 2 for item in items]
+
+    batcher = MicroBatcher("test", batch_fn, max_batch_size=8, window_ms=500)
+    results = {}
+    ready = threading.Barrier(5)
+
+    def call(i):
+        ready.wait()  # submit together even when thread start-up is slow
+        results[i] = batcher.submit(i).result()
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results == {i: i * 2 for i in range(5)}
+    assert len(batches) == 1
+    assert batcher.stats()["batch_size"]["count"] == 1
+
+def test_batches_respect_max_size_and_keys():
+    batches = []
+
+    def batch_fn(key, items):
+        batches.append((key, len(items)))
+        return items
+
+    batcher = MicroBatcher("test", batch_fn, max_batch_size=3, window_ms=20)
+    futures = batcher.submit_many(range(5), key="a") + batcher.submit_many(range(2), key="b")
+    assert [f.result() for f in futures] == [0, 1, 2, 3, 4, 0, 1]
+    assert sorted(batches) == [("a", 2), ("a", 3), ("b", 2)]
+
+def test_error_string_is_returned_to_every_caller():
+    batcher = MicroBatcher("test", lambda key, items: "Error: model failed", window_ms=1)
+    futures = batcher.submit_many(["x", "y"])
+    assert [f.result() for f in futures] == ["Error: model failed"] * 2
+
+def test_batches_run_concurrently_up_to_max_in_flight():
+    active, peak, lock = [0], [0], threading.Lock()
+
+    def batch_fn(key, items):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.1)
+        with lock:
+            active[0] -= 1
+        return items
+
+    batcher = MicroBatcher("test", batch_fn, max_batch_size=1, window_ms=0, max_in_flight=2)
+    futures = batcher.submit_many(range(4))
+    assert [f.result() for f in futures] == [0, 1, 2, 3]
+    assert peak[0] == 2
+
+def test_histogram_buckets():
+    h = Histogram([1, 5])
+    for v in (0.5, 3, 10):
+        h.observe(v)
+    assert h.snapshot()["buckets"] == {"<=1": 1, "<=5": 1, "+Inf": 1}
+
+def test_sentiment_batch_tool_uses_one_inference_call():
+    from backend import core_tools
+    calls = []
+
+    def fake_run(texts):
+        calls.append(list(texts))
+        return [{"label": "POSITIVE", "score": 0.9}] * len(texts)
+
+    with patch.object(core_tools, "_run_sentiment", fake_run), patch.object(core_tools.hf_pipeline, "available", return_value=True):
+        result = core_tools.sentiment_batch(["good", "great", "fine"])
+    assert result.splitlines() == [f"{i}. Label: POSITIVE, score: 0.900" for i in (1, 2, 3)]
+    assert calls == [["good", "great", "fine"]]
+
+def test_nlp_models_are_loaded_by_the_worker_preload():
+    from backend import core_tools
+    from backend.process_pool import cpu_pool
+    built = []
+
+    assert "backend.core_tools:_load_nlp_models" in cpu_pool.preload
+    with patch.object(core_tools, "hf_pipeline", lambda task: built.append(task) or task), \
+            patch.object(core_tools, "_sentiment_pipe", None), patch.object(core_tools, "_summarizer", None):
+        core_tools._load_nlp_models()
+        assert (core_tools._sentiment_model(), core_tools._summarization_model()) == ("sentiment-analysis", "summarization")
+    assert built == ["sentiment-analysis", "summarization"]
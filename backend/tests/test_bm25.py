@@ -0,0 +1,40 @@
+from backend.bm25 import BM25Index, is_identifier, reciprocal_rank_fusion, tokenize
+
+def test_tokenizer_keeps_identifiers_and_their_parts():
+    assert tokenize("call get_vector_store()") == ["call", "get_vector_store", "get", "vector", "store"]
+    assert tokenize("raised ValueError") == ["raised", "valueerror", "value", "error"]
+    assert "os.path.join" in tokenize("use os.path.join here")
+
+def test_identifier_detection():
+    for query in ["get_vector_store", "ValueError", "E1102", "os.path.join", "`parse_args()`", "404"]:
+        assert is_identifier(query), query
+    for query in ["deployment", "how do I rotate keys", "", "what is E1102?"]:
+        assert not is_identifier(query), query
+
+def test_exact_identifier_ranks_first():
+    index = BM25Index()
+    index.add(["a", "b", "c"], [
+        "The vector store keeps embeddings on disk.",
+        "get_vector_store returns the shared Chroma instance.",
+        "Store your keys in a vault.",
+    ])
+    assert index.search("get_vector_store", k=3)[0][0] == "b"
+    assert {chunk for chunk, _ in index.search("vector store", k=3)} >= {"a", "b"}
+
+def test_replace_and_delete(tmp_path):
+    db = str(tmp_path / "bm25.sqlite")
+    index = BM25Index(db)
+    index.add(["a"], ["alpha beta"])
+    index.add(["a"], ["gamma"])
+    assert index.search("alpha") == []
+    index.add(["b"], ["gamma delta"])
+    index.delete(["a"])
+    index.close()
+    reopened = BM25Index(db)
+    assert reopened.count() == 1
+    assert [chunk for chunk, _ in reopened.search("gamma")] == ["b"]
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = reciprocal_rank_fusion([["x", "y", "z"], ["y", "w"]])
+    assert fused[0] == "y"
+    assert set(fused) == {"x", "y", "z", "w"}
@@ -0,0 +1,160 @@
+import asyncio
+import textwrap
+import threading
+import time
+
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from backend import code_index, rag
+from backend.core_tools import asearch_codebase
+
+PYTHON_SOURCE = textwrap.dedent('''\
+    import os
+
+    LIMIT = 3
+
+
+    @cache
+    def load(path):
+        return open(path).read()
+
+
+    class Store:
+        """A store."""
+
+        def get(self, key):
+            return key
+
+        def put(self, key, value):
+            pass
+''')
+
+@pytest.fixture
+def workspace(tmp_path):
+    root = tmp_path / "project"
+    (root / "pkg").mkdir(parents=True)
+    (root / "pkg" / "store.py").write_text(PYTHON_SOURCE)
+    (root / "web.js").write_text("export function renderInvoiceTable(rows) {\n  return rows.length;\n}\n")
+    (root / "node_modules" / "dep").mkdir(parents=True)
+    (root / "node_modules" / "dep" / "index.js").write_text("function vendored() {}\n")
+    return root
+
+@pytest.fixture
+def indexer(tmp_path, monkeypatch):
+    embedding = DeterministicFakeEmbedding(size=32)
+    monkeypatch.setattr(rag, "_knowledge_bases", rag.KnowledgeBases(root=str(tmp_path / "kb"), embedding=embedding))
+    indexer = code_index.CodeIndexer(index_dir=str(tmp_path / "index"), interval=3600, embedding=embedding)
+    yield indexer
+    indexer.stop()
+
+def _wait_indexed(indexer, timeout=10):
+    # select() indexes in the background; wait for that pass before touching the tree
+    deadline = time.monotonic() + timeout
+    while indexer.last_indexed is None:
+        assert time.monotonic() < deadline, indexer.status()
+        time.sleep(0.02)
+
+def test_python_chunks_follow_definitions():
+    chunks = code_index.chunk_source(PYTHON_SOURCE, "python")
+    spans = [(c.symbol, c.kind, c.start, c.end) for c in chunks]
+    assert spans == [
+        ("<module>", "module", 1, 3),
+        ("load", "function", 6, 8),
+        ("Store", "class", 11, 18),
+    ]
+
+def test_large_classes_are_split_into_methods():
+    chunks = code_index.chunk_source(PYTHON_SOURCE, "python", max_lines=5)
+    symbols = [(c.symbol, c.start, c.end) for c in chunks]
+    assert ("Store", 11, 13) in symbols
+    assert ("Store.get", 14, 15) in symbols
+    assert ("Store.put", 17, 18) in symbols
+
+def test_long_definitions_are_windowed():
+    source = "def big():\n" + "".join(f"    x{i} = {i}\n" for i in range(25))
+    chunks = code_index.chunk_source(source, "python", max_lines=10)
+    assert [(c.start, c.end) for c in chunks] == [(1, 10), (11, 20), (21, 26)]
+    assert chunks[1].symbol == "big (part 2)"
+
+def test_pattern_chunks_for_other_languages():
+    source = "import x from 'x';\n\nexport function a() {\n}\n\nconst b = (y) => {\n  return y;\n};\n"
+    chunks = code_index.chunk_source(source, "javascript")
+    assert [(c.symbol, c.start, c.end) for c in chunks] == [("<module>", 1, 1), ("a", 3, 4), ("b", 6, 8)]
+
+def test_walker_skips_vendored_and_unknown_files(workspace):
+    (workspace / "image.png").write_bytes(b"\x89PNG")
+    (workspace / "huge.py").write_text("x = 1\n" * 100)
+    files = code_index.iter_source_files(str(workspace), max_bytes=200)
+    assert sorted(p.rsplit("project", 1)[1] for p in files) == ["/pkg/store.py", "/web.js"]
+
+def test_indexes_workspace_and_searches_with_line_ranges(indexer, workspace):
+    indexer.select(str(workspace))
+    _wait_indexed(indexer)
+    assert indexer.last_report["added"] == 2
+
+    hits = indexer.search("renderInvoiceTable", k=1)
+    assert hits[0].metadata["path"] == "web.js"
+    assert (hits[0].metadata["start_line"], hits[0].metadata["end_line"]) == (1, 3)
+    assert indexer.search("Store", k=1)[0].metadata["path"] == "pkg/store.py"
+
+def test_reindex_only_touches_changed_files(indexer, workspace):
+    indexer.select(str(workspace))
+    _wait_indexed(indexer)
+    (workspace / "web.js").write_text("export function renderReceipt() {\n  return 1;\n}\n")
+    (workspace / "pkg" / "store.py").unlink()
+    indexer.index_now()
+    assert indexer.last_report["updated"] == 1
+    assert indexer.last_report["removed"] == 1
+    assert indexer.last_report["unchanged"] == 0
+    assert indexer.search("renderReceipt", k=1)[0].metadata["symbol"] == "renderReceipt"
+
+def test_switching_workspace_waits_for_the_running_pass(tmp_path, workspace, monkeypatch):
+    embedding = DeterministicFakeEmbedding(size=32)
+    cache = rag.EmbeddingCache(str(tmp_path / "cache.sqlite"))
+    monkeypatch.setattr(rag, "_knowledge_bases", rag.KnowledgeBases(root=str(tmp_path / "kb"), embedding=embedding,
+                                                                    cache=cache))
+    indexer = code_index.CodeIndexer(index_dir=str(tmp_path / "index"), interval=3600, embedding=embedding)
+    entered, release = threading.Event(), threading.Event()
+    load = code_index.load_code
+
+    def slow_load(path, root):
+        if root == str(workspace):
+            entered.set()
+            release.wait(5)
+        return load(path, root)
+
+    monkeypatch.setattr(code_index, "load_code", slow_load)
+    other = tmp_path / "other"
+    other.mkdir()
+    (other / "billing.py").write_text("def invoice_total(rows):\n    return sum(rows)\n")
+    try:
+        indexer.select(str(workspace))
+        assert entered.wait(5)
+        old = indexer._kb
+        switching = threading.Thread(target=indexer.select, args=(str(other),))
+        switching.start()
+        switching.join(0.2)
+        assert switching.is_alive()  # the old workspace's KnowledgeBase is still being written to
+        release.set()
+        switching.join(5)
+        assert not switching.is_alive() and not old.is_open
+        _wait_indexed(indexer)
+        assert indexer.search("invoice_total", k=1)[0].metadata["path"] == "billing.py"
+        # The embedding cache is shared with the document collections and stays open
+        assert cache._db is not None
+    finally:
+        release.set()
+        indexer.stop()
+
+def test_tool_formats_snippets(indexer, workspace, monkeypatch):
+    monkeypatch.setattr(code_index, "code_indexer", indexer)
+    indexer.select(str(workspace))
+    _wait_indexed(indexer)
+    result = asyncio.run(asearch_codebase("renderInvoiceTable"))
+    assert result.startswith("1. web.js:1-3 renderInvoiceTable (definition)")
+    assert "return rows.length;" in result
+
+def test_tool_without_workspace(monkeypatch, tmp_path):
+    monkeypatch.setattr(code_index, "code_indexer", code_index.CodeIndexer(index_dir=str(tmp_path)))
+    assert asyncio.run(asearch_codebase("anything")) == "Error searching codebase: No workspace selected."
@@ -0,0 +1,53 @@
+import pytest
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from backend.compaction import compact, estimate_tokens, recent_turns_start, with_summary
+
+def _history(turns, tool_output="x" * 4000):
+    messages = []
+    for i in range(turns):
+        messages += [
+            HumanMessage(content=f"question {i}", id=f"h{i}"),
+            AIMessage(content="", id=f"a{i}", tool_calls=[{"name": "read_file", "args": {"path": "f"}, "id": f"c{i}"}]),
+            ToolMessage(content=tool_output, tool_call_id=f"c{i}", id=f"t{i}"),
+            AIMessage(content=f"answer {i}", id=f"r{i}"),
+        ]
+    return messages
+
+def _summarizer(text="summary of old turns"):
+    return GenericFakeChatModel(messages=iter([AIMessage(content=text)]))
+
+def test_recent_turns_start():
+    messages = _history(5)
+    assert recent_turns_start(messages, 2) == 12
+    assert recent_turns_start(messages, 10) == 0
+
+@pytest.mark.asyncio
+async def test_under_budget_is_untouched():
+    messages = _history(2, tool_output="short")
+    result = await compact(messages, "", "system", "m", _summarizer(), keep_turns=1, budget=10_000)
+    assert result.stage == "none"
+    assert result.messages == messages
+    assert result.removed_ids == []
+
+@pytest.mark.asyncio
+async def test_old_tool_outputs_are_stubbed():
+    messages = _history(4)
+    budget = estimate_tokens(messages) - 1000
+    result = await compact(messages, "", "system", "m", _summarizer(), keep_turns=1, budget=budget)
+    assert result.stage == "stub"
+    assert result.removed_ids == []
+    assert "truncated" in result.messages[2].content
+    # The last turn is kept verbatim
+    assert result.messages[-2].content == "x" * 4000
+    assert result.tokens_after < result.tokens_before
+
+@pytest.mark.asyncio
+async def test_history_is_folded_into_summary():
+    messages = _history(4)
+    result = await compact(messages, "", "system", "m", _summarizer(), keep_turns=1, budget=1200)
+    assert result.stage == "summary"
+    assert result.summary == "summary of old turns"
+    assert result.messages == messages[12:]
+    assert result.removed_ids == [m.id for m in messages[:12]]
+    assert "summary of old turns" in with_summary("system", result.summary)
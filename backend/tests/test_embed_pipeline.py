@@ -0,0 +1,135 @@
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from backend.embed_pipeline import EmbeddingPipeline, is_retryable
+
+
+class _Error(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+class _FlakyEmbedding:
+    """Embeds "n" as [n]; the first call for each text in `fail` raises with its status code."""
+
+    def __init__(self, fail=None, status=429):
+        self.fail = set(fail or ())
+        self.status = status
+        self.calls = []
+
+    async def aembed_documents(self, texts):
+        self.calls.append(list(texts))
+        await asyncio.sleep(0)
+        if self.fail & set(texts):
+            self.fail -= set(texts)
+            raise _Error(self.status)
+        return [[float(text)] for text in texts]
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        if self.fail & set(texts):
+            self.fail -= set(texts)
+            raise _Error(self.status)
+        return [[float(text)] for text in texts]
+
+
+def _texts(n):
+    return [str(i) for i in range(n)]
+
+def test_only_failed_batches_are_retried_and_limit_backs_off():
+    embedding = _FlakyEmbedding(fail={"4"})
+    pipeline = EmbeddingPipeline(batch_size=2, max_concurrency=4, backoff_base=0.001, backoff_max=0.001)
+    vectors = asyncio.run(pipeline.embed(embedding, _texts(8)))
+
+    assert vectors == [[float(i)] for i in range(8)]
+    assert sorted(map(tuple, embedding.calls)) == sorted([("0", "1"), ("2", "3"), ("4", "5"), ("4", "5"), ("6", "7")])
+    stats = pipeline.stats()
+    assert (stats["batches"], stats["chunks"], stats["retries"], stats["rate_limited"]) == (4, 8, 1, 1)
+    assert stats["limit"] < 4
+
+def test_gives_up_after_max_retries_and_on_client_errors():
+    pipeline = EmbeddingPipeline(batch_size=2, max_retries=0, backoff_base=0)
+    with pytest.raises(_Error):
+        asyncio.run(pipeline.embed(_FlakyEmbedding(fail={"1"}), _texts(4)))
+    with pytest.raises(_Error):
+        EmbeddingPipeline(backoff_base=0).embed_sync(_FlakyEmbedding(fail={"0"}, status=400), _texts(2))
+    assert pipeline.stats()["failed"] == 1
+    assert is_retryable(_Error(503)) and is_retryable(TimeoutError()) and not is_retryable(_Error(401))
+
+def test_sync_path_retries():
+    embedding = _FlakyEmbedding(fail={"2"}, status=500)
+    pipeline = EmbeddingPipeline(batch_size=2, backoff_base=0.001, backoff_max=0.001)
+    assert pipeline.embed_sync(embedding, _texts(5)) == [[float(i)] for i in range(5)]
+    assert embedding.calls == [["0", "1"], ["2", "3"], ["2", "3"], ["4"]]
+
+
+class _StubServer(ThreadingHTTPServer):
+    """OpenAI-compatible /v1/embeddings that answers 429 when more than `capacity` requests overlap."""
+
+    def __init__(self, capacity):
+        super().__init__(("127.0.0.1", 0), _StubHandler)
+        self.capacity = capacity
+        self.active = self.peak = self.requests = self.rejected = 0
+        self.lock = threading.Lock()
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            server.active += 1
+            server.peak = max(server.peak, server.active)
+            overloaded = server.active > server.capacity
+            server.rejected += overloaded
+        try:
+            if overloaded:
+                payload, status = {"error": {"message": "rate limited", "type": "rate_limit"}}, 429
+            else:
+                threading.Event().wait(0.02)
+                data = [{"object": "embedding", "index": i, "embedding": [float(len(str(text))), 1.0]}
+                        for i, text in enumerate(body["input"])]
+                payload, status = {"object": "list", "data": data, "model": body["model"],
+                                   "usage": {"prompt_tokens": 0, "total_tokens": 0}}, 200
+        finally:
+            with server.lock:
+                server.active -= 1
+        encoded = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(encoded)))
+        self.end_headers()
+        self.wfile.write(encoded)
+
+def test_against_stub_embedding_server():
+    from langchain_openai import OpenAIEmbeddings
+
+    server = _StubServer(capacity=2)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        embedding = OpenAIEmbeddings(model="stub", base_url=f"http://127.0.0.1:{server.server_port}/v1",
+                                     api_key="x", max_retries=0, check_embedding_ctx_length=False)
+        pipeline = EmbeddingPipeline(batch_size=4, max_concurrency=6, backoff_base=0.01, backoff_max=0.05,
+                                     max_retries=20)
+        texts = ["x" * (i % 7 + 1) for i in range(96)]
+        vectors = asyncio.run(pipeline.embed(embedding, texts))
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert [vector[0] for vector in vectors] == [float(len(text)) for text in texts]
+    stats = pipeline.stats()
+    assert stats["batches"] == 24 and stats["chunks"] == 96
+    assert server.rejected > 0 and stats["rate_limited"] == server.rejected
+    assert stats["limit"] < 6
+    assert stats["chunks_per_sec"] > 0
@@ -0,0 +1,28 @@
+from backend.embedding_cache import EmbeddingCache, model_name
+
+def test_hits_and_misses_are_counted():
+    cache = EmbeddingCache()
+    assert cache.get_many("m", ["a", "b"]) == [None, None]
+    cache.put_many("m", ["a"], [[0.5, 1.0]])
+    assert cache.get_many("m", ["a", "b"]) == [[0.5, 1.0], None]
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 3)
+
+def test_vectors_are_kept_per_model():
+    cache = EmbeddingCache()
+    cache.put_many("small", ["a"], [[1.0]])
+    assert cache.get_many("large", ["a"]) == [None]
+
+def test_sqlite_tier_survives_restart(tmp_path):
+    db = str(tmp_path / "embeddings.sqlite")
+    first = EmbeddingCache(db)
+    first.put_many("m", ["chunk"], [[0.25, -2.0]])
+    first.close()
+    second = EmbeddingCache(db, maxsize=1)
+    assert second.get_many("m", ["chunk"]) == [[0.25, -2.0]]
+
+def test_model_name_prefers_model_attribute():
+    class Client:
+        model = "text-embedding-004"
+    assert model_name(Client()) == "text-embedding-004"
+    assert model_name(object()) == "object"
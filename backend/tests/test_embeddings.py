@@ -0,0 +1,62 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from backend import embeddings, rag
+from backend.embeddings import HashingEmbeddings
+
+
+def _cosine(a, b):
+    return float(np.dot(a, b))
+
+def test_hashing_vectors_are_normalized_and_deterministic():
+    model = HashingEmbeddings(dim=256)
+    vectors = model.embed_documents(["rotate the deploy key", "rotate the deploy key", ""])
+    assert len(vectors[0]) == 256
+    assert np.isclose(np.linalg.norm(vectors[0]), 1.0)
+    assert vectors[0] == vectors[1]
+    assert not any(vectors[2])
+
+def test_batch_matches_single_embeddings():
+    model = HashingEmbeddings(dim=128)
+    texts = ["vector store", "get_vector_store raised ValueError", "ninety days"]
+    batch = model.embed_documents(texts)
+    for text, vector in zip(texts, batch):
+        assert np.allclose(vector, model.embed_query(text))
+
+def test_related_texts_are_closer_than_unrelated():
+    model = HashingEmbeddings()
+    query = model.embed_query("how often does the deploy key rotate?")
+    related = model.embed_query("The deploy key rotates every ninety days.")
+    unrelated = model.embed_query("Invoices are emailed on the first business day of the month.")
+    assert _cosine(query, related) > _cosine(query, unrelated)
+
+def test_async_paths_match_sync():
+    model = HashingEmbeddings(dim=64)
+    texts = [f"chunk number {i}" for i in range(20)]
+    assert asyncio.run(model.aembed_documents(texts)) == model.embed_documents(texts)
+    assert asyncio.run(model.aembed_query("chunk")) == model.embed_query("chunk")
+
+def test_provider_selection():
+    assert isinstance(embeddings.create_embeddings("hashing"), HashingEmbeddings)
+    with pytest.raises(ValueError, match="Unknown EMBEDDING_PROVIDER"):
+        embeddings.create_embeddings("word2vec")
+    assert embeddings.store_suffix("gemini") == ""
+    assert embeddings.store_suffix("sentence-transformers") == "_sentence_transformers"
+    # The embedding pipeline is the only retry layer; the client must not retry 429s itself
+    assert embeddings.create_embeddings("gemini").max_retries == 0
+
+def test_knowledge_base_with_local_provider(tmp_path):
+    docs = {
+        "keys.txt": "The deploy key rotates every ninety days.",
+        "billing.txt": "Invoices are emailed on the first business day of the month.",
+        "oncall.txt": "The on-call engineer acknowledges pages within five minutes.",
+    }
+    kb = rag.KnowledgeBase(persist_directory=str(tmp_path / "db"), embedding=HashingEmbeddings(), hybrid=False)
+    for name, text in docs.items():
+        (tmp_path / name).write_text(text)
+        kb.ingest(str(tmp_path / name))
+    assert kb.query("when are invoices sent?", k=1) == [docs["billing.txt"]]
+    assert kb.cache.stats()["misses"] == 3
+    kb.close()
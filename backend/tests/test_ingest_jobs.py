@@ -0,0 +1,156 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from backend import rag, server
+from backend.ingest_jobs import CANCELLED, QUEUED, RUNNING, SUCCEEDED, FAILED, IngestJobQueue, QueueFullError
+
+async def _fake_ingest(path, progress, tags=None, collection=None):
+    # Page progress arrives from a loader thread, like backend.rag
+    await asyncio.to_thread(progress, {"pages_parsed": 2})
+    progress({"chunks_total": 3})
+    for done in range(1, 4):
+        await asyncio.sleep(0)
+        progress({"chunks_embedded": done})
+    return 3
+
+async def _blocked_ingest(path, progress, tags=None, collection=None):
+    await asyncio.Event().wait()
+
+def test_job_reports_progress_until_done():
+    async def run():
+        jobs = IngestJobQueue(ingest=_fake_ingest, workers=1)
+        job = jobs.submit("a.pdf", "a.pdf")
+        frames = [frame async for frame in jobs.events(job.id)]
+        await jobs.shutdown()
+        return frames
+
+    frames = asyncio.run(run())
+    assert frames[0]["status"] == QUEUED
+    assert frames[-1]["status"] == SUCCEEDED
+    assert frames[-1]["pages_parsed"] == 2
+    assert frames[-1]["chunks_embedded"] == 3
+    assert [f["chunks_embedded"] for f in frames] == sorted(f["chunks_embedded"] for f in frames)
+
+def test_workers_are_bounded_and_jobs_can_be_cancelled():
+    async def run():
+        jobs = IngestJobQueue(ingest=_blocked_ingest, workers=1)
+        first = jobs.submit("a.txt", "a.txt")
+        second = jobs.submit("b.txt", "b.txt")
+        await asyncio.sleep(0.01)
+        states = (first.status, second.status)
+        assert jobs.cancel(second.id)
+        assert jobs.cancel(first.id)
+        await asyncio.sleep(0.01)
+        final = (first.status, second.status)
+        assert not jobs.cancel(first.id)
+        await jobs.shutdown()
+        return states, final
+
+    states, final = asyncio.run(run())
+    assert states == (RUNNING, QUEUED)
+    assert final == (CANCELLED, CANCELLED)
+
+def test_cancel_collection_stops_its_jobs():
+    async def run():
+        jobs = IngestJobQueue(ingest=_blocked_ingest, workers=1)
+        running = jobs.submit("a.txt", "a.txt", collection="t-a")
+        queued = jobs.submit("b.txt", "b.txt", collection="t-a")
+        other = jobs.submit("c.txt", "c.txt", collection="t-b")
+        await asyncio.sleep(0.01)
+        cancelled = await jobs.cancel_collection("t-a")
+        states = (running.status, queued.status, other.status)
+        await jobs.shutdown()
+        return cancelled, states
+
+    cancelled, states = asyncio.run(run())
+    assert cancelled == 2
+    assert states == (CANCELLED, CANCELLED, QUEUED)
+
+def test_queue_full_and_failures():
+    async def failing(path, progress, tags=None, collection=None):
+        raise ValueError("bad pdf")
+
+    async def run():
+        jobs = IngestJobQueue(ingest=failing, workers=1, max_queued=1)
+        job = jobs.submit("a.pdf", "a.pdf")
+        with pytest.raises(QueueFullError):
+            jobs.submit("b.pdf", "b.pdf")
+        frames = [frame async for frame in jobs.events(job.id)]
+        await jobs.shutdown()
+        return frames[-1]
+
+    final = asyncio.run(run())
+    assert final["status"] == FAILED
+    assert final["error"] == "bad pdf"
+
+def test_shutdown_cancels_queued_jobs():
+    async def run():
+        jobs = IngestJobQueue(ingest=_blocked_ingest, workers=1)
+        running = jobs.submit("a.txt", "a.txt")
+        queued = jobs.submit("b.txt", "b.txt")
+        await asyncio.sleep(0.01)
+        await jobs.shutdown()
+        return running, queued
+
+    running, queued = asyncio.run(run())
+    assert (running.status, queued.status) == (CANCELLED, CANCELLED)
+    assert queued.error == "Server shut down before the job ran" and queued.finished is not None
+
+def test_rejected_upload_leaves_no_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(rag, "_knowledge_bases", rag.KnowledgeBases(root=str(tmp_path / "db"),
+                                                                    upload_root=str(tmp_path / "uploads")))
+    monkeypatch.setattr(server, "WORKSPACE_ROOT", None)
+    monkeypatch.setattr(server, "ingest_jobs", IngestJobQueue(ingest=_blocked_ingest, workers=1, max_queued=1))
+    uploads = tmp_path / "uploads"
+    uploads.mkdir()
+    (uploads / "notes.txt").write_text("ingested earlier")
+
+    async def run():
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            statuses = []
+            for name in ("a.txt", "b.txt", "notes.txt"):
+                response = await client.post("/upload", files={"file": (name, b"new")})
+                statuses.append(response.status_code)
+                await asyncio.sleep(0.01)
+        await server.ingest_jobs.shutdown()
+        return statuses
+
+    # a.txt is running, b.txt fills the queue, notes.txt is turned away
+    assert asyncio.run(run()) == [202, 202, 503]
+    assert sorted(p.name for p in uploads.iterdir()) == ["a.txt", "b.txt", "notes.txt"]
+    assert (uploads / "notes.txt").read_text() == "ingested earlier"
+
+def test_upload_endpoints(tmp_path, monkeypatch):
+    monkeypatch.setattr(rag, "_knowledge_bases", rag.KnowledgeBases(root=str(tmp_path / "db"),
+                                                                    upload_root=str(tmp_path / "uploads")))
+    monkeypatch.setattr(server, "WORKSPACE_ROOT", None)
+    monkeypatch.setattr(server, "ingest_jobs", IngestJobQueue(ingest=_fake_ingest, workers=1))
+
+    async def run():
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.post("/upload", files={"file": ("notes.txt", b"hello")})
+            assert response.status_code == 202
+            job_id = response.json()["job_id"]
+            events = await client.get(f"/upload/jobs/{job_id}/events")
+            sse = await client.get(f"/upload/jobs/{job_id}/events", params={"format": "sse"})
+            status = await client.get(f"/upload/jobs/{job_id}")
+            cancel = await client.delete(f"/upload/jobs/{job_id}")
+            missing = await client.get("/upload/jobs/nope")
+        await server.ingest_jobs.shutdown()
+        return events, sse, status, cancel, missing
+
+    events, sse, status, cancel, missing = asyncio.run(run())
+    frames = [json.loads(line) for line in events.text.splitlines()]
+    assert frames[-1]["status"] == SUCCEEDED
+    assert frames[-1]["collection"] == rag.DEFAULT_COLLECTION
+    assert sse.headers["content-type"].startswith("text/event-stream")
+    assert sse.text.startswith("event: progress\ndata: ")
+    assert status.json()["chunks_embedded"] == 3
+    assert cancel.status_code == 409
+    assert missing.status_code == 404
+    assert (tmp_path / "uploads" / "notes.txt").read_bytes() == b"hello"
@@ -0,0 +1,53 @@
+import pytest
+from unittest.mock import patch
+from backend.llm_registry import LLMRegistry
+from backend.tools import TOOLS
+
+def test_registry_reuses_client():
+    registry = LLMRegistry(TOOLS)
+    first = registry.get("gemini-2.5-flash", 0.7)
+    second = registry.get("gemini-2.5-flash", 0.7)
+    assert first is second
+    stats = registry.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+
+def test_registry_keys_on_settings():
+    registry = LLMRegistry(TOOLS)
+    a = registry.get("gemini-2.5-flash", 0.7)
+    b = registry.get("gemini-2.5-flash", 0.2)
+    c = registry.get("gemini-2.5-flash", 0.7, json_mode=True)
+    assert a is not b
+    assert a is not c
+    assert registry.stats()["misses"] == 3
+    assert c.kwargs["response_format"] == {"type": "json_object"}
+    assert "response_format" not in a.kwargs
+
+def test_registry_evicts_least_recently_used():
+    registry = LLMRegistry(TOOLS, maxsize=2)
+    with patch.object(LLMRegistry, "_build", side_effect=lambda *args: object()):
+        first = registry.get("a", 0)
+        registry.get("b", 0)
+        registry.get("a", 0)  # refresh "a"
+        registry.get("c", 0)  # evicts "b"
+        assert registry.get("a", 0) is first
+        registry.get("b", 0)
+    stats = registry.stats()
+    assert stats["size"] == 2
+    assert stats["evictions"] == 2
+
+def test_registry_shares_http_pool():
+    registry = LLMRegistry(TOOLS)
+    a = registry.get("model-a", 0)
+    b = registry.get("model-b", 0)
+    assert a.bound.http_async_client is b.bound.http_async_client
+
+def test_registry_binds_tool_subsets():
+    registry = LLMRegistry(TOOLS)
+    full = registry.get("gemini-2.5-flash", 0.7)
+    subset = registry.get("gemini-2.5-flash", 0.7, tool_names=["write_file", "read_file"])
+    assert len(full.kwargs["tools"]) == len(TOOLS)
+    assert [t["function"]["name"] for t in subset.kwargs["tools"]] == ["read_file", "write_file"]
+    # Same subset in a different order hits the cache; the unbound client is shared
+    assert registry.get("gemini-2.5-flash", 0.7, tool_names=["read_file", "write_file"]) is subset
+    assert subset.bound is full.bound
@@ -0,0 +1,80 @@
+import pytest
+from backend.memo import MemoCache, memoize
+
+def _counting_tool(cache, file_args=()):
+    calls = []
+
+    @memoize(file_args=file_args, cache=cache)
+    def read_upper(path: str, suffix: str = ""):
+        """Read a file and upper-case it."""
+        calls.append(path)
+        with open(path) as f:
+            return f.read().upper() + suffix
+
+    return read_upper, calls
+
+def test_pure_call_is_cached():
+    cache = MemoCache(maxsize=8)
+    calls = []
+
+    @memoize(cache=cache)
+    def square(x: int):
+        calls.append(x)
+        return x * x
+
+    assert square(3) == 9
+    assert square(x=3) == 9
+    assert calls == [3]
+    assert cache.stats()["tools"]["square"]["hits"] == 1
+
+def test_file_edit_invalidates_entry(tmp_path):
+    cache = MemoCache(maxsize=8)
+    tool, calls = _counting_tool(cache, file_args=("path",))
+    f = tmp_path / "a.txt"
+    f.write_text("hello")
+    assert tool(str(f)) == "HELLO"
+    assert tool(str(f)) == "HELLO"
+    f.write_text("changed!")
+    assert tool(str(f)) == "CHANGED!"
+    assert len(calls) == 2
+
+def test_lru_size_cap():
+    cache = MemoCache(maxsize=2)
+
+    @memoize(cache=cache)
+    def ident(x: int):
+        return x
+
+    for i in range(5):
+        ident(i)
+    assert cache.stats()["size"] == 2
+
+def test_errors_are_not_cached():
+    cache = MemoCache(maxsize=8)
+    calls = []
+
+    @memoize(cache=cache)
+    def flaky(x: int):
+        calls.append(x)
+        return "Error: try again"
+
+    flaky(1)
+    flaky(1)
+    assert calls == [1, 1]
+
+def test_sqlite_tier_survives_restart(tmp_path):
+    db = str(tmp_path / "memo.sqlite")
+    calls = []
+
+    def make(cache):
+        @memoize(cache=cache)
+        def double(x: int):
+            calls.append(x)
+            return x * 2
+        return double
+
+    assert make(MemoCache(db_path=db))(4) == 8
+    fresh = MemoCache(db_path=db)
+    assert make(fresh)(4) == 8
+    assert calls == [4]
+    assert fresh.stats()["tools"]["double"]["disk_hits"] == 1
@@ -0,0 +1,108 @@
+import numpy as np
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from backend import rag
+from backend.numpy_store import NumpyCollection, NumpyVectorStore, quantize
+
+
+def _vectors(n, dim=32, seed=0):
+    return np.random.default_rng(seed).standard_normal((n, dim)).astype(np.float32)
+
+def _exact_top(vectors, query, k):
+    return np.argsort(((vectors - query) ** 2).sum(axis=1), kind="stable")[:k].tolist()
+
+def test_quantization_error_is_small():
+    vectors = _vectors(100)
+    quantized, scales = quantize(vectors)
+    assert quantized.dtype == np.int8
+    assert np.abs(quantized * scales[:, None] - vectors).max() <= scales.max() / 2 + 1e-6
+
+def test_upsert_get_update_delete_and_reopen(tmp_path):
+    collection = NumpyCollection(str(tmp_path / "c"))
+    vectors = _vectors(3)
+    collection.upsert(ids=["a", "b", "c"], embeddings=vectors, documents=["A", "B", "C"],
+                      metadatas=[{"n": 1}, {"n": 2}, {"n": 3}])
+    collection.update(ids=["b", "missing"], metadatas=[{"n": 20}, {"n": 0}])
+    collection.delete(ids=["a"])
+    collection.close()
+
+    reopened = NumpyCollection(str(tmp_path / "c"))
+    assert reopened.count() == 2
+    found = reopened.get(ids=["c", "b"], include=["documents", "metadatas", "embeddings"])
+    assert found["ids"] == ["b", "c"]
+    assert found["metadatas"] == [{"n": 20}, {"n": 3}]
+    assert np.allclose(found["embeddings"], vectors[1:])
+    # The freed row is reused rather than growing the files
+    reopened.upsert(ids=["d"], embeddings=vectors[:1], documents=["D"], metadatas=[{}])
+    assert reopened._size == 3
+    with pytest.raises(ValueError, match="dimension"):
+        reopened.upsert(ids=["e"], embeddings=_vectors(1, dim=8))
+
+def test_query_matches_exact_search(tmp_path):
+    vectors = _vectors(3000, dim=48)
+    ids = [f"v{i}" for i in range(len(vectors))]
+    collection = NumpyCollection(str(tmp_path / "c"), block_rows=512)
+    for start in range(0, len(vectors), 700):  # grows the files several times
+        part = slice(start, start + 700)
+        collection.upsert(ids=ids[part], embeddings=vectors[part], documents=ids[part],
+                          metadatas=[{"i": i} for i in range(start, min(start + 700, len(vectors)))])
+    queries = _vectors(20, dim=48, seed=1)
+    for query in queries:
+        result = collection.query(query_embeddings=[query.tolist()], n_results=10)
+        assert result["ids"][0] == [ids[i] for i in _exact_top(vectors, query, 10)]
+        assert result["documents"][0] == result["ids"][0]
+        assert result["distances"][0] == sorted(result["distances"][0])
+    # Without re-scoring the int8 scan alone still finds nearly all true neighbours
+    collection.rescore = 0
+    recall = np.mean([
+        len(set(collection.query(query_embeddings=[q.tolist()], n_results=10)["ids"][0])
+            & {ids[i] for i in _exact_top(vectors, q, 10)}) / 10
+        for q in queries
+    ])
+    assert recall >= 0.9
+
+def test_where_filters(tmp_path):
+    collection = NumpyCollection(str(tmp_path / "c"))
+    vectors = _vectors(6)
+    collection.upsert(
+        ids=[f"p{i}" for i in range(6)], embeddings=vectors, documents=[f"page {i}" for i in range(6)],
+        metadatas=[{"filename": "a.pdf" if i < 3 else "b.pdf", "page": i, "uploaded_at": 100.0 + i} for i in range(6)],
+    )
+    where = rag.build_filter(sources=["b.pdf"], page_to=5, uploaded_after=103)
+    assert collection.get(where=where, include=[])["ids"] == ["p3", "p4"]
+    hits = collection.query(query_embeddings=[vectors[0].tolist()], n_results=4, where=where)["ids"][0]
+    assert sorted(hits) == ["p3", "p4"]
+    assert collection.get(where={"$or": [{"page": 0}, {"filename": {"$nin": ["a.pdf"]}}]}, limit=2, offset=1)["ids"] \
+        == ["p3", "p4"]
+    assert collection.query(query_embeddings=[vectors[0].tolist()], n_results=4, where={"page": 99})["ids"] == [[]]
+
+def test_vector_store_interface(tmp_path):
+    store = NumpyVectorStore.from_texts(
+        ["the deploy key rotates", "invoices go out monthly"], DeterministicFakeEmbedding(size=16),
+        metadatas=[{"topic": "keys"}, {"topic": "billing"}], persist_directory=str(tmp_path),
+    )
+    [doc] = store.similarity_search("invoices go out monthly", k=1)
+    assert (doc.page_content, doc.metadata) == ("invoices go out monthly", {"topic": "billing"})
+    assert [d.page_content for d in store.similarity_search("anything", k=4, filter={"topic": "keys"})] == \
+        ["the deploy key rotates"]
+    store.delete_collection()
+    assert not (tmp_path / "langchain").exists()
+
+def test_knowledge_base_on_numpy_store(tmp_path):
+    kb = rag.KnowledgeBase(persist_directory=str(tmp_path / "db"), embedding=DeterministicFakeEmbedding(size=32),
+                           backend="numpy")
+    for name, text in [("keys.txt", "The deploy_key rotates every ninety days."),
+                       ("billing.txt", "Invoices are emailed on the first business day.")]:
+        (tmp_path / name).write_text(text)
+        assert kb.ingest(str(tmp_path / name)) == 1
+    assert kb.query("Invoices are emailed on the first business day.", k=1) == \
+        ["Invoices are emailed on the first business day."]
+    assert [hit.metadata["filename"] for hit in kb.search("deploy_key")] == ["keys.txt"]
+    assert kb.search("ninety", k=4, where=rag.build_filter(sources=["billing.txt"]))[0].metadata["filename"] == \
+        "billing.txt"
+    kb.clear()
+    assert kb.query("anything") == []
+    kb.close()
+    with pytest.raises(ValueError, match="Unknown VECTOR_STORE"):
+        rag.KnowledgeBase(persist_directory=str(tmp_path / "x"), backend="faiss")
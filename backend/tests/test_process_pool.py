@@ -0,0 +1,110 @@
+import os
+import threading
+import time
+import pytest
+from backend.process_pool import ProcessPool, cpu_bound
+
+def worker_pid():
+    return os.getpid()
+
+def spin(seconds: float):
+    end = time.time() + seconds
+    while time.time() < end:
+        pass
+    return "done"
+
+def fail():
+    raise ValueError("bad input")
+
+def load_model():
+    # Warm-up hook slower than the pool's call timeout, like building a transformers pipeline
+    time.sleep(0.6)
+    with open(os.environ["TEST_POOL_LOADS"], "a") as f:
+        f.write(f"{os.getpid()}\n")
+
+@pytest.fixture
+def pool():
+    p = ProcessPool(size=1, timeout=5)
+    yield p
+    p.shutdown()
+
+def test_runs_in_worker_process(pool):
+    assert pool.run(worker_pid) != os.getpid()
+    assert pool.run(spin, (0.01,)) == "done"
+
+def test_timeout_kills_and_replaces_worker(pool):
+    first_pid = pool.run(worker_pid)
+    with pytest.raises(TimeoutError):
+        pool.run(spin, (10,), timeout=0.5)
+    assert pool.run(worker_pid) != first_pid
+    stats = pool.stats()
+    assert stats["timeouts"] == 1
+    assert stats["workers"] == 1
+
+def test_preload_does_not_count_against_the_timeout(tmp_path, monkeypatch):
+    loads = tmp_path / "loads"
+    monkeypatch.setenv("TEST_POOL_LOADS", str(loads))
+    pool = ProcessPool(size=1, timeout=0.4)
+    pool.preload.add(f"{__name__}:load_model")
+    try:
+        assert pool.run(spin, (0,)) == "done"
+        with pytest.raises(TimeoutError):
+            pool.run(spin, (10,))
+        # The replacement worker loads the model once, before its first call is timed
+        pids = {pool.run(worker_pid) for _ in range(3)}
+        assert pool.stats()["timeouts"] == 1
+    finally:
+        pool.shutdown()
+    first, replacement = loads.read_text().split()
+    assert pids == {int(replacement)}
+
+def test_errors_are_raised(pool):
+    with pytest.raises(RuntimeError, match="bad input"):
+        pool.run(fail)
+    assert pool.run(spin, (0,)) == "done"
+
+def test_queue_depth_is_tracked(pool):
+    pool.start()
+    threads = [threading.Thread(target=pool.run, args=(spin, (0.3,))) for _ in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert pool.stats()["max_queue_depth"] >= 1
+    assert pool.stats()["queue_depth"] == 0
+
+def test_shutdown_wakes_waiting_callers(pool):
+    pool.start()
+    busy = threading.Thread(target=pool.run, args=(spin, (1,)))
+    busy.start()
+    time.sleep(0.1)
+    errors = []
+
+    def wait_for_worker():
+        try:
+            pool.run(worker_pid)
+        except RuntimeError as e:
+            errors.append(e)
+
+    waiters = [threading.Thread(target=wait_for_worker) for _ in range(2)]
+    for t in waiters:
+        t.start()
+    time.sleep(0.1)
+    started = time.monotonic()
+    pool.shutdown()
+    for t in waiters:
+        t.join(timeout=5)
+    busy.join()
+    assert [str(e) for e in errors] == ["CPU pool was shut down"] * 2
+    assert time.monotonic() - started < 5
+    assert pool.stats()["workers"] == 0
+    # A restarted pool gets fresh workers, not the stopped ones
+    assert pool.run(spin, (0,)) == "done"
+
+def test_cpu_bound_returns_error_string_on_timeout(pool):
+    slow = cpu_bound(timeout=0.5, pool=pool)(spin)
+    assert "timed out" in slow(10)
+
+def test_disabled_pool_runs_inline():
+    inline = cpu_bound(pool=ProcessPool(size=0))(worker_pid)
+    assert inline() == os.getpid()
@@ -0,0 +1,445 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from backend import rag
+from backend.core_tools import asearch_knowledge_base
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture
+def kb(tmp_path):
+    return rag.KnowledgeBase(persist_directory=str(tmp_path / "db"), embedding=DeterministicFakeEmbedding(size=32))
+
+@pytest.fixture
+def notes(tmp_path):
+    path = tmp_path / "notes.txt"
+    path.write_text("The deploy key rotates every ninety days.")
+    return str(path)
+
+def test_store_is_opened_lazily_and_reused(kb):
+    assert not kb.is_open
+    store = kb.store
+    assert kb.is_open
+    assert kb.store is store
+
+def test_sync_ingest_and_query(kb, notes):
+    assert kb.ingest(notes) == 1
+    assert kb.query("The deploy key rotates every ninety days.", k=1) == ["The deploy key rotates every ninety days."]
+
+def test_async_ingest_and_query(kb, notes):
+    async def run():
+        assert await kb.aingest(notes) == 1
+        return await kb.aquery("The deploy key rotates every ninety days.", k=1)
+
+    assert asyncio.run(run()) == ["The deploy key rotates every ninety days."]
+
+def test_clear_empties_collection(kb, notes):
+    kb.ingest(notes)
+    kb.clear()
+    assert kb.query("anything", k=4) == []
+
+def test_search_tool_uses_shared_store(tmp_path, notes, monkeypatch):
+    kbs = rag.KnowledgeBases(root=str(tmp_path / "db"), embedding=DeterministicFakeEmbedding(size=32))
+    monkeypatch.setattr(rag, "_knowledge_bases", kbs)
+    rag.ingest_file(notes)
+    assert rag.get_vector_store() is kbs.get().store
+    assert "ninety days" in asyncio.run(asearch_knowledge_base("The deploy key rotates every ninety days."))
+
+def test_import_does_not_open_chroma():
+    code = "import json, sys\nimport backend.rag\nprint(json.dumps('chromadb' in sys.modules))\n"
+    env = {**os.environ, "GEMINI_API_KEY": os.environ.get("GEMINI_API_KEY", "test-key")}
+    out = subprocess.run([sys.executable, "-c", code], cwd=REPO_ROOT, env=env, capture_output=True, text=True, check=True)
+    assert json.loads(out.stdout.strip().splitlines()[-1]) is False
+
+class _StallingEmbedding(DeterministicFakeEmbedding):
+    """Embeds the first batch, then hangs."""
+    calls: int = 0
+
+    async def aembed_documents(self, texts):
+        self.calls += 1
+        if self.calls > 1:
+            await asyncio.Event().wait()
+        return self.embed_documents(texts)
+
+def test_cancelled_ingest_removes_written_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr(rag, "INGEST_EMBED_BATCH", 1)
+    kb = rag.KnowledgeBase(persist_directory=str(tmp_path / "db"), embedding=_StallingEmbedding(size=32))
+    path = tmp_path / "long.txt"
+    path.write_text("\n\n".join(f"paragraph {i} " + "words " * 180 for i in range(3)))
+    progress = []
+
+    async def run():
+        task = asyncio.create_task(kb.aingest(str(path), progress=progress.append))
+        while not any(p.get("chunks_embedded") for p in progress):
+            await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(run())
+    assert kb.store._collection.count() == 0
+
+class _CountingEmbedding(DeterministicFakeEmbedding):
+    embedded: int = 0
+
+    def embed_documents(self, texts):
+        self.embedded += len(texts)
+        return super().embed_documents(texts)
+
+def test_reingest_is_idempotent_and_embeds_only_new_chunks(tmp_path):
+    embedding = _CountingEmbedding(size=32)
+    kb = rag.KnowledgeBase(persist_directory=str(tmp_path / "db"), embedding=embedding)
+    path = tmp_path / "doc.txt"
+    paragraphs = [f"paragraph {i} " + "words " * 180 for i in range(3)]
+    path.write_text("\n\n".join(paragraphs))
+    chunks = kb.ingest(str(path))
+    again = kb.ingest_source(str(path))
+    assert (again.chunks, again.reused, again.embedded) == (chunks, chunks, 0)
+    assert kb.store._collection.count() == chunks
+
+    # Editing one paragraph embeds only that chunk and drops the stale one
+    paragraphs[1] = "rewritten paragraph " + "other " * 150
+    path.write_text("\n\n".join(paragraphs))
+    edited = kb.ingest_source(str(path))
+    assert (edited.embedded, edited.removed) == (1, 1)
+    assert kb.store._collection.count() == chunks
+    assert embedding.embedded == chunks + 1
+
+def test_removed_source_is_restored_from_cache(tmp_path, notes):
+    embedding = _CountingEmbedding(size=32)
+    kb = rag.KnowledgeBase(persist_directory=str(tmp_path / "db"), embedding=embedding)
+    kb.ingest(notes)
+    assert kb.remove_source(notes) == 1
+    assert kb.manifest.get(notes) is None
+    result = kb.ingest_source(notes)
+    assert (result.cache_hits, result.embedded, embedding.embedded) == (1, 0, 1)
+
+def test_reindex_diffs_manifest_against_directory(tmp_path):
+    embedding = _CountingEmbedding(size=32)
+    kb = rag.KnowledgeBase(persist_directory=str(tmp_path / "db"), embedding=embedding)
+    uploads = tmp_path / "uploads"
+    uploads.mkdir()
+    (uploads / "a.txt").write_text("alpha document")
+    (uploads / "b.txt").write_text("beta document")
+
+    first = kb.reindex(str(uploads))
+    assert first["added"] == ["a.txt", "b.txt"] and first["chunks_embedded"] == 2
+    assert kb.reindex(str(uploads))["unchanged"] == 2
+
+    os.utime(uploads / "a.txt", ns=(1, 1))  # touched, same content
+    (uploads / "b.txt").write_text("beta document, revised")
+    (uploads / "c.txt").write_text("gamma document")
+    plan = kb.reindex(str(uploads), dry_run=True)
+    assert (plan["added"], plan["updated"], plan["unchanged"]) == (["c.txt"], ["b.txt"], 1)
+
+    (uploads / "a.txt").unlink()
+    report = kb.reindex(str(uploads))
+    assert (report["added"], report["updated"], report["removed"]) == (["c.txt"], ["b.txt"], ["a.txt"])
+    assert report["chunks_embedded"] == 2 and report["chunks_removed"] == 2
+    assert kb.store._collection.count() == 2
+    assert kb.manifest.sources() == [str(uploads / "b.txt"), str(uploads / "c.txt")]
+
+class _QueryCountingEmbedding(DeterministicFakeEmbedding):
+    queries: int = 0
+
+    def embed_query(self, text):
+        self.queries += 1
+        return super().embed_query(text)
+
+def _code_notes(kb, tmp_path):
+    path = tmp_path / "code.txt"
+    path.write_text("\n\n".join([
+        "Configuration is read once at startup from the environment. " + "filler " * 150,
+        "If get_vector_store raises E1102 the collection is corrupt. " + "padding " * 150,
+        "Uploads are queued and indexed in the background by workers. " + "spacer " * 150,
+    ]))
+    kb.ingest(str(path))
+
+def test_identifier_query_skips_embedding(tmp_path):
+    embedding = _QueryCountingEmbedding(size=32)
+    kb = rag.KnowledgeBase(persist_directory=str(tmp_path / "db"), embedding=embedding)
+    _code_notes(kb, tmp_path)
+    results = kb.query("E1102", k=1)
+    assert "get_vector_store raises E1102" in results[0]
+    assert embedding.queries == 0
+    assert kb.stats()["queries"]["lexical_only"] == 1
+
+    # No lexical match falls back to the full hybrid search
+    kb.query("NoSuchSymbol", k=1)
+    assert embedding.queries == 1
+
+def test_hybrid_search_finds_exact_terms(tmp_path):
+    kb = rag.KnowledgeBase(persist_directory=str(tmp_path / "db"), embedding=DeterministicFakeEmbedding(size=32))
+    kb.query_cache = rag.QueryCache(maxsize=0, vectors_maxsize=0)  # run both paths for real
+    _code_notes(kb, tmp_path)
+    assert "queued and indexed" in kb.query("when are uploads indexed?", k=1)[0]
+    assert "queued and indexed" in asyncio.run(kb.aquery("when are uploads indexed?", k=1))[0]
+    assert kb.stats()["queries"]["hybrid"] == 2
+
+def test_lexical_index_is_backfilled_for_existing_collections(tmp_path):
+    kb = rag.KnowledgeBase(persist_directory=str(tmp_path / "db"), embedding=DeterministicFakeEmbedding(size=32))
+    _code_notes(kb, tmp_path)
+    kb.lexical.clear()
+    kb._lexical_checked = False
+    assert "E1102" in kb.query("get_vector_store", k=1)[0]
+    assert kb.lexical.count() == kb.store._collection.count()
+
+def test_repeated_queries_are_served_from_cache(tmp_path):
+    embedding = _QueryCountingEmbedding(size=32)
+    kb = rag.KnowledgeBase(persist_directory=str(tmp_path / "db"), embedding=embedding)
+    _code_notes(kb, tmp_path)
+    first = kb.search("when are uploads indexed?", k=2)
+    assert kb.search("  When are uploads   indexed? ", k=2) == first
+    assert asyncio.run(kb.asearch("when are uploads indexed?", k=2)) == first
+    assert embedding.queries == 1
+    assert kb.stats()["queries"]["hybrid"] == 1
+    assert kb.stats()["query_cache"]["results"]["hits"] == 2
+
+def test_ingestion_invalidates_cached_results(tmp_path):
+    embedding = _QueryCountingEmbedding(size=32)
+    kb = rag.KnowledgeBase(persist_directory=str(tmp_path / "db"), embedding=embedding)
+    _code_notes(kb, tmp_path)
+    version = kb.query_cache.version
+    assert "rotates" not in kb.query("deploy key rotation", k=1)[0]
+
+    notes = tmp_path / "keys.txt"
+    notes.write_text("The deploy key rotation happens every ninety days.")
+    kb.ingest(str(notes))
+    assert kb.query_cache.version > version
+    assert "ninety days" in kb.query("deploy key rotation", k=1)[0]
+    # The query embedding does not depend on the collection and is reused
+    assert embedding.queries == 1
+
+def test_results_computed_before_a_write_are_not_cached():
+    cache = rag.QueryCache()
+    version, ids = cache.results("q", 4)
+    assert ids is None
+    cache.bump()
+    cache.store_results(version, "q", 4, ["stale"])
+    assert cache.results("q", 4)[1] is None
+
+def test_build_filter_shapes(tmp_path):
+    assert rag.build_filter() is None
+    assert rag.build_filter(sources=["notes.txt"]) == {"filename": {"$in": ["notes.txt"]}}
+    where = rag.build_filter(sources=["notes.txt", str(tmp_path / "a.pdf")], page_from=2, page_to=3)
+    assert where == {"$and": [
+        {"$or": [{"source": {"$in": [str(tmp_path / "a.pdf")]}}, {"filename": {"$in": ["notes.txt"]}}]},
+        {"page": {"$gte": 1}},
+        {"page": {"$lte": 2}},
+    ]}
+    assert rag.build_filter(uploaded_after=1700000000) == {"uploaded_at": {"$gte": 1700000000.0}}
+    with pytest.raises(ValueError, match="Invalid time"):
+        rag.build_filter(uploaded_before="last tuesday")
+
+def _tagged_kb(tmp_path):
+    kb = rag.KnowledgeBase(persist_directory=str(tmp_path / "db"), embedding=DeterministicFakeEmbedding(size=32))
+    for workspace, name in [("alpha", "keys.txt"), ("beta", "rotation.txt")]:
+        path = tmp_path / name
+        path.write_text(f"The {workspace} deploy_key rotates every ninety days.")
+        kb.ingest(str(path), tags={"workspace": str(tmp_path / workspace)})
+    return kb
+
+def test_filtered_search_is_scoped_to_matching_chunks(tmp_path):
+    kb = _tagged_kb(tmp_path)
+    for query in ["how often does the deploy key rotate?", "deploy_key"]:  # full and lexical-only paths
+        hits = kb.search(query, k=4, where=rag.build_filter(workspace=str(tmp_path / "beta")))
+        assert [hit.metadata["filename"] for hit in hits] == ["rotation.txt"]
+        hits = kb.search(query, k=4, where=rag.build_filter(sources=["keys.txt"]))
+        assert [hit.metadata["workspace"] for hit in hits] == [str(tmp_path / "alpha")]
+    assert kb.search("deploy key", where=rag.build_filter(uploaded_before="2000-01-01")) == []
+    assert len(kb.search("deploy key", k=4)) == 2
+
+def test_reindex_keeps_tags_from_the_manifest(tmp_path):
+    kb = _tagged_kb(tmp_path)
+    (tmp_path / "keys.txt").write_text("The alpha deploy_key now rotates every thirty days.")
+    kb.ingest(str(tmp_path / "keys.txt"))
+    hits = kb.search("deploy_key", k=4, where=rag.build_filter(workspace=str(tmp_path / "alpha")))
+    assert [hit.text for hit in hits] == ["The alpha deploy_key now rotates every thirty days."]
+
+def test_search_tool_filters_and_cites_sources(tmp_path, monkeypatch):
+    _tagged_kb(tmp_path).close()
+    monkeypatch.setattr(rag, "_knowledge_bases", rag.KnowledgeBases(root=str(tmp_path / "db"),
+                                                                    embedding=DeterministicFakeEmbedding(size=32)))
+    result = asyncio.run(asearch_knowledge_base("deploy_key", source="rotation.txt"))
+    assert result == "[rotation.txt]\nThe beta deploy_key rotates every ninety days."
+    assert asyncio.run(asearch_knowledge_base("deploy_key", uploaded_after="soon")).startswith("Error")
+
+def test_collection_names(tmp_path):
+    assert rag.collection_name() == rag.DEFAULT_COLLECTION
+    assert rag.collection_name(tenant="acme") == "t-acme"
+    assert rag.collection_name(tenant="Acme Corp").startswith("t-acme-corp-")
+    a, b = rag.collection_name(workspace=str(tmp_path / "a" / "api")), rag.collection_name(workspace=str(tmp_path / "b" / "api"))
+    assert a.startswith("w-api-") and b.startswith("w-api-") and a != b
+    assert rag.collection_name("acme", str(tmp_path / "a" / "api")) == "t-acme__" + a
+    with pytest.raises(ValueError, match="Invalid collection"):
+        rag.KnowledgeBases.validate("../etc")
+
+def _registry(tmp_path, **options):
+    return rag.KnowledgeBases(root=str(tmp_path / "db"), upload_root=str(tmp_path / "uploads"),
+                              embedding=DeterministicFakeEmbedding(size=32), **options)
+
+def test_collections_are_isolated_and_handles_evicted(tmp_path):
+    kbs = _registry(tmp_path, max_open=2)
+    for name in ["t-a", "t-b", "t-c"]:
+        path = tmp_path / f"{name}.txt"
+        path.write_text(f"Notes for tenant {name}.")
+        kbs.get(name, info={"tenant": name}).ingest(str(path))
+    assert kbs.stats()["open"] == ["t-b", "t-c"]
+    assert kbs.evictions == 1
+    # Closing releases Chroma's shared per-directory system as well
+    from chromadb.api.shared_system_client import SharedSystemClient
+    assert kbs.path("t-a") not in SharedSystemClient._identifier_to_system
+    assert kbs.path("t-c") in SharedSystemClient._identifier_to_system
+    # An evicted collection reopens from disk and only sees its own documents
+    assert kbs.get("t-a").query("Notes for tenant t-a.", k=4) == ["Notes for tenant t-a."]
+    assert kbs.get("missing", create=False) is None
+    listed = {c["name"]: c for c in kbs.list()}
+    assert set(listed) == {rag.DEFAULT_COLLECTION, "t-a", "t-b", "t-c"}
+    assert (listed["t-b"]["tenant"], listed["t-b"]["sources"], listed["t-b"]["chunks"]) == ("t-b", 1, 1)
+    assert listed["t-b"]["size_bytes"] > 0
+
+def test_leased_collections_are_not_evicted(tmp_path, monkeypatch):
+    kbs = _registry(tmp_path, max_open=1)
+    monkeypatch.setattr(rag, "_knowledge_bases", kbs)
+    (tmp_path / "a.txt").write_text("Notes for tenant t-a.")
+    with kbs.lease("t-a") as held:
+        held.ingest(str(tmp_path / "a.txt"))
+        version = held.query_cache.version
+        kbs.get("t-b")
+        assert kbs.stats()["open"] == ["t-a", "t-b"] and kbs.evictions == 0
+        # Writes elsewhere go through the same handle, so its caches stay coherent
+        (tmp_path / "a2.txt").write_text("More notes for tenant t-a.")
+        assert rag.ingest_file(str(tmp_path / "a2.txt"), collection="t-a") == 1
+        assert held.query_cache.version > version
+        assert kbs.get("t-a") is held
+    assert kbs.stats()["open"] == ["t-a"] and kbs.evictions == 1
+    assert rag.query_knowledge_base("More notes for tenant t-a.", k=1, collection="t-a") == \
+        ["More notes for tenant t-a."]
+    assert rag.query_knowledge_base("anything", collection="t-missing") == []
+    assert not kbs.exists("t-missing")
+
+def test_collection_limit_and_delete(tmp_path):
+    kbs = _registry(tmp_path, max_collections=2)
+    kbs.get("t-a")
+    with pytest.raises(rag.CollectionLimitError):
+        kbs.get("t-b")
+    kbs.select("t-a")
+    (tmp_path / "uploads" / "collections" / "t-a").mkdir(parents=True)
+    assert kbs.delete("t-a")
+    assert not (tmp_path / "db" / "collections" / "t-a").exists()
+    assert not (tmp_path / "uploads" / "collections" / "t-a").exists()
+    assert kbs.active == rag.DEFAULT_COLLECTION
+    assert not kbs.delete("t-a")
+    kbs.get("t-b")
+
+def test_workspace_searches_still_cover_the_default_collection(tmp_path, monkeypatch):
+    kbs = _registry(tmp_path)
+    monkeypatch.setattr(rag, "_knowledge_bases", kbs)
+    (tmp_path / "old.txt").write_text("Invoices are emailed on the first business day.")
+    (tmp_path / "new.txt").write_text("The deploy key rotates every ninety days.")
+    rag.ingest_file(str(tmp_path / "old.txt"))
+    rag.select_workspace(str(tmp_path / "api"))
+    rag.ingest_file(str(tmp_path / "new.txt"))
+
+    assert rag.search_collections() == [kbs.active, rag.DEFAULT_COLLECTION]
+    found = {hit.metadata["filename"] for hit in rag.search_knowledge_base("business day", k=4)}
+    assert found == {"old.txt", "new.txt"}
+    found = {hit.metadata["filename"] for hit in asyncio.run(rag.asearch_knowledge_base("business day", k=4))}
+    assert found == {"old.txt", "new.txt"}
+    # A named collection is searched on its own
+    assert [hit.metadata["filename"] for hit in rag.search_knowledge_base("business day", collection=kbs.active)] \
+        == ["new.txt"]
+
+def test_deleted_collection_can_be_recreated(tmp_path):
+    kbs = _registry(tmp_path)
+    (tmp_path / "a.txt").write_text("The deploy key rotates every ninety days.")
+    kbs.get("w-x").ingest(str(tmp_path / "a.txt"))
+    assert kbs.delete("w-x")
+    kb = kbs.get("w-x")
+    assert kb.query("anything") == []
+    assert kb.ingest(str(tmp_path / "a.txt")) == 1
+    assert kb.query("The deploy key rotates every ninety days.", k=1) == ["The deploy key rotates every ninety days."]
+
+def test_reindex_does_not_create_unknown_collections(tmp_path, monkeypatch):
+    kbs = _registry(tmp_path)
+    monkeypatch.setattr(rag, "_knowledge_bases", kbs)
+    with pytest.raises(rag.UnknownCollectionError, match="w-typo"):
+        rag.reindex_knowledge_base(collection="w-typo")
+    assert not kbs.exists("w-typo") and kbs.names() == [rag.DEFAULT_COLLECTION]
+    assert not rag.reindex_knowledge_base(collection=rag.DEFAULT_COLLECTION)["failed"]
+
+def test_delete_waits_for_leases_and_refuses_new_ones(tmp_path):
+    import threading
+    kbs = _registry(tmp_path)
+    with kbs.lease("t-a"):
+        with pytest.raises(rag.CollectionBusyError, match="still in use"):
+            kbs.delete("t-a", timeout=0.05)
+    assert kbs.exists("t-a")
+
+    held = kbs.acquire("t-a")
+    deleting = threading.Thread(target=kbs.delete, args=("t-a",))
+    deleting.start()
+    while "t-a" not in kbs._deleting:
+        pass
+    with pytest.raises(rag.CollectionBusyError, match="being deleted"):
+        kbs.acquire("t-a")
+    kbs.release(held)
+    deleting.join(timeout=5)
+    assert not kbs.exists("t-a") and kbs.stats()["open"] == []
+
+class _BatchCountingEmbedding(DeterministicFakeEmbedding):
+    requests: list = []
+
+    def embed_documents(self, texts):
+        self.requests.append(list(texts))
+        return super().embed_documents(texts)
+
+    def embed_query(self, text):
+        self.requests.append([text])
+        return super().embed_query(text)
+
+    def embed_queries(self, texts):
+        # A provider with a batched query path: one request for many queries
+        self.requests.append(list(texts))
+        return [super(_BatchCountingEmbedding, self).embed_query(text) for text in texts]
+
+class _AsymmetricEmbedding(DeterministicFakeEmbedding):
+    def embed_documents(self, texts):
+        return super().embed_documents(["passage: " + text for text in texts])
+
+def test_batched_queries_use_the_query_path():
+    embedding = _AsymmetricEmbedding(size=8)
+    requests = [(embedding, "alpha"), (embedding, "beta"), (embedding, "alpha")]
+    vectors = rag._embed_queries("model", requests)
+    assert vectors == [embedding.embed_query(q) for _, q in requests]
+    assert rag._embed_queries("model", requests[:1]) == vectors[:1]
+
+def test_concurrent_queries_share_one_embedding_request(tmp_path, monkeypatch):
+    monkeypatch.setattr(rag, "query_batcher", rag.MicroBatcher("test-query", rag._embed_queries, window_ms=300))
+    embedding = _BatchCountingEmbedding(size=32, requests=[])
+    kb = rag.KnowledgeBase(persist_directory=str(tmp_path / "db"), embedding=embedding, hybrid=False)
+    _code_notes(kb, tmp_path)
+    embedding.requests.clear()
+    questions = ["when are uploads indexed?", "how is configuration read?", "when are uploads indexed?",
+                 "what does E1102 mean?"]
+
+    async def run():
+        return await asyncio.gather(*(kb.asearch(q, k=1) for q in questions))
+
+    results = asyncio.run(run())
+    assert embedding.requests == [[questions[0], questions[1], questions[3]]]
+    assert [hits[0].id for hits in results] == [kb.search(q, k=1)[0].id for q in questions]
+    assert rag.query_batcher.stats()["batch_size"]["count"] == 1
+
+    # Unbatched, every query is its own request
+    embedding.requests.clear()
+    kb.batch_queries = False
+    kb.query_cache.clear()
+    asyncio.run(run())
+    assert len(embedding.requests) == len(questions)
@@ -1,7 +1,9 @@
+import functools
 import pytest
 from fastapi.testclient import TestClient
 from unittest.mock import MagicMock, AsyncMock, patch
 from backend.server import app
+import json
 
 client = TestClient(app)
 
@@ -45,7 +47,8 @@ def test_chat_validation(mock_saver):
 
 import os
 
-def test_set_workspace():
+@patch("backend.server.code_indexer")
+def test_set_workspace(mock_indexer):
     # Store initial workspace
     initial_path = os.getcwd() # Or whatever the server defaults to
     
@@ -55,6 +58,7 @@ def test_set_workspace():
     response = client.post("/workspace", json={"path": new_path})
     assert response.status_code == 200
     assert response.json()["status"] == "success"
+    mock_indexer.select.assert_called_with(new_path)
     
     # Verify list files returns files from new path
     # We can check if list_files endpoint works
@@ -63,3 +67,99 @@ def test_set_workspace():
     
     # Restore workspace
     client.post("/workspace", json={"path": initial_path})
+
+def test_metrics_endpoint():
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert "hits" in response.json()["llm_cache"]
+
+def _fake_graph(events):
+    async def astream(inputs, config, stream_mode):
+        for event in events[stream_mode if isinstance(stream_mode, str) else "messages"]:
+            yield event
+    graph = MagicMock()
+    graph.astream = astream
+    return graph
+
+def test_chat_updates_stream_mode():
+    from langchain_core.messages import AIMessage
+    app.state.graph = _fake_graph({
+        "updates": [{"agent": {"messages": [AIMessage(content="Hi there")]}}],
+    })
+    response = client.post("/chat", json={"message": "Hello", "thread_id": "1"})
+    frames = [json.loads(line) for line in response.text.splitlines()]
+    assert frames == [{"type": "ai", "content": "Hi there", "node": "agent"}]
+
+def test_chat_token_stream_mode():
+    from langchain_core.messages import AIMessageChunk
+    meta = {"langgraph_node": "agent"}
+    app.state.graph = _fake_graph({
+        "messages": [
+            ("tasks", {"id": "t1", "name": "agent", "input": {}, "triggers": ()}),
+            ("messages", (AIMessageChunk(content="Hel", id="m1"), meta)),
+            ("messages", (AIMessageChunk(content="lo", id="m1"), meta)),
+            ("messages", (AIMessageChunk(
+                content="",
+                id="m1",
+                tool_call_chunks=[{"name": "read_file", "args": '{"pa', "id": "c1", "index": 0}],
+            ), meta)),
+            ("tasks", {"id": "t1", "name": "agent", "error": None, "result": {}, "interrupts": []}),
+        ],
+    })
+    response = client.post("/chat", json={"message": "Hello", "thread_id": "1", "stream_mode": "messages"})
+    frames = [json.loads(line) for line in response.text.splitlines()]
+    assert frames[0] == {"type": "node_start", "node": "agent"}
+    assert [f["content"] for f in frames if f["type"] == "AIMessageChunk"] == ["Hel", "lo"]
+    delta = next(f for f in frames if f["type"] == "tool_call_chunk")
+    assert delta["name"] == "read_file" and delta["args"] == '{"pa'
+    assert frames[-1] == {"type": "node_end", "node": "agent"}
+
+def test_reindex_endpoint(monkeypatch):
+    from backend import rag
+    calls = []
+    monkeypatch.setattr(rag, "reindex_knowledge_base", lambda directory, dry_run, collection: calls.append(dry_run) or {"dry_run": dry_run})
+    response = client.post("/knowledge/reindex", params={"dry_run": "true"})
+    assert response.status_code == 200
+    assert response.json() == {"dry_run": True}
+    assert calls == [True]
+
+    def unknown(directory, dry_run, collection):
+        raise rag.UnknownCollectionError(f"Unknown collection '{collection}'")
+    monkeypatch.setattr(rag, "reindex_knowledge_base", unknown)
+    response = client.post("/knowledge/reindex", params={"collection": "w-typo"})
+    assert response.status_code == 404 and response.json()["message"] == "Unknown collection 'w-typo'"
+
+def test_knowledge_search_endpoint(monkeypatch):
+    from backend import rag
+    calls = []
+
+    async def fake_search(query, k, where, collection=None):
+        calls.append((query, k, where))
+        return [rag.Hit("c1", "ninety days", {"filename": "keys.txt", "page": 0})]
+
+    monkeypatch.setattr(rag, "asearch_knowledge_base", fake_search)
+    response = client.post("/knowledge/search", json={"query": "rotation", "sources": ["keys.txt"], "page_from": 1})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["results"] == [{"id": "c1", "text": "ninety days", "metadata": {"filename": "keys.txt", "page": 0}}]
+    assert calls == [("rotation", 4, body["filter"])]
+    bad = client.post("/knowledge/search", json={"query": "rotation", "uploaded_after": "yesterday"})
+    assert bad.status_code == 400
+
+def test_knowledge_collection_endpoints(tmp_path, monkeypatch):
+    from backend import rag
+    kbs = rag.KnowledgeBases(root=str(tmp_path / "db"), upload_root=str(tmp_path / "uploads"))
+    kbs.get("t-acme")
+    monkeypatch.setattr(rag, "_knowledge_bases", kbs)
+    listed = client.get("/knowledge/collections").json()
+    assert [c["name"] for c in listed["collections"]] == [rag.DEFAULT_COLLECTION, "t-acme"]
+    assert listed["active"] == rag.DEFAULT_COLLECTION
+    # Searching a collection that was never created returns nothing and does not create it
+    response = client.post("/knowledge/search", json={"query": "rotation", "tenant": "globex"})
+    assert response.json()["results"] == [] and not kbs.exists("t-globex")
+    assert client.delete("/knowledge/collections/t-acme").status_code == 200
+    assert client.delete("/knowledge/collections/t-acme").status_code == 404
+    assert client.delete("/knowledge/collections/..%2Fx").status_code in (400, 404)
+    with kbs.lease("t-busy"):
+        monkeypatch.setattr(kbs, "delete", functools.partial(kbs.delete, timeout=0.01))
+        assert client.delete("/knowledge/collections/t-busy").status_code == 409
@@ -0,0 +1,55 @@
+import json
+import os
+import subprocess
+import sys
+
+# Generous default so slow CI machines pass; tighten locally with IMPORT_BUDGET_SECONDS
+IMPORT_BUDGET_SECONDS = float(os.getenv("IMPORT_BUDGET_SECONDS", "2.0"))
+HEAVY_MODULES = ["backend.rag", "chromadb", "sympy", "transformers", "yfinance", "geopy", "pyttsx3", "black", "PyPDF2"]
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def _import_in_subprocess(module):
+    code = (
+        "import json, sys, time\n"
+        "start = time.perf_counter()\n"
+        f"import {module}\n"
+        "elapsed = time.perf_counter() - start\n"
+        f"print(json.dumps({{'elapsed': elapsed, 'loaded': [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))\n"
+    )
+    env = {**os.environ, "GEMINI_API_KEY": os.environ.get("GEMINI_API_KEY", "test-key")}
+    out = subprocess.run([sys.executable, "-c", code], cwd=REPO_ROOT, env=env, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def test_core_tools_import_is_lazy():
+    result = _import_in_subprocess("backend.core_tools")
+    assert result["loaded"] == []
+    assert result["elapsed"] < IMPORT_BUDGET_SECONDS
+
+def test_tool_availability_does_not_import():
+    code = (
+        "import json, sys\n"
+        "from backend.core_tools import tool_availability\n"
+        "report = tool_availability()\n"
+        "print(json.dumps({'sympy': 'sympy' in sys.modules, 'calculate': report['calculate']['available']}))\n"
+    )
+    env = {**os.environ, "GEMINI_API_KEY": os.environ.get("GEMINI_API_KEY", "test-key")}
+    out = subprocess.run([sys.executable, "-c", code], cwd=REPO_ROOT, env=env, capture_output=True, text=True, check=True)
+    result = json.loads(out.stdout.strip().splitlines()[-1])
+    assert result == {"sympy": False, "calculate": True}
+
+from backend.benchmarks.bench_startup import main as bench_main, measure
+
+def test_server_startup_runs_offline():
+    result = measure("backend.server", lifespan=True)
+    assert result["import_seconds"] > 0
+    assert result["startup_rss_mb"] >= result["baseline_rss_mb"]
+    assert result["network_attempts"] == []
+
+def test_benchmark_writes_json_report(tmp_path, monkeypatch):
+    output = tmp_path / "startup.json"
+    monkeypatch.setattr(sys, "argv", ["bench_startup", "--runs", "1", "--output", str(output), "backend.core_tools"])
+    bench_main()
+    report = json.loads(output.read_text())
+    assert set(report["modules"]) == {"backend.core_tools"}
+    assert report["modules"]["backend.core_tools"]["rss_mb"] > 0
+    assert report["lifespan"]["startup_seconds"] is not None
@@ -0,0 +1,117 @@
+import gc
+import tracemalloc
+
+import pypdf
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from backend import core_tools, rag
+from backend.embedding_cache import EmbeddingCache
+
+
+def _write_pdf(path, pages, lines=20):
+    """Minimal PDF with one Helvetica text stream per page."""
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        f"<< /Type /Pages /Kids [{' '.join(f'{4 + 2 * i} 0 R' for i in range(pages))}] /Count {pages} >>",
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for i in range(pages):
+        text = " ".join(f"(Page {i} line {j} of the operations manual) '" for j in range(lines))
+        body = f"BT /F1 10 Tf 50 780 Td 12 TL {text} ET"
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>"
+        )
+        objects.append(f"<< /Length {len(body)} >>\nstream\n{body}\nendstream")
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, obj in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{obj}\nendobj\n".encode()
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    path.write_bytes(bytes(out))
+
+def test_pdf_is_read_page_by_page(tmp_path, monkeypatch):
+    monkeypatch.setattr(rag, "INGEST_PAGE_WINDOW", 3)
+    path = tmp_path / "manual.pdf"
+    _write_pdf(path, pages=10)
+    parsed = []
+    chunks = rag.load_and_split(str(path), on_page=parsed.append)
+
+    first = next(chunks)
+    assert parsed == [1]  # nothing past the first page has been read yet
+    assert (first.metadata["page"], first.metadata["total_pages"]) == (0, 10)
+    rest = list(chunks)
+    assert parsed == list(range(1, 11))
+    assert sorted({c.metadata["page"] for c in [first, *rest]}) == list(range(10))
+    assert "Page 9 line 19" in rest[-1].page_content
+
+def test_text_segments_keep_file_offsets(tmp_path, monkeypatch):
+    monkeypatch.setattr(rag, "TEXT_SEGMENT_CHARS", 2000)
+    text = "".join(f"Paragraph {i}: " + "the runbook says to restart the worker. " * 8 + "\n\n" for i in range(60))
+    path = tmp_path / "runbook.txt"
+    path.write_text(text)
+    chunks = list(rag.load_and_split(str(path)))
+    assert len(chunks) > 20
+    for chunk in chunks:
+        start = chunk.metadata["start_index"]
+        assert text[start:start + len(chunk.page_content)] == chunk.page_content
+    assert "Paragraph 59" in chunks[-1].page_content
+
+def test_pdf_to_text_stops_at_the_limit(tmp_path, monkeypatch):
+    monkeypatch.setattr(core_tools, "PyPDF2", pypdf)  # same reader API
+    path = tmp_path / "manual.pdf"
+    _write_pdf(path, pages=50)
+    text = core_tools.pdf_to_text(str(path), max_chars=3000)
+    assert "Page 0 line 0" in text
+    assert "Page 49" not in text
+    assert text.endswith("[Truncated at 3000 characters, on page 4 of 50]")
+    assert len(text) < 3100
+
+    # No limit unless one is configured or asked for
+    text = core_tools.pdf_to_text(str(path))
+    assert "Page 49 line 19" in text and "Truncated" not in text
+
+def _synthetic_loader(pages):
+    def load(path, on_page=None):
+        for number in range(pages):
+            if on_page:
+                on_page(number + 1)
+            # ~4 KB per page, unique so every chunk is embedded and written
+            yield from (
+                Document(page_content=f"page {number} section {s} " + "lorem ipsum dolor " * 55,
+                         metadata={"source": path, "page": number})
+                for s in range(4)
+            )
+    return load
+
+def _peak_ingest_bytes(tmp_path, pages):
+    source = tmp_path / f"manual-{pages}.pdf"
+    source.write_bytes(b"%PDF")
+    kb = rag.KnowledgeBase(
+        persist_directory=str(tmp_path / f"db-{pages}"),
+        embedding=DeterministicFakeEmbedding(size=16),
+        cache=EmbeddingCache(maxsize=32),
+        loader=_synthetic_loader(pages),
+    )
+    kb.store
+    gc.collect()
+    tracemalloc.start()
+    try:
+        assert kb.ingest(str(source)) == pages * 4
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+        kb.close()
+
+def test_ingest_peak_memory_is_flat_in_page_count(tmp_path, monkeypatch):
+    monkeypatch.setattr(rag, "INGEST_EMBED_BATCH", 16)
+    _peak_ingest_bytes(tmp_path, 5)  # warm-up: first-use allocations in Chroma and the splitter
+    small = _peak_ingest_bytes(tmp_path, 25)
+    large = _peak_ingest_bytes(tmp_path, 400)
+    # 16x the pages (~1.6 MB of text) may only add the per-chunk ids kept for the manifest
+    assert large < small * 1.5 + 256 * 1024, (small, large)
@@ -0,0 +1,55 @@
+import asyncio
+import time
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.tools import StructuredTool
+from backend.tool_executor import ParallelToolNode
+
+def slow_echo(text: str, delay: float = 0.2):
+    """Echo text after a delay."""
+    time.sleep(delay)
+    return text
+
+def boom(text: str):
+    """Always fails."""
+    raise RuntimeError("boom")
+
+TOOLS = [
+    StructuredTool.from_function(slow_echo, name="slow_echo", description=slow_echo.__doc__),
+    StructuredTool.from_function(boom, name="boom", description=boom.__doc__),
+]
+
+def _state(*calls):
+    tool_calls = [{"name": name, "args": args, "id": f"c{i}"} for i, (name, args) in enumerate(calls)]
+    return {"messages": [HumanMessage(content="go"), AIMessage(content="", tool_calls=tool_calls)]}
+
+@pytest.mark.asyncio
+async def test_calls_run_concurrently_in_order():
+    node = ParallelToolNode(TOOLS, max_concurrency=4, timeout=5)
+    start = time.perf_counter()
+    result = await node(_state(*[("slow_echo", {"text": str(i)}) for i in range(4)]), {})
+    elapsed = time.perf_counter() - start
+    assert [m.content for m in result["messages"]] == ["0", "1", "2", "3"]
+    assert [m.tool_call_id for m in result["messages"]] == ["c0", "c1", "c2", "c3"]
+    assert elapsed < 0.6
+    assert node.stats()["max_in_flight"] == 4
+
+@pytest.mark.asyncio
+async def test_concurrency_limit():
+    node = ParallelToolNode(TOOLS, max_concurrency=2, timeout=5)
+    await node(_state(*[("slow_echo", {"text": str(i), "delay": 0.05}) for i in range(6)]), {})
+    assert node.stats()["max_in_flight"] == 2
+
+@pytest.mark.asyncio
+async def test_timeout_and_errors_become_tool_messages():
+    node = ParallelToolNode(TOOLS, timeout=5, timeouts={"slow_echo": 0.05})
+    result = await node(_state(
+        ("slow_echo", {"text": "late", "delay": 0.5}),
+        ("boom", {"text": "x"}),
+        ("missing", {}),
+    ), {})
+    timed_out, failed, unknown = result["messages"]
+    assert timed_out.status == "error" and "timed out" in timed_out.content
+    assert failed.status == "error" and "boom" in failed.content
+    assert unknown.status == "error" and "not a valid tool" in unknown.content
+    assert node.stats()["timeouts"] == 1
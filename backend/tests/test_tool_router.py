@@ -0,0 +1,39 @@
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from backend.llm_registry import LLMRegistry
+from backend.tool_router import ToolRouter, current_turn
+from backend.tools import TOOLS
+
+@pytest.fixture(scope="module")
+def router():
+    return ToolRouter(TOOLS, LLMRegistry(TOOLS).tool_schemas(), top_k=3, pinned=["read_file", "write_file"])
+
+def test_greeting_gets_only_pinned_tools(router):
+    assert router.select("hello") == ["read_file", "write_file"]
+
+@pytest.mark.parametrize("text, expected", [
+    ("what's the weather in Paris?", "get_weather"),
+    ("format this python code", "format_python"),
+    ("solve 2*x + 3 = 7", "solve_equation"),
+    ("show me the top hacker news stories", "hn_top_stories"),
+])
+def test_relevant_tool_is_selected(router, text, expected):
+    selected = router.select(text)
+    assert expected in selected
+    assert len(selected) <= 5
+
+def test_tools_called_in_turn_stay_bound(router):
+    messages = [
+        HumanMessage(content="hello"),
+        AIMessage(content="", tool_calls=[{"name": "get_time", "args": {}, "id": "c1"}]),
+        ToolMessage(content="12:00", tool_call_id="c1"),
+    ]
+    turn = current_turn(messages)
+    assert turn == {"text": "hello", "called": ["get_time"]}
+    assert "get_time" in router.select(turn["text"], extra=turn["called"])
+
+def test_stats_report_token_savings(router):
+    router.select("hello")
+    stats = router.stats()
+    assert stats["tokens_saved"] > 0
+    assert stats["total_tools"] == len(TOOLS)
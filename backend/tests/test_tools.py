@@ -1,3 +1,4 @@
+import asyncio
 import pytest
 from backend.core_tools import calculate, get_time, get_weather
 from unittest.mock import patch, MagicMock
@@ -39,3 +40,94 @@ def test_get_weather_failure(mock_get):
 
     result = get_weather("InvalidCity")
     assert "Error" in result
+
+import httpx
+from backend.core_tools import aget_weather, ahn_top_stories
+from backend.http_client import AsyncHTTPClient
+from backend.tools import TOOLS
+
+def _mock_http(handler):
+    return AsyncHTTPClient(transport=httpx.MockTransport(handler))
+
+@pytest.mark.asyncio
+async def test_aget_weather_success():
+    client = _mock_http(lambda request: httpx.Response(200, text="Sunny, 25°C"))
+    with patch("backend.core_tools.http", client):
+        result = await aget_weather("London")
+    assert result == "The weather in London is Sunny, 25°C."
+
+@pytest.mark.asyncio
+async def test_aget_weather_failure():
+    client = _mock_http(lambda request: httpx.Response(404))
+    with patch("backend.core_tools.http", client):
+        result = await aget_weather("InvalidCity")
+    assert "Error" in result
+
+@pytest.mark.asyncio
+async def test_ahn_top_stories_keeps_order():
+    def handler(request):
+        if request.url.path.endswith("topstories.json"):
+            return httpx.Response(200, json=[1, 2, 3])
+        sid = request.url.path.rsplit("/", 1)[-1].split(".")[0]
+        return httpx.Response(200, json={"title": f"Story {sid}", "url": f"https://x/{sid}"})
+    client = _mock_http(handler)
+    with patch("backend.core_tools.http", client):
+        result = await ahn_top_stories(limit=3)
+    assert result.splitlines() == ["- Story 1 (https://x/1)", "- Story 2 (https://x/2)", "- Story 3 (https://x/3)"]
+    assert client.stats()["requests"] == 4
+
+def test_http_client_closes_pools_of_finished_loops():
+    client = _mock_http(lambda request: httpx.Response(200))
+
+    async def fetch():
+        await client.get("https://example.com/")
+        return client.client()
+
+    first = asyncio.run(fetch())
+    second = asyncio.run(fetch())
+    assert first is not second
+    assert first.is_closed and not second.is_closed
+    assert client.stats()["clients"] == 1
+    asyncio.run(client.aclose())
+    assert second.is_closed and client.stats()["clients"] == 0
+
+def test_network_tools_have_native_coroutines():
+    tools = {t.name: t for t in TOOLS}
+    assert tools["get_weather"].coroutine is not None
+    assert tools["get_weather"].func is not None
+    assert tools["calculate"].coroutine is None
+
+def test_lazy_dependency_reports_missing_package():
+    from backend.lazy import lazy_import
+    missing = lazy_import("definitely_not_installed_pkg")
+    assert not missing
+    assert lazy_import("json")
+    assert lazy_import("json").dumps([1]) == "[1]"
+
+def test_tool_availability_reports_missing_chromadb(monkeypatch):
+    import importlib.util
+    from backend.core_tools import tool_availability
+
+    find_spec = importlib.util.find_spec
+    monkeypatch.setattr(importlib.util, "find_spec", lambda name, *a: None if name == "chromadb" else find_spec(name, *a))
+    report = tool_availability()
+    assert report["search_knowledge_base"] == {"available": False, "missing": ["chromadb"]}
+    assert report["search_codebase"]["missing"] == ["chromadb"]
+
+def test_rag_tools_report_missing_chromadb(monkeypatch):
+    import importlib.util
+    from backend import core_tools
+
+    find_spec = importlib.util.find_spec
+    monkeypatch.setattr(importlib.util, "find_spec", lambda name, *a: None if name == "chromadb" else find_spec(name, *a))
+    monkeypatch.setitem(core_tools.vector_store_deps, "chromadb", core_tools.chromadb)
+    expected = "Error: 'chromadb' library not installed."
+    assert core_tools.search_knowledge_base("deploy key") == expected
+    assert core_tools.search_codebase("deploy key") == expected
+    assert asyncio.run(core_tools.asearch_knowledge_base("deploy key")) == expected
+    assert asyncio.run(core_tools.asearch_codebase("deploy key")) == expected
+
+    # The numpy vector store does not need chromadb
+    monkeypatch.delitem(core_tools.vector_store_deps, "chromadb")
+    assert core_tools._vector_store_missing() is None
+    assert core_tools.tool_availability()["search_codebase"] == {"available": True, "missing": []}
@@ -0,0 +1,121 @@
+"""
+Parallel tool dispatch for the "tools" graph node.
+
+When the model returns several tool calls in one AIMessage they are run
+concurrently, bounded by a semaphore, each under its own timeout. Results are
+returned as ToolMessages in the original call order, so the conversation
+history stays deterministic.
+
+Note: sync tools run in worker threads, which cannot be killed; on timeout the
+agent gets an error result right away while the thread finishes in the
+background.
+"""
+import asyncio
+import logging
+import threading
+from typing import Any, Dict, Optional, Sequence
+
+from langchain_core.messages import AIMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig
+
+from backend.config import TOOL_CONCURRENCY, TOOL_TIMEOUT, TOOL_TIMEOUTS
+
+logger = logging.getLogger(__name__)
+
+PARALLEL_TOOLS_HINT = (
+    " When several tool calls are independent of each other (e.g. reading multiple files), "
+    "request them all in a single response; they will be executed in parallel."
+)
+
+
+class ParallelToolNode:
+    """Graph node that executes the last AIMessage's tool calls concurrently."""
+
+    def __init__(
+        self,
+        tools: Sequence[Any],
+        max_concurrency: int = TOOL_CONCURRENCY,
+        timeout: float = TOOL_TIMEOUT,
+        timeouts: Optional[Dict[str, float]] = None,
+    ):
+        self.tools_by_name = {t.name: t for t in tools}
+        self.max_concurrency = max(1, max_concurrency)
+        self.timeout = timeout
+        self.timeouts = dict(TOOL_TIMEOUTS if timeouts is None else timeouts)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+        self.timeouts_hit = 0
+        self.max_in_flight = 0
+        self._in_flight = 0
+
+    def timeout_for(self, name: str) -> float:
+        return self.timeouts.get(name, self.timeout)
+
+    def _count(self, **deltas: int):
+        with self._lock:
+            for name, delta in deltas.items():
+                setattr(self, name, getattr(self, name) + delta)
+            self.max_in_flight = max(self.max_in_flight, self._in_flight)
+
+    async def _run_one(self, call: Dict[str, Any], semaphore: asyncio.Semaphore, config: RunnableConfig) -> ToolMessage:
+        name = call["name"]
+        tool = self.tools_by_name.get(name)
+        if tool is None:
+            self._count(calls=1, errors=1)
+            return ToolMessage(
+                content=f"Error: {name} is not a valid tool, try one of [{', '.join(self.tools_by_name)}].",
+                name=name,
+                tool_call_id=call["id"],
+                status="error",
+            )
+
+        async with semaphore:
+            self._count(calls=1, _in_flight=1)
+            timeout = self.timeout_for(name)
+            try:
+                result = await asyncio.wait_for(tool.ainvoke({**call, "type": "tool_call"}, config), timeout)
+            except asyncio.TimeoutError:
+                self._count(timeouts_hit=1, errors=1)
+                logger.warning(f"Tool '{name}' timed out after {timeout}s")
+                return ToolMessage(
+                    content=f"Error: tool '{name}' timed out after {timeout:g}s.",
+                    name=name,
+                    tool_call_id=call["id"],
+                    status="error",
+                )
+            except Exception as e:
+                self._count(errors=1)
+                logger.warning(f"Tool '{name}' failed: {e}")
+                return ToolMessage(
+                    content=f"Error: {e!r}\n Please fix your mistakes.",
+                    name=name,
+                    tool_call_id=call["id"],
+                    status="error",
+                )
+            finally:
+                self._count(_in_flight=-1)
+
+        if isinstance(result, ToolMessage):
+            return result
+        return ToolMessage(content=str(result), name=name, tool_call_id=call["id"])
+
+    async def __call__(self, state: Dict[str, Any], config: RunnableConfig) -> Dict[str, Any]:
+        message = next((m for m in reversed(state["messages"]) if isinstance(m, AIMessage)), None)
+        if message is None or not message.tool_calls:
+            return {"messages": []}
+
+        # A fresh semaphore per step: the limit applies to the calls of one AIMessage
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        results = await asyncio.gather(*(self._run_one(call, semaphore, config) for call in message.tool_calls))
+        return {"messages": list(results)}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "errors": self.errors,
+                "timeouts": self.timeouts_hit,
+                "max_in_flight": self.max_in_flight,
+                "max_concurrency": self.max_concurrency,
+            }
@@ -0,0 +1,156 @@
+"""
+Per-turn tool selection.
+
+Binding all tools on every LLM call costs thousands of prompt tokens. The
+router scores every tool against the current user turn and only the top-k
+matches plus a pinned core set are bound. Scores combine:
+  - keyword overlap: IDF-weighted overlap between the turn's words and the
+    tool's name and description, and
+  - embedding similarity: cosine similarity between the turn and the tool
+    description. Tool vectors are computed once; by default they are local
+    hashed character n-gram vectors, so routing needs no network call.
+"""
+import json
+import logging
+import math
+import re
+import threading
+import zlib
+from collections import Counter
+from typing import Any, Callable, Dict, List, Sequence
+
+import numpy as np
+
+from backend.config import TOOL_ROUTER_MIN_SCORE, TOOL_ROUTER_PINNED, TOOL_ROUTER_TOP_K
+
+logger = logging.getLogger(__name__)
+
+HASH_DIM = 1024
+KEYWORD_WEIGHT = 0.6
+CHARS_PER_TOKEN = 4
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "for", "from", "get",
+    "how", "i", "in", "is", "it", "me", "my", "of", "on", "or", "please", "the", "this",
+    "to", "using", "what", "with", "you",
+}
+
+
+def tokenize(text: str) -> List[str]:
+    words = _WORD_RE.findall(text.lower().replace("_", " "))
+    return [w for w in words if w not in _STOPWORDS]
+
+
+def hash_embed(texts: Sequence[str], dim: int = HASH_DIM) -> np.ndarray:
+    """L2-normalized hashed bag of words and character trigrams."""
+    matrix = np.zeros((len(texts), dim), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for word in tokenize(text):
+            matrix[row, zlib.crc32(word.encode()) % dim] += 1.0
+            padded = f" {word} "
+            for i in range(len(padded) - 2):
+                matrix[row, zlib.crc32(padded[i:i + 3].encode()) % dim] += 0.5
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _schema_tokens(schema: Dict[str, Any]) -> int:
+    return len(json.dumps(schema)) // CHARS_PER_TOKEN
+
+
+class ToolRouter:
+    """Select the tools worth binding for a user turn."""
+
+    def __init__(
+        self,
+        tools: Sequence[Any],
+        schemas: Dict[str, Dict[str, Any]],
+        top_k: int = TOOL_ROUTER_TOP_K,
+        pinned: Sequence[str] = TOOL_ROUTER_PINNED,
+        min_score: float = TOOL_ROUTER_MIN_SCORE,
+        embed: Callable[[Sequence[str]], np.ndarray] = hash_embed,
+    ):
+        self.names = [t.name for t in tools]
+        self.top_k = top_k
+        self.pinned = [n for n in pinned if n in self.names]
+        self.min_score = min_score
+        self.embed = embed
+
+        documents = [f"{t.name.replace('_', ' ')}. {t.description}" for t in tools]
+        self._doc_words = [set(tokenize(d)) for d in documents]
+        df = Counter(w for words in self._doc_words for w in words)
+        n = len(documents)
+        self._idf = {w: math.log(1 + n / c) for w, c in df.items()}
+        # Description vectors are computed once, at startup
+        self._vectors = embed(documents)
+
+        self._schema_tokens = {name: _schema_tokens(schemas[name]) for name in self.names if name in schemas}
+        self._total_tokens = sum(self._schema_tokens.values())
+
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.tools_offered = 0
+        self.tokens_saved = 0
+
+    def scores(self, text: str) -> Dict[str, float]:
+        """Combined keyword + embedding score for every tool, in [0, 1]."""
+        words = set(tokenize(text))
+        if not words:
+            return {name: 0.0 for name in self.names}
+        query_weight = sum(self._idf.get(w, 0.0) for w in words) or 1.0
+        similarity = self._vectors @ self.embed([text])[0]
+        scores = {}
+        for i, name in enumerate(self.names):
+            keyword = sum(self._idf[w] for w in words & self._doc_words[i]) / query_weight
+            scores[name] = KEYWORD_WEIGHT * keyword + (1 - KEYWORD_WEIGHT) * max(float(similarity[i]), 0.0)
+        return scores
+
+    def select(self, text: str, extra: Sequence[str] = ()) -> List[str]:
+        """
+        Tool names to bind for `text`: the pinned set, any `extra` names (e.g.
+        tools already called in this turn) and the top-k scored tools.
+        """
+        scores = self.scores(text)
+        ranked = sorted(
+            (name for name in self.names if scores[name] >= self.min_score),
+            key=lambda name: scores[name],
+            reverse=True,
+        )
+        selected = list(dict.fromkeys([*self.pinned, *(n for n in extra if n in scores), *ranked[:self.top_k]]))
+
+        offered_tokens = sum(self._schema_tokens.get(n, 0) for n in selected)
+        saved = self._total_tokens - offered_tokens
+        with self._lock:
+            self.calls += 1
+            self.tools_offered += len(selected)
+            self.tokens_saved += saved
+        logger.info(
+            f"Tool router offered {len(selected)}/{len(self.names)} tools "
+            f"(~{saved} schema tokens saved): {', '.join(selected)}"
+        )
+        return selected
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "total_tools": len(self.names),
+                "avg_tools_offered": round(self.tools_offered / self.calls, 2) if self.calls else 0,
+                "tokens_saved": self.tokens_saved,
+                "all_tools_schema_tokens": self._total_tokens,
+            }
+
+
+def current_turn(messages: Sequence[Any]) -> Dict[str, Any]:
+    """Text of the latest user message and the tools already called since it."""
+    text = ""
+    called: List[str] = []
+    for msg in reversed(messages):
+        if msg.type == "human":
+            text = msg.content if isinstance(msg.content, str) else json.dumps(msg.content)
+            break
+        for call in getattr(msg, "tool_calls", None) or []:
+            called.append(call["name"])
+    return {"text": text, "called": called}
@@ -2,7 +2,7 @@
 This module wraps the core tool functions into LangChain-compatible tools.
 """
 from langchain_core.tools import tool, StructuredTool
-from backend.core_tools import available_tools
+from backend.core_tools import available_tools, async_tools
 
 # List to hold the converted tools
 tools_list = []
@@ -12,8 +12,10 @@ for name, func in available_tools.items():
         # Create a StructuredTool from the function
         # We assume the functions have proper type hints and docstrings as seen in the source
         # strict=True ensures that the schema is derived from the signature
+        # Network tools also get a native coroutine; the sync func stays as fallback
         t = StructuredTool.from_function(
             func=func,
+            coroutine=async_tools.get(name),
             name=name,
             description=func.__doc__ or "No description provided."
         )
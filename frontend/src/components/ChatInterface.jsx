@@ -128,7 +128,7 @@ export default function ChatInterface() {
 
             setMessages(prev => [...prev, {
                 role: 'assistant',
-                content: `📄 **System**: Successfully uploaded \`${file.name}\`. Added to knowledge base.`
+                content: `📄 **System**: Uploaded \`${file.name}\`. It is being indexed into the knowledge base in the background.`
             }]);
         } catch (error) {
             console.error(error);